@@ -0,0 +1,170 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import numpy as np
+
+class SyntheticOSM ():
+    # Seeded generator for OSM XML files shaped like a road network: a
+    # jittered square grid of nodes, row and column roads split into ways
+    # of way_length blocks, tagged places, landuse multipolygons and bus
+    # routes. The same node count and seed always give the same file, and
+    # the file is written row by row, so tens of millions of nodes only
+    # cost disk space.
+    HIGHWAY_CLASSES = ("primary", "secondary", "tertiary", "residential", "unclassified")
+    HIGHWAY_WEIGHTS = (0.05, 0.1, 0.15, 0.5, 0.2)
+    PLACE_CLASSES = ("town", "village", "hamlet")
+    PLACE_WEIGHTS = (0.1, 0.5, 0.4)
+    SPACING = 0.001
+    
+    def __init__ (self, node_count, seed=0, way_length=10, place_share=0.002,
+                  oneway_share=0.1, landuse_share=0.005, origin=(50.0, 9.0)):
+        self.__side = max(int(np.ceil(np.sqrt(node_count))), 2)
+        self.__seed = seed
+        self.__way_length = way_length
+        self.__place_share = place_share
+        self.__oneway_share = oneway_share
+        self.__landuse_share = landuse_share
+        self.__origin = origin
+    
+    def side (self):
+        return self.__side
+    
+    def node_id (self, row, col):
+        return row * self.__side + col + 1
+    
+    def _write_nodes (self, f, rng):
+        side = self.__side
+        places = 0
+        
+        for row in range(side):
+            jitter = rng.uniform(-0.2, 0.2, (side, 2)) * self.SPACING
+            lats = self.__origin[0] + row * self.SPACING + jitter[:,0]
+            lons = self.__origin[1] + np.arange(side) * self.SPACING + jitter[:,1]
+            is_place = rng.random(side) < self.__place_share
+            place_classes = rng.choice(len(self.PLACE_CLASSES), side, p=self.PLACE_WEIGHTS)
+            lines = []
+            
+            for col in range(side):
+                node_id = self.node_id(row, col)
+                
+                if is_place[col]:
+                    lines.append(' <node id="{:d}" lat="{:.7f}" lon="{:.7f}" version="1">\n'
+                                 '  <tag k="place" v="{:s}"/>\n'
+                                 '  <tag k="name" v="Place {:d}"/>\n'
+                                 ' </node>\n'.format(node_id, lats[col], lons[col],
+                                                     self.PLACE_CLASSES[place_classes[col]], node_id))
+                    places += 1
+                else:
+                    lines.append(' <node id="{:d}" lat="{:.7f}" lon="{:.7f}" version="1"/>\n'.format(
+                            node_id, lats[col], lons[col]))
+            
+            f.write("".join(lines))
+        
+        return side * side, places
+    
+    def _road_runs (self):
+        # Ways along every row and column, consecutive ways share their end
+        # node so the network is connected
+        side = self.__side
+        
+        for horizontal in (True, False):
+            for line in range(side):
+                for start in range(0, side - 1, self.__way_length):
+                    positions = range(start, min(start + self.__way_length, side - 1) + 1)
+                    
+                    if horizontal:
+                        yield horizontal, line, [self.node_id(line, x) for x in positions]
+                    else:
+                        yield horizontal, line, [self.node_id(x, line) for x in positions]
+    
+    def _write_way (self, f, way_id, refs, tags):
+        lines = [' <way id="{:d}" version="1">\n'.format(way_id)]
+        lines.extend('  <nd ref="{:d}"/>\n'.format(ref) for ref in refs)
+        lines.extend('  <tag k="{:s}" v="{:s}"/>\n'.format(key, value) for key, value in tags)
+        lines.append(' </way>\n')
+        
+        f.write("".join(lines))
+    
+    def _write_relation (self, f, relation_id, members, tags):
+        lines = [' <relation id="{:d}" version="1">\n'.format(relation_id)]
+        lines.extend('  <member type="{:s}" ref="{:d}" role="{:s}"/>\n'.format(*member) for member in members)
+        lines.extend('  <tag k="{:s}" v="{:s}"/>\n'.format(key, value) for key, value in tags)
+        lines.append(' </relation>\n')
+        
+        f.write("".join(lines))
+    
+    def write (self, path):
+        # Writes the file and returns the element counts
+        rng = np.random.default_rng(self.__seed)
+        side = self.__side
+        
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+            f.write('<osm version="0.6" generator="SyntheticOSM">\n')
+            f.write(' <bounds minlat="{:.7f}" minlon="{:.7f}" maxlat="{:.7f}" maxlon="{:.7f}"/>\n'.format(
+                    self.__origin[0] - self.SPACING, self.__origin[1] - self.SPACING,
+                    self.__origin[0] + side * self.SPACING, self.__origin[1] + side * self.SPACING))
+            
+            node_count, place_count = self._write_nodes(f, rng)
+            
+            way_id = 0
+            routes = []
+            
+            for horizontal, line, refs in self._road_runs():
+                way_id += 1
+                tags = [
+                        ("highway", self.HIGHWAY_CLASSES[rng.choice(len(self.HIGHWAY_CLASSES),
+                                                                    p=self.HIGHWAY_WEIGHTS)]),
+                        ("name", "{:s} {:d}".format("Row" if horizontal else "Column", line))
+                    ]
+                
+                if rng.random() < self.__oneway_share:
+                    tags.append(("oneway", "yes"))
+                
+                self._write_way(f, way_id, refs, tags)
+                
+                # Every tenth row gets a bus route along all of its ways
+                if horizontal and line % 10 == 0:
+                    if len(routes) == 0 or routes[-1][0] != line:
+                        routes.append((line, []))
+                    
+                    routes[-1][1].append(way_id)
+            
+            road_count = way_id
+            landuse_cells = np.flatnonzero(rng.random((side - 1) ** 2) < self.__landuse_share)
+            landuse_ways = []
+            
+            for cell in landuse_cells.tolist():
+                row, col = divmod(cell, side - 1)
+                way_id += 1
+                refs = [
+                        self.node_id(row, col), self.node_id(row, col + 1),
+                        self.node_id(row + 1, col + 1), self.node_id(row + 1, col),
+                        self.node_id(row, col)
+                    ]
+                self._write_way(f, way_id, refs, [])
+                landuse_ways.append(way_id)
+            
+            relation_id = 0
+            
+            for way in landuse_ways:
+                relation_id += 1
+                self._write_relation(f, relation_id, [("way", way, "outer")],
+                                     [("type", "multipolygon"), ("landuse", "forest")])
+            
+            for line, way_ids in routes:
+                relation_id += 1
+                self._write_relation(f, relation_id, [("way", x, "") for x in way_ids],
+                                     [("type", "route"), ("route", "bus"), ("ref", str(line))])
+            
+            f.write("</osm>\n")
+        
+        return {
+                "nodes" : node_count,
+                "places" : place_count,
+                "roads" : road_count,
+                "ways" : way_id,
+                "relations" : relation_id
+            }
\ No newline at end of file
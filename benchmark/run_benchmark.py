@@ -0,0 +1,154 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import datetime as dt
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from osmgenerator import SyntheticOSM
+from control.osmparser import OSMParser
+from control.stats import OSMStats
+
+HIGHWAY_SELECTOR = ["primary", "secondary", "tertiary", "residential", "unclassified"]
+
+class StageRecorder ():
+    # Times every stage with perf_counter. With trace_memory the peak of
+    # the Python allocations during the stage is traced as well, which
+    # slows the stage down noticeably. Forked pool workers inherit the
+    # tracing, so compare timings only between runs with the same setting.
+    # The memory of a stage is recorded as deltas: the change of the
+    # resident set and how far the stage raised the peak RSS of the
+    # process. The peak is a high-water mark over the whole run, so a
+    # stage staying below an earlier one shows no growth.
+    def __init__ (self, trace_memory=False):
+        self.__trace_memory = trace_memory
+        self.__records = []
+    
+    @classmethod
+    def rss_kb (cls):
+        # Current resident set, only where /proc is available
+        try:
+            with open("/proc/self/statm", "r") as f:
+                pages = int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            return None
+        
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    
+    @classmethod
+    def _delta (cls, before, after):
+        return None if before is None or after is None else after - before
+    
+    def run (self, name, function, *args, **kwargs):
+        if self.__trace_memory:
+            tracemalloc.start()
+        
+        rss = self.rss_kb()
+        max_rss = OSMStats.max_rss_kb()
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        
+        peak = None
+        
+        if self.__trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        
+        self.__records.append({
+                "stage" : name,
+                "seconds" : seconds,
+                "peak_traced_bytes" : peak,
+                "rss_delta_kb" : self._delta(rss, self.rss_kb()),
+                "max_rss_delta_kb" : self._delta(max_rss, OSMStats.max_rss_kb())
+            })
+        print("{:<24s} {:10.3f} s".format(name, seconds))
+        
+        return result
+    
+    def records (self):
+        return self.__records
+
+def revision ():
+    try:
+        output = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCHMARK_DIR,
+                                capture_output=True, text=True, check=True)
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def synthetic_file (workdir, nodes, seed):
+    # Generated files are reused, the generator is deterministic
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, "synthetic_{:d}_{:d}.osm".format(nodes, seed))
+    counts_path = path + ".json"
+    
+    if not os.path.exists(counts_path):
+        counts = SyntheticOSM(nodes, seed).write(path)
+        
+        with open(counts_path, "w") as f:
+            json.dump(counts, f)
+    
+    with open(counts_path, "r") as f:
+        return path, json.load(f)
+
+def run_stages (recorder, path, processes, targets):
+    collection = recorder.run("parse", OSMParser.parse, path, integer_ids=True, processes=processes)
+    recorder.run("parse_columnar", OSMParser.parse, path, columnar=True, processes=processes)
+    
+    highways = recorder.run("tag_filter", collection.ways_with_tag_value_in, "highway", HIGHWAY_SELECTOR)
+    places = collection.nodes_with_tag("place")
+    
+    recorder.run("ways_with_coordinates", collection.ways_with_coordinates, highways)
+    recorder.run("ways_to_graph", collection.ways_to_graph, highways)
+    graph = recorder.run("ways_to_csr_graph", collection.ways_to_csr_graph, highways)
+    
+    snapped = recorder.run("snap_to_graph", collection.snap_to_graph, graph, places)
+    
+    sources = graph.index_of(list(snapped.values())[:targets])
+    recorder.run("shortest_paths", graph.distance_matrix, sources, processes=processes)
+
+def main (args):
+    path, counts = synthetic_file(args.workdir, args.nodes, args.seed)
+    recorder = StageRecorder(args.trace_memory)
+    
+    run_stages(recorder, path, args.processes, args.targets)
+    
+    results = {
+            "revision" : revision(),
+            "timestamp" : dt.datetime.now().isoformat(),
+            "python" : platform.python_version(),
+            "platform" : platform.platform(),
+            "config" : vars(args),
+            "elements" : counts,
+            "stages" : recorder.records()
+        }
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(description="Times the OSMParser pipeline on a synthetic extract")
+    PARSER.add_argument("--nodes", type=int, default=100000, help="grid nodes of the synthetic file")
+    PARSER.add_argument("--seed", type=int, default=0)
+    PARSER.add_argument("--processes", type=int, default=None)
+    PARSER.add_argument("--targets", type=int, default=50, help="places in the distance matrix")
+    PARSER.add_argument("--trace-memory", action="store_true", help="trace peak memory per stage")
+    PARSER.add_argument("--workdir", default=os.path.join(BENCHMARK_DIR, "data"))
+    PARSER.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "data", "benchmark_results.json"),
+                        help="results file, next to the ignored synthetic files by default")
+    
+    main(PARSER.parse_args())
\ No newline at end of file
@@ -0,0 +1,241 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import numpy as np
+
+class OSMNodeLocations ():
+    # Base of the node location stores, which map batches of int64 node
+    # ids to (n, 2) lat/lon arrays with NaN rows for unknown ids. Deleted
+    # ids are unknown again, so applied diffs can be written through. The
+    # coordinates are kept as int32 fixed point in 1e-7 degrees like in
+    # PBF files, exact for the 6 decimals of the parser at 8 bytes a node.
+    SCALE = 1e7
+    
+    @classmethod
+    def encode (cls, coordinates):
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        
+        return np.round(coordinates * cls.SCALE).astype(np.int32)
+    
+    @classmethod
+    def decode (cls, fixed):
+        return fixed / cls.SCALE
+    
+    def set (self, ids, coordinates):
+        raise NotImplementedError()
+    
+    def get (self, ids):
+        raise NotImplementedError()
+    
+    def delete (self, ids):
+        raise NotImplementedError()
+    
+    def flush (self):
+        pass
+    
+    def close (self):
+        self.flush()
+    
+    def __enter__ (self):
+        return self
+    
+    def __exit__ (self, exc_type, exc_value, traceback):
+        self.close()
+
+class SparseNodeLocations (OSMNodeLocations):
+    # In-memory sparse array: the id space is split into pages of
+    # 2 ** page_bits slots, a page is only allocated once a node falls into
+    # it. Suits extracts, whose ids are clustered but far from dense.
+    MISSING = np.iinfo(np.int32).min
+    
+    def __init__ (self, page_bits=16):
+        self.__page_bits = page_bits
+        self.__pages = {}
+    
+    def _page_groups (self, ids):
+        # Positions of the ids grouped by page, one loop step per page
+        pages = ids >> self.__page_bits
+        order = np.argsort(pages, kind="stable")
+        pages = pages[order]
+        bounds = np.flatnonzero(np.diff(pages)) + 1
+        starts = np.concatenate(([0], bounds)).astype(np.int64)
+        ends = np.append(bounds, len(pages)).astype(np.int64)
+        
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            if start < end:
+                yield int(pages[start]), order[start:end]
+    
+    def set (self, ids, coordinates):
+        ids = np.asarray(ids, dtype=np.int64)
+        fixed = self.encode(coordinates)
+        mask = (1 << self.__page_bits) - 1
+        
+        for page, positions in self._page_groups(ids):
+            if page not in self.__pages:
+                self.__pages[page] = np.full((1 << self.__page_bits, 2), self.MISSING, dtype=np.int32)
+            
+            self.__pages[page][ids[positions] & mask] = fixed[positions]
+    
+    def delete (self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        mask = (1 << self.__page_bits) - 1
+        
+        for page, positions in self._page_groups(ids):
+            if page in self.__pages:
+                self.__pages[page][ids[positions] & mask] = self.MISSING
+    
+    def get (self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        coordinates = np.full((len(ids), 2), np.nan)
+        mask = (1 << self.__page_bits) - 1
+        
+        for page, positions in self._page_groups(ids):
+            if page in self.__pages:
+                fixed = self.__pages[page][ids[positions] & mask]
+                found = fixed[:,0] != self.MISSING
+                coordinates[positions[found]] = self.decode(fixed[found])
+        
+        return coordinates
+    
+    def page_count (self):
+        return len(self.__pages)
+
+class DenseFileNodeLocations (OSMNodeLocations):
+    # Memory mapped file indexed by node id, 8 bytes per possible id. The
+    # values are stored offset by 2 ** 31 as uint32, so the zeros of a
+    # sparse file mean unknown nodes and the unused id ranges of a planet
+    # cost no disk space. The file grows as larger ids come in and is
+    # reused when opened again.
+    OFFSET = 1 << 31
+    MIN_CAPACITY = 1 << 20
+    
+    def __init__ (self, path):
+        self.__path = path
+        self.__array = None
+        self.__capacity = 0
+        
+        if os.path.exists(path):
+            self._map(os.path.getsize(path) // 8)
+    
+    def _map (self, capacity):
+        self.__array = None
+        
+        if capacity > 0:
+            self.__array = np.memmap(self.__path, dtype=np.uint32, mode="r+", shape=(capacity, 2))
+        
+        self.__capacity = capacity
+    
+    def _grow (self, max_id):
+        if max_id < self.__capacity:
+            return
+        
+        capacity = max(max_id + 1, 2 * self.__capacity, self.MIN_CAPACITY)
+        
+        if self.__array is not None:
+            self.__array.flush()
+        
+        with open(self.__path, "ab") as f:
+            f.truncate(capacity * 8)
+        
+        self._map(capacity)
+    
+    def capacity (self):
+        return self.__capacity
+    
+    def set (self, ids, coordinates):
+        ids = np.asarray(ids, dtype=np.int64)
+        
+        if len(ids) == 0:
+            return
+        
+        if np.min(ids) < 0:
+            raise ValueError("Dense node locations need non-negative node ids")
+        
+        self._grow(int(np.max(ids)))
+        self.__array[ids] = (self.encode(coordinates).astype(np.int64) + self.OFFSET).astype(np.uint32)
+    
+    def delete (self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < self.__capacity)]
+        
+        if len(ids) != 0:
+            self.__array[ids] = 0
+    
+    def get (self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        coordinates = np.full((len(ids), 2), np.nan)
+        inside = np.flatnonzero((ids >= 0) & (ids < self.__capacity))
+        
+        if len(inside) != 0:
+            stored = self.__array[ids[inside]]
+            found = stored[:,0] != 0
+            coordinates[inside[found]] = self.decode(stored[found].astype(np.int64) - self.OFFSET)
+        
+        return coordinates
+    
+    def flush (self):
+        if self.__array is not None:
+            self.__array.flush()
+    
+    def close (self):
+        self.flush()
+        self.__array = None
+        self.__capacity = 0
+
+class SortedNodeLocations (OSMNodeLocations):
+    # Sorted id array with binary search, 12 bytes per stored node however
+    # sparse the ids are. Added batches and deletions are merged on the
+    # next lookup in the order they came in, a deletion is kept as a
+    # tombstone until then.
+    def __init__ (self):
+        self.__ids = np.empty(0, dtype=np.int64)
+        self.__fixed = np.empty((0, 2), dtype=np.int32)
+        self.__pending = []
+    
+    def _merge (self):
+        if len(self.__pending) == 0:
+            return
+        
+        ids = np.concatenate([self.__ids] + [x[0] for x in self.__pending])
+        fixed = np.concatenate([self.__fixed] + [x[1] for x in self.__pending])
+        deleted = np.concatenate([np.zeros(len(self.__ids), dtype=bool)] + [x[2] for x in self.__pending])
+        self.__pending = []
+        
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+        last = np.append(ids[1:] != ids[:-1], True)
+        last[last] = ~deleted[order][last]
+        
+        self.__ids = ids[last]
+        self.__fixed = fixed[order][last]
+    
+    def set (self, ids, coordinates):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.__pending.append((ids, self.encode(coordinates), np.zeros(len(ids), dtype=bool)))
+    
+    def delete (self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.__pending.append((ids, np.zeros((len(ids), 2), dtype=np.int32), np.ones(len(ids), dtype=bool)))
+    
+    def get (self, ids):
+        self._merge()
+        
+        ids = np.asarray(ids, dtype=np.int64)
+        coordinates = np.full((len(ids), 2), np.nan)
+        
+        if len(self.__ids) == 0:
+            return coordinates
+        
+        rows = np.minimum(np.searchsorted(self.__ids, ids), len(self.__ids) - 1)
+        found = self.__ids[rows] == ids
+        coordinates[found] = self.decode(self.__fixed[rows[found]])
+        
+        return coordinates
+    
+    def __len__ (self):
+        self._merge()
+        
+        return len(self.__ids)
\ No newline at end of file
@@ -0,0 +1,271 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import numpy as np
+from control.projection import OSMProjection
+from control.spatialindex import GridIndex
+from control.shortestpath import ShortestPathEngine
+from control.routing import OSMLandmarks, OSMRouter
+
+class OSMGraph ():
+    # Directed graph in CSR form over contiguous node indices. The
+    # neighbors of node i are indices[indptr[i]:indptr[i+1]] with the edge
+    # lengths in meters at the same positions of weights. node_ids holds
+    # the OSM id of every index in ascending order. Contracted graphs also
+    # carry the OSM node path of every edge as (offsets, node ids), again
+    # in edge order.
+    EARTH_RADIUS = 6371008.8
+    
+    def __init__ (self, node_ids, coordinates, indptr, indices, weights, paths=None):
+        self.__node_ids = node_ids
+        self.__coordinates = coordinates
+        self.__indptr = indptr
+        self.__indices = indices
+        self.__weights = weights
+        self.__paths = paths
+        self.__reverse = None
+        self.__projection = None
+        self.__spatial_index = None
+        self.__router = None
+    
+    @classmethod
+    def haversine (cls, coords1, coords2):
+        lat1 = np.radians(coords1[...,0])
+        lat2 = np.radians(coords2[...,0])
+        dlat = lat2 - lat1
+        dlon = np.radians(coords2[...,1] - coords1[...,1])
+        
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        
+        return 2 * cls.EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    
+    @classmethod
+    def range_positions (cls, starts, lengths, reverse=False):
+        # Flat positions of the ranges [start, start+length) one after
+        # another, each range backwards with reverse
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(np.sum(lengths))
+        
+        if reverse:
+            positions = np.repeat(2 * starts + lengths - 1, lengths) - positions
+            
+        return positions
+    
+    @classmethod
+    def _select_paths (cls, paths, selected, reverse=False):
+        offsets, nodes = paths
+        starts = offsets[selected]
+        lengths = offsets[selected + 1] - starts
+        positions = cls.range_positions(starts, lengths, reverse)
+        
+        selected_offsets = np.zeros(len(selected) + 1, dtype=np.int64)
+        selected_offsets[1:] = np.cumsum(lengths)
+        
+        return selected_offsets, nodes[positions]
+    
+    @classmethod
+    def from_edges (cls, node_ids, coordinates, sources, targets, weights, paths=None):
+        # Builds the CSR arrays from an edge list over node indices. Parallel
+        # edges are merged, keeping the shortest.
+        node_count = len(node_ids)
+        selected = np.lexsort((weights, targets, sources))
+        
+        if len(selected) != 0:
+            first = np.ones(len(selected), dtype=bool)
+            first[1:] = ((sources[selected][1:] != sources[selected][:-1])
+                         | (targets[selected][1:] != targets[selected][:-1]))
+            selected = selected[first]
+        
+        sources = sources[selected]
+        targets = targets[selected]
+        weights = weights[selected]
+        
+        if paths is not None:
+            paths = cls._select_paths(paths, selected)
+        
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(sources, minlength=node_count))
+        
+        return cls(node_ids, coordinates, indptr, targets.astype(np.int32), weights.astype(np.float32),
+                   paths)
+    
+    def node_ids (self):
+        return self.__node_ids
+    
+    def coordinates (self):
+        return self.__coordinates
+    
+    def indptr (self):
+        return self.__indptr
+    
+    def indices (self):
+        return self.__indices
+    
+    def weights (self):
+        return self.__weights
+    
+    def paths (self):
+        return self.__paths
+    
+    def edge_path (self, j):
+        # OSM node ids along the edge at CSR position j
+        if self.__paths is not None:
+            offsets, nodes = self.__paths
+            
+            return nodes[offsets[j]:offsets[j+1]]
+        
+        source = np.searchsorted(self.__indptr, j, side="right") - 1
+        
+        return self.__node_ids[[source, self.__indices[j]]]
+    
+    def node_count (self):
+        return len(self.__node_ids)
+    
+    def edge_count (self):
+        return len(self.__indices)
+    
+    def index_of (self, node_ids):
+        # Vectorized OSM id to node index, -1 for ids not in the graph
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        
+        if len(self.__node_ids) == 0:
+            return np.full(node_ids.shape, -1, dtype=np.int64)
+        
+        indices = np.searchsorted(self.__node_ids, node_ids)
+        indices = np.minimum(indices, len(self.__node_ids) - 1)
+        
+        return np.where(self.__node_ids[indices] == node_ids, indices, -1)
+    
+    def neighbors (self, i):
+        start = self.__indptr[i]
+        end = self.__indptr[i+1]
+        
+        return self.__indices[start:end], self.__weights[start:end]
+    
+    def edges (self):
+        sources = np.repeat(np.arange(self.node_count(), dtype=np.int32), np.diff(self.__indptr))
+        
+        return sources, self.__indices, self.__weights
+    
+    def reverse (self):
+        # Graph with every edge flipped, as needed by backward searches
+        if self.__reverse is None:
+            sources, targets, weights = self.edges()
+            paths = None
+            
+            if self.__paths is not None:
+                paths = self._select_paths(self.__paths, np.arange(len(weights)), True)
+            
+            self.__reverse = OSMGraph.from_edges(self.__node_ids, self.__coordinates,
+                                                 targets.astype(np.int64), sources.astype(np.int64),
+                                                 weights, paths)
+        
+        return self.__reverse
+    
+    def projection (self):
+        if self.__projection is None:
+            self.__projection = OSMProjection.fit(self.__coordinates)
+            
+        return self.__projection
+    
+    def spatial_index (self, mask=None):
+        # Grid index over the projected node coordinates. With a boolean
+        # mask only those nodes are indexed; index results then refer to
+        # np.flatnonzero(mask). The unmasked index is cached.
+        if mask is not None:
+            return GridIndex(self.projection().project(self.__coordinates[mask]))
+        
+        if self.__spatial_index is None:
+            self.__spatial_index = GridIndex(self.projection().project(self.__coordinates))
+            
+        return self.__spatial_index
+    
+    def nearest_nodes (self, coordinates, k=1, mask=None):
+        # Node indices of the k nearest graph nodes for a batch of lat/lon
+        # coordinates, with distances in meters
+        index = self.spatial_index(mask)
+        distances, indices = index.query(self.projection().project(coordinates), k)
+        
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            indices = np.where(indices != -1, candidates[np.maximum(indices, 0)], -1)
+            
+        return distances, indices
+    
+    def nodes_within (self, coordinates, radius, mask=None):
+        index = self.spatial_index(mask)
+        results = index.query_radius(self.projection().project(coordinates), radius)
+        
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            results = [candidates[x] for x in results]
+            
+        return results
+    
+    def distance_matrix (self, sources, targets=None, predecessors=False, processes=None):
+        # One-off many-to-many query, keep a ShortestPathEngine around to
+        # run several against the same shared arrays
+        with ShortestPathEngine(self, processes) as engine:
+            return engine.distance_matrix(sources, targets, predecessors)
+    
+    def landmarks (self, count=16, processes=None):
+        # ALT tables for routers, worth saving for graphs queried often
+        return OSMLandmarks.compute(self, count, processes)
+    
+    def router (self, landmarks=None):
+        # Point-to-point searches, the router without landmarks is cached
+        if landmarks is not None:
+            return OSMRouter(self, landmarks)
+        
+        if self.__router is None:
+            self.__router = OSMRouter(self)
+        
+        return self.__router
+    
+    def route (self, source, target, landmarks=None):
+        # Shortest path between two node indices as (meters, node indices)
+        return self.router(landmarks).astar(source, target)
+    
+    def _node_keys (self, node_keys):
+        return self.__node_ids.tolist() if node_keys is None else node_keys
+    
+    def to_points (self, node_keys=None):
+        # The dict conversions key by OSM id, or by node_keys given per
+        # node index
+        coordinates = self.__coordinates.copy()
+        
+        return {
+                node_id : coordinates[i]
+                for i, node_id in enumerate(self._node_keys(node_keys))
+            }
+    
+    def to_adjlist (self, node_keys=None):
+        node_ids = self._node_keys(node_keys)
+        indices = self.__indices.tolist()
+        indptr = self.__indptr.tolist()
+        
+        return {
+                node_ids[i] : set(node_ids[j] for j in indices[indptr[i]:indptr[i+1]])
+                for i in range(len(node_ids))
+                if indptr[i] != indptr[i+1]
+            }
+    
+    def to_weight_adjlist (self, node_keys=None):
+        node_ids = self._node_keys(node_keys)
+        sources, targets, weights = self.edges()
+        
+        return {
+                (node_ids[u], node_ids[v]) : w
+                for u, v, w in zip(sources.tolist(), targets.tolist(), weights.tolist())
+            }
+    
+    def to_path_adjlist (self):
+        # OSM node ids along every edge, keyed by its end node ids
+        node_ids = self.__node_ids.tolist()
+        sources, targets, _ = self.edges()
+        
+        return {
+                (node_ids[u], node_ids[v]) : self.edge_path(j).tolist()
+                for j, (u, v) in enumerate(zip(sources.tolist(), targets.tolist()))
+            }
\ No newline at end of file
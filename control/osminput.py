@@ -0,0 +1,256 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import io
+import re
+import bz2
+import gzip
+import mmap
+import queue
+import threading
+from collections import deque
+from multiprocessing import Pool
+
+class OSMChainedStream (io.RawIOBase):
+    # Puts bytes already read from a stream back in front of it, the
+    # compression of a stream can only be told from its first bytes
+    def __init__ (self, head, stream):
+        self.__head = head
+        self.__stream = stream
+    
+    def readable (self):
+        return True
+    
+    def readinto (self, buffer):
+        if len(self.__head) != 0:
+            count = min(len(buffer), len(self.__head))
+            buffer[:count] = self.__head[:count]
+            self.__head = self.__head[count:]
+            
+            return count
+        
+        data = self.__stream.read(len(buffer))
+        buffer[:len(data)] = data
+        
+        return len(data)
+
+class OSMBackgroundReader (io.RawIOBase):
+    # Read-only stream over the chunks of a generator running in a thread.
+    # At most max_chunks wait in the queue, so decompression runs ahead of
+    # the parser by a bounded amount instead of back to back with it.
+    # on_close is called once the thread is done, errors of the generator
+    # are raised by the read that would have returned its data.
+    POLL_SECONDS = 0.1
+    
+    def __init__ (self, chunks, max_chunks=8, on_close=None):
+        self.__queue = queue.Queue(max_chunks)
+        self.__stopped = threading.Event()
+        self.__on_close = on_close
+        self.__current = memoryview(b"")
+        self.__done = False
+        self.__thread = threading.Thread(target=self._produce, args=(chunks,), daemon=True)
+        self.__thread.start()
+    
+    def _put (self, item):
+        while not self.__stopped.is_set():
+            try:
+                self.__queue.put(item, timeout=self.POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        
+        return False
+    
+    def _produce (self, chunks):
+        try:
+            for chunk in chunks:
+                if not self._put(chunk):
+                    break
+            
+            self._put(None)
+        except BaseException as error:
+            self._put(error)
+        finally:
+            chunks.close()
+    
+    def readable (self):
+        return True
+    
+    def readinto (self, buffer):
+        while len(self.__current) == 0:
+            if self.__done:
+                return 0
+            
+            chunk = self.__queue.get()
+            
+            if chunk is None:
+                self.__done = True
+            elif isinstance(chunk, BaseException):
+                self.__done = True
+                raise chunk
+            else:
+                self.__current = memoryview(chunk)
+        
+        count = min(len(buffer), len(self.__current))
+        buffer[:count] = self.__current[:count]
+        self.__current = self.__current[count:]
+        
+        return count
+    
+    def close (self):
+        if not self.closed:
+            self.__stopped.set()
+            self.__thread.join()
+            
+            if self.__on_close is not None:
+                self.__on_close()
+        
+        super().close()
+
+class OSMInput ():
+    # Opens the sources of the parser as binary streams: plain, gzip and
+    # bzip2 files by path as well as already opened binary streams, the
+    # compression being told from the magic bytes. Compressed input is
+    # decompressed in a background thread. Multi-stream bzip2 files, as
+    # written by pbzip2 and lbzip2, are split at their stream headers and
+    # decompressed by a process pool, the streams of a single-stream file
+    # are not byte aligned and are decompressed by the thread alone.
+    GZIP_MAGIC = b"\x1f\x8b"
+    BZIP2_MAGIC = b"BZh"
+    
+    # Stream header with block size followed by the magic of the first
+    # block, a false match inside compressed data is an 80 bit accident
+    BZIP2_STREAM_START = re.compile(rb"BZh[1-9]1AY&SY")
+    
+    # Compressed bytes per pool task, streams are never split
+    CHUNK_BYTES = 4 * 1024 * 1024
+    READ_BYTES = 1024 * 1024
+    MAX_CHUNKS = 8
+    
+    @classmethod
+    def is_stream (cls, source):
+        return hasattr(source, "read")
+    
+    @classmethod
+    def _compression (cls, head):
+        if head.startswith(cls.GZIP_MAGIC):
+            return "gzip"
+        elif head.startswith(cls.BZIP2_MAGIC):
+            return "bzip2"
+        else:
+            return None
+    
+    @classmethod
+    def compression (cls, filepath):
+        # "gzip", "bzip2" or None for plain files
+        with open(filepath, "rb") as f:
+            return cls._compression(f.read(3))
+    
+    @classmethod
+    def _file_chunks (cls, f):
+        try:
+            while True:
+                data = f.read(cls.READ_BYTES)
+                
+                if len(data) == 0:
+                    break
+                
+                yield data
+        finally:
+            f.close()
+    
+    @classmethod
+    def _stream_ranges (cls, filepath, chunk_bytes):
+        # Byte ranges of whole bzip2 streams, about chunk_bytes each
+        with open(filepath, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                start = 0
+                
+                for match in cls.BZIP2_STREAM_START.finditer(data):
+                    if match.start() - start >= chunk_bytes:
+                        yield start, match.start()
+                        start = match.start()
+                
+                yield start, len(data)
+    
+    @classmethod
+    def is_multistream (cls, filepath):
+        # Looks for a second stream within the first chunks only, streams
+        # of parallel compressors are about a megabyte
+        with open(filepath, "rb") as f:
+            data = f.read(4 * cls.CHUNK_BYTES)
+        
+        return cls.BZIP2_STREAM_START.search(data, 1) is not None
+    
+    @classmethod
+    def _decompress_range (cls, filepath, start, end):
+        with open(filepath, "rb") as f:
+            f.seek(start)
+            
+            return bz2.decompress(f.read(end - start))
+    
+    @classmethod
+    def _parallel_chunks (cls, pool, filepath, processes):
+        # Decompressed ranges in file order, with at most a few per worker
+        # in flight
+        max_pending = processes * 2
+        pending = deque()
+        
+        for start, end in cls._stream_ranges(filepath, cls.CHUNK_BYTES):
+            pending.append(pool.apply_async(cls._decompress_range, (filepath, start, end)))
+            
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        
+        while len(pending) != 0:
+            yield pending.popleft().get()
+    
+    @classmethod
+    def _close_pool (cls, pool):
+        # Lets the few tasks in flight finish instead of terminating the
+        # workers, a worker killed while taking a task leaves the locks of
+        # the task queue held and the pool shutdown waiting on them
+        pool.close()
+        pool.join()
+    
+    @classmethod
+    def _open_stream (cls, stream):
+        head = stream.read(3)
+        stream = io.BufferedReader(OSMChainedStream(head, stream), cls.READ_BYTES)
+        compression = cls._compression(head)
+        
+        if compression == "gzip":
+            stream = gzip.GzipFile(fileobj=stream)
+        elif compression == "bzip2":
+            stream = bz2.BZ2File(stream)
+        else:
+            return stream
+        
+        return io.BufferedReader(OSMBackgroundReader(cls._file_chunks(stream), cls.MAX_CHUNKS),
+                                 cls.READ_BYTES)
+    
+    @classmethod
+    def open (cls, source, processes=1):
+        # Binary stream over the uncompressed XML, to be closed by the
+        # caller. Streams passed in are read from their current position
+        # and left open.
+        if cls.is_stream(source):
+            return cls._open_stream(source)
+        
+        compression = cls.compression(source)
+        
+        if compression is None:
+            return open(source, "rb")
+        
+        if compression == "bzip2" and processes > 1 and cls.is_multistream(source):
+            pool = Pool(processes)
+            reader = OSMBackgroundReader(cls._parallel_chunks(pool, source, processes),
+                                         cls.MAX_CHUNKS, lambda: cls._close_pool(pool))
+        elif compression == "bzip2":
+            reader = OSMBackgroundReader(cls._file_chunks(bz2.open(source, "rb")), cls.MAX_CHUNKS)
+        else:
+            reader = OSMBackgroundReader(cls._file_chunks(gzip.open(source, "rb")), cls.MAX_CHUNKS)
+        
+        return io.BufferedReader(reader, cls.READ_BYTES)
\ No newline at end of file
@@ -1,308 +1,2828 @@
-'''
-Created on 24.09.2021
-
-@author: larsw
-'''
-import numpy as np
-from xml.etree import ElementTree
-from collections import defaultdict
-
-class OSMObject ():
-    def __init__ (self, objid, tags):
-        self.__id = objid
-        self.__tags = tags
-        
-    def id (self):
-        return self.__id
-    
-    def tags (self):
-        return self.__tags
-    
-    def has_tag (self, key):
-        return key in self.__tags
-    
-    def has_tag_value (self, key, value):
-        if not self.has_tag(key):
-            return False
-        else:
-            return self.__tags[key] == value
-        
-    def has_tag_value_in (self, key, values):
-        if not self.has_tag(key):
-            return False
-        else:
-            return self.__tags[key] in values
-        
-    @classmethod
-    def filter_by_tag (cls, object_dict, tag):
-        return {
-                obj_id : object_dict[obj_id]
-                for obj_id in object_dict
-                if object_dict[obj_id].has_tag(tag)
-            }
-        
-    @classmethod
-    def filter_by_tag_value (cls, object_dict, tag, value):
-        return {
-                obj_id : object_dict[obj_id]
-                for obj_id in object_dict
-                if object_dict[obj_id].has_tag_value(tag, value)
-            }
-        
-    @classmethod
-    def filter_by_tag_value_in (cls, object_dict, tag, values):
-        return {
-                obj_id : object_dict[obj_id]
-                for obj_id in object_dict
-                if object_dict[obj_id].has_tag_value_in(tag, values)
-            }
-    
-class OSMNode (OSMObject):
-    def __init__ (self, objid, tags, lat, lon):
-        super().__init__(objid, tags)
-        
-        self.__lat = lat
-        self.__lon = lon
-        
-    def lat (self):
-        return self.__lat
-    
-    def lon (self):
-        return self.__lon
-    
-class OSMWay (OSMObject):
-    def __init__ (self, objid, tags, noderefs):
-        super().__init__(objid, tags)
-        
-        self.__noderefs = noderefs
-        
-    def noderefs (self):
-        return self.__noderefs
-    
-    def coordinates (self, node_dict):
-        coords = np.empty((len(self.__noderefs), 2), dtype=np.float)
-        
-        for i in range(len(self.__noderefs)):
-            ref = self.__noderefs[i]
-            
-            if ref in node_dict:
-                ref = node_dict[ref]
-                
-                coords[i, 0] = ref.lat()
-                coords[i, 1] = ref.lon()
-            else:
-                i -= 1
-                break
-        
-        if i != 0:
-            coords = coords[:i+1]
-        else:
-            coords = None
-        
-        return coords
-    
-    def adjacency_list (self, symmetric=True):
-        adjlist = defaultdict(set)
-        
-        node_count = len(self.__noderefs)
-        
-        for i in range(1, node_count):
-            last = self.__noderefs[i-1]
-            current = self.__noderefs[i]
-            
-            adjlist[last].add(current)
-            
-            if symmetric:
-                adjlist[current].add(last)
-        
-        return adjlist
-        
-    
-class OSMMember ():
-    def __init__ (self, member_type, ref, role):
-        self.__type = member_type
-        self.__ref = ref
-        self.__role = role
-        
-    def type (self):
-        return self.__type
-    
-    def ref (self):
-        return self.__ref
-    
-    def role (self):
-        return self.__role
-    
-class OSMRelation (OSMObject):
-    def __init__ (self, objid, tags, members):
-        super().__init__(objid, tags)
-        
-        self.__members = members
-        
-    def members (self):
-        return self.__members
-        
-
-class OSMCollections ():
-    def __init__ (self, nodes, ways, relations):
-        self.__nodes = nodes
-        self.__ways = ways
-        self.__relations = relations
-        
-    def nodes (self):
-        return self.__nodes
-    
-    def ways (self):
-        return self.__ways
-    
-    def relations (self):
-        return self.__relations
-    
-    def nodes_with_tag (self, key):
-        return OSMObject.filter_by_tag(self.__nodes, key)
-        
-    def nodes_with_tag_value (self, key, value):
-        return OSMObject.filter_by_tag_value(self.__nodes, key, value)
-    
-    def nodes_with_tag_value_in (self, key, values):
-        return OSMObject.filter_by_tag_value_in(self.__nodes, key, values)
-        
-    def ways_with_tag (self, key):
-        return OSMObject.filter_by_tag(self.__ways, key)
-        
-    def ways_with_tag_value (self, key, value):
-        return OSMObject.filter_by_tag_value(self.__ways, key, value)
-    
-    def ways_with_tag_value_in (self, key, values):
-        return OSMObject.filter_by_tag_value_in(self.__ways, key, values)
-    
-    def relations_with_tag (self, key):
-        return OSMObject.filter_by_tag(self.__relations, key)
-        
-    def relations_with_tag_value (self, key, value):
-        return OSMObject.filter_by_tag_value(self.__relations, key, value)
-    
-    def relations_with_tag_value_in (self, key, values):
-        return OSMObject.filter_by_tag_value_in(self.__relations, key, values)
-        
-    def nodes_with_coordinates (self, nodes=None):
-        if nodes is None:
-            nodes = self.__nodes
-            
-        coords = {
-                node_id : np.array([nodes[node_id].lat(), nodes[node_id].lon()])
-                for node_id in nodes
-            }
-        return coords
-        
-    def ways_with_coordinates (self, ways=None):
-        if ways is None:
-            ways = self.__ways
-        
-        coords = {
-                way_id : ways[way_id].coordinates(self.__nodes)
-                for way_id in ways
-            }
-        coords = {
-                way_id : coords[way_id]
-                for way_id in coords
-                if coords[way_id] is not None
-            }
-        
-        return coords
-    
-    def ways_to_graph (self, ways=None, symmetric=True):
-        if ways is None:
-            ways = self.__ways
-        
-        all_noderefs = set()
-        adjlist = defaultdict(set)
-        
-        for way_id in ways:
-            way = ways[way_id]
-            
-            c_adjlist = way.adjacency_list(symmetric)
-            
-            for node_id in c_adjlist:
-                if node_id in self.__nodes:
-                    all_noderefs.add(node_id)
-                    adjs = c_adjlist[node_id]
-                    
-                    for adj in adjs:
-                        if adj in self.__nodes:
-                            all_noderefs.add(adj)
-                            adjlist[node_id].add(adj)
-            
-        all_noderefs = {
-                x : np.array([self.__nodes[x].lat(), self.__nodes[x].lon()])
-                for x in all_noderefs
-            }
-        return all_noderefs, adjlist
-
-class OSMParser():
-    @classmethod
-    def _parse_tags (cls, elem):
-        tags = {}
-        
-        for tag_elem in elem.findall("tag"):
-            tags[tag_elem.get("k")] = tag_elem.get("v")
-            
-        return tags
-    
-    @classmethod
-    def _parse_nodes (cls, root):
-        nodes = {}
-        
-        for node in root.findall("node"):
-            node_id = node.get("id")
-            lat = np.round(float(node.get("lat")), 6)
-            lon = np.round(float(node.get("lon")), 6)
-            
-            tags = cls._parse_tags(node)
-                
-            nodes[node_id] = OSMNode(node_id, tags, lat, lon)
-            
-        return nodes
-            
-    @classmethod
-    def _parse_ways (cls, root):
-        ways = {}
-        
-        for way in root.findall("way"):
-            way_id = way.get("id")
-            
-            tags = cls._parse_tags(way)
-            node_refs = [
-                    nd.get("ref")
-                    for nd in way.findall("nd")
-                ]
-            
-            ways[way_id] = OSMWay(way_id, tags, node_refs)
-            
-        return ways
-    
-    @classmethod
-    def _parse_relations (cls, root):
-        relations = {}
-        
-        for relation in root.findall("relation"):
-            relation_id = relation.get("id")
-            
-            tags = cls._parse_tags(relation)
-            members = [
-                    OSMMember(member.get("type"), member.get("ref"), member.get("role"))
-                    for member in relation.findall("member")
-                ]
-            relations[relation_id] = OSMRelation(relation_id, tags, members)
-            
-        return relations
-    
-    @classmethod
-    def parse (cls, filepath):
-        root = ElementTree.parse(filepath).getroot()
-        
-        nodes = cls._parse_nodes(root)
-        ways = cls._parse_ways(root)
-        relations = cls._parse_relations(root)
-        
-        return OSMCollections(nodes, ways, relations)
\ No newline at end of file
+'''
+Created on 24.09.2021
+
+@author: larsw
+'''
+import os
+import io
+import sys
+import time
+import numpy as np
+from array import array
+from collections import deque
+from multiprocessing import Pool
+from xml.etree import ElementTree
+from collections import defaultdict
+from control.osmgraph import OSMGraph
+from control.projection import OSMProjection
+from control.spatialindex import GridIndex, PackedRTree, ExtractArea
+from control.stats import OSMStats
+from control.osminput import OSMInput
+from control.nodelocations import OSMNodeLocations, SortedNodeLocations
+
+class OSMEmptyTags (dict):
+    # Tag dict shared by all untagged objects, so it refuses modification
+    def _read_only (self, *args, **kwargs):
+        raise TypeError("The shared empty tags of untagged objects are read-only, use set_tag")
+    
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    update = setdefault = pop = popitem = clear = _read_only
+    
+    def __reduce__ (self):
+        return (OSMEmptyTags, ())
+    
+class OSMObject ():
+    # The element classes use __slots__, objects exist millions of times.
+    # Untagged objects share EMPTY_TAGS instead of holding an own dict.
+    __slots__ = ("__id", "__tags")
+    
+    EMPTY_TAGS = OSMEmptyTags()
+    
+    def __init__ (self, objid, tags):
+        self.__id = objid
+        self.__tags = tags if len(tags) != 0 else self.EMPTY_TAGS
+    
+    @classmethod
+    def intern_tags (cls, tags):
+        # Keys and values repeat across elements, interning keeps one
+        # string object for each of them
+        if len(tags) == 0:
+            return cls.EMPTY_TAGS
+        
+        return {
+                sys.intern(key) : sys.intern(value)
+                for key, value in tags.items()
+            }
+        
+    def id (self):
+        return self.__id
+    
+    def tags (self):
+        return self.__tags
+    
+    def set_tag (self, key, value):
+        # The tags of untagged objects can't be written through tags(), they
+        # get an own dict here on the first write
+        if self.__tags is self.EMPTY_TAGS:
+            self.__tags = {}
+        
+        self.__tags[key] = value
+    
+    def has_tag (self, key):
+        return key in self.tags()
+    
+    def has_tag_value (self, key, value):
+        if not self.has_tag(key):
+            return False
+        else:
+            return self.tags()[key] == value
+        
+    def has_tag_value_in (self, key, values):
+        if not self.has_tag(key):
+            return False
+        else:
+            return self.tags()[key] in values
+        
+    @classmethod
+    def filter_by_tag (cls, object_dict, tag):
+        return {
+                obj_id : object_dict[obj_id]
+                for obj_id in object_dict
+                if object_dict[obj_id].has_tag(tag)
+            }
+        
+    @classmethod
+    def filter_by_tag_value (cls, object_dict, tag, value):
+        return {
+                obj_id : object_dict[obj_id]
+                for obj_id in object_dict
+                if object_dict[obj_id].has_tag_value(tag, value)
+            }
+        
+    @classmethod
+    def filter_by_tag_value_in (cls, object_dict, tag, values):
+        return {
+                obj_id : object_dict[obj_id]
+                for obj_id in object_dict
+                if object_dict[obj_id].has_tag_value_in(tag, values)
+            }
+    
+class OSMNode (OSMObject):
+    __slots__ = ("__lat", "__lon")
+    
+    def __init__ (self, objid, tags, lat, lon):
+        super().__init__(objid, tags)
+        
+        self.__lat = lat
+        self.__lon = lon
+        
+    def lat (self):
+        return self.__lat
+    
+    def lon (self):
+        return self.__lon
+    
+class OSMNodeView (OSMNode):
+    # Row view into an OSMNodeTable, keeps the OSMNode accessors working
+    # without materializing a node object per row.
+    __slots__ = ("__table", "__row")
+    
+    def __init__ (self, table, row):
+        self.__table = table
+        self.__row = row
+        
+    def row (self):
+        return self.__row
+        
+    def id (self):
+        return self.__table.id_at(self.__row)
+    
+    def tags (self):
+        return self.__table.tags_at(self.__row)
+    
+    def set_tag (self, key, value):
+        self.__table.set_tag_at(self.__row, key, value)
+    
+    def lat (self):
+        return self.__table.lat_at(self.__row)
+    
+    def lon (self):
+        return self.__table.lon_at(self.__row)
+    
+class OSMRowChanges ():
+    # Row bookkeeping of OSMNodeTable.updated, so that arrays aligned with
+    # the rows of the old table can be carried over without a rebuild.
+    # removed holds the deleted rows of the old table, positions the
+    # np.insert positions of the created nodes after the removal, inserted
+    # their rows in the new table, modified the old and rewritten the new
+    # rows of the nodes that were modified in place.
+    def __init__ (self, removed, positions, modified, rewritten):
+        self.__removed = removed
+        self.__positions = positions
+        self.__inserted = positions + np.arange(len(positions))
+        self.__modified = modified
+        self.__rewritten = rewritten
+    
+    def removed (self):
+        return self.__removed
+    
+    def modified (self):
+        return self.__modified
+    
+    def inserted (self):
+        return self.__inserted
+    
+    def rewritten (self):
+        return self.__rewritten
+    
+    def shifted (self):
+        # Whether any row moved
+        return len(self.__removed) != 0 or len(self.__positions) != 0
+    
+    def remap (self, rows):
+        # Old rows to new rows, -1 for removed rows and for -1 itself
+        rows = np.asarray(rows, dtype=np.int64)
+        
+        if not self.shifted():
+            return rows.copy()
+        
+        before = np.searchsorted(self.__removed, rows)
+        removed = np.zeros(rows.shape, dtype=bool)
+        
+        if len(self.__removed) != 0:
+            removed = self.__removed[np.minimum(before, len(self.__removed) - 1)] == rows
+        
+        rows = rows - before
+        rows = rows + np.searchsorted(self.__positions, rows, side="right")
+        
+        return np.where(removed | (rows < 0), -1, rows)
+    
+    def patch (self, array, values):
+        # Carries a row aligned array over to the new table, values gives
+        # the entries for an array of new rows
+        array = np.delete(array, self.__removed, axis=0)
+        array = np.insert(array, self.__positions, values(self.__inserted), axis=0)
+        array[self.__rewritten] = values(self.__rewritten)
+        
+        return array
+
+class OSMNodeTable ():
+    # Columnar node store: sorted int64 ids, a (n, 2) float64 lat/lon array
+    # and tags only for the nodes that actually have some. Behaves like the
+    # node dict of OSMCollections, values are OSMNodeView rows.
+    def __init__ (self, ids, coordinates, tags=None):
+        ids = np.asarray(ids, dtype=np.int64)
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        
+        if len(ids) > 1 and np.any(ids[1:] <= ids[:-1]):
+            order = np.argsort(ids, kind="stable")
+            ids = ids[order]
+            coordinates = coordinates[order]
+            
+            # Keep the last occurrence of duplicated ids, like a dict would
+            last = np.append(ids[1:] != ids[:-1], True)
+            ids = ids[last]
+            coordinates = coordinates[last]
+        
+        self.__ids = ids
+        self.__coordinates = coordinates
+        self.__tags = {} if tags is None else tags
+        
+    @classmethod
+    def from_nodes (cls, nodes):
+        ids = np.fromiter((int(node_id) for node_id in nodes), dtype=np.int64, count=len(nodes))
+        coordinates = np.array([
+                (nodes[node_id].lat(), nodes[node_id].lon())
+                for node_id in nodes
+            ], dtype=np.float64)
+        tags = {
+                int(node_id) : nodes[node_id].tags()
+                for node_id in nodes
+                if len(nodes[node_id].tags()) != 0
+            }
+        
+        return cls(ids, coordinates, tags)
+    
+    def updated (self, node_ids, coordinates, tags, deleted_ids):
+        # New table with the given nodes added or replaced and the deleted
+        # ones removed, together with the OSMRowChanges from this table to
+        # it. Only the changed ids are looked up, the arrays are copied
+        # once with the rows spliced in and out. This table stays as it is.
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        order = np.argsort(node_ids, kind="stable")
+        node_ids = node_ids[order]
+        coordinates = coordinates[order]
+        
+        written_rows = self.rows(node_ids)
+        existing = written_rows != -1
+        removed = self.rows(np.asarray(deleted_ids, dtype=np.int64))
+        removed = np.unique(removed[removed != -1])
+        
+        ids = np.delete(self.__ids, removed)
+        table_coordinates = np.delete(self.__coordinates, removed, axis=0)
+        rewritten = written_rows[existing] - np.searchsorted(removed, written_rows[existing])
+        table_coordinates[rewritten] = coordinates[existing]
+        
+        positions = np.searchsorted(ids, node_ids[~existing])
+        changes = OSMRowChanges(removed, positions, written_rows[existing],
+                                rewritten + np.searchsorted(positions, rewritten, side="right"))
+        ids = np.insert(ids, positions, node_ids[~existing])
+        table_coordinates = np.insert(table_coordinates, positions, coordinates[~existing], axis=0)
+        
+        table_tags = dict(self.__tags)
+        
+        for node_id in np.concatenate((node_ids, self.__ids[removed])).tolist():
+            table_tags.pop(node_id, None)
+        
+        table_tags.update(tags)
+        
+        return OSMNodeTable(ids, table_coordinates, table_tags), changes
+    
+    def ids (self):
+        return self.__ids
+    
+    def coordinates (self):
+        return self.__coordinates
+    
+    def lats (self):
+        return self.__coordinates[:,0]
+    
+    def lons (self):
+        return self.__coordinates[:,1]
+    
+    def tagged (self):
+        return self.__tags
+    
+    def rows (self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        
+        if len(self.__ids) == 0:
+            return np.full(ids.shape, -1, dtype=np.int64)
+        
+        rows = np.searchsorted(self.__ids, ids)
+        rows = np.minimum(rows, len(self.__ids) - 1)
+        
+        return np.where(self.__ids[rows] == ids, rows, -1)
+    
+    def row (self, node_id):
+        try:
+            node_id = int(node_id)
+        except (TypeError, ValueError):
+            return -1
+        
+        row = int(np.searchsorted(self.__ids, node_id))
+        
+        if row < len(self.__ids) and self.__ids[row] == node_id:
+            return row
+        else:
+            return -1
+    
+    def id_at (self, row):
+        return int(self.__ids[row])
+    
+    def tags_at (self, row):
+        return self.__tags.get(int(self.__ids[row]), OSMObject.EMPTY_TAGS)
+    
+    def set_tag_at (self, row, key, value):
+        self.__tags.setdefault(int(self.__ids[row]), {})[key] = value
+    
+    def lat_at (self, row):
+        return self.__coordinates[row, 0]
+    
+    def lon_at (self, row):
+        return self.__coordinates[row, 1]
+    
+    def __len__ (self):
+        return len(self.__ids)
+    
+    def __iter__ (self):
+        return iter(self.__ids.tolist())
+    
+    def __contains__ (self, node_id):
+        return self.row(node_id) != -1
+    
+    def __getitem__ (self, node_id):
+        row = self.row(node_id)
+        
+        if row == -1:
+            raise KeyError(node_id)
+        
+        return OSMNodeView(self, row)
+    
+    def get (self, node_id, default=None):
+        row = self.row(node_id)
+        
+        if row == -1:
+            return default
+        
+        return OSMNodeView(self, row)
+    
+    def keys (self):
+        return self.__ids.tolist()
+    
+    def values (self):
+        return [
+                OSMNodeView(self, row)
+                for row in range(len(self.__ids))
+            ]
+    
+    def items (self):
+        return zip(self.keys(), self.values())
+    
+class OSMNodeTableBuilder ():
+    def __init__ (self):
+        self.__ids = array("q")
+        self.__lats = array("d")
+        self.__lons = array("d")
+        self.__tags = {}
+        
+    def __len__ (self):
+        return len(self.__ids)
+        
+    def add (self, node_id, lat, lon, tags):
+        self.__ids.append(node_id)
+        self.__lats.append(lat)
+        self.__lons.append(lon)
+        
+        if len(tags) != 0:
+            self.__tags[node_id] = tags
+            
+    def extend (self, ids, coordinates, tags=None):
+        self.__ids.frombytes(np.ascontiguousarray(ids, dtype=np.int64).tobytes())
+        self.__lats.frombytes(np.ascontiguousarray(coordinates[:,0], dtype=np.float64).tobytes())
+        self.__lons.frombytes(np.ascontiguousarray(coordinates[:,1], dtype=np.float64).tobytes())
+        
+        if tags is not None:
+            self.__tags.update(tags)
+            
+    def columns (self):
+        # Unrounded ids and coordinates collected so far
+        ids = np.array(self.__ids, dtype=np.int64)
+        coordinates = np.empty((len(self.__ids), 2), dtype=np.float64)
+        coordinates[:,0] = self.__lats
+        coordinates[:,1] = self.__lons
+        
+        return ids, coordinates
+            
+    def build (self):
+        ids, coordinates = self.columns()
+        coordinates = np.round(coordinates, 6)
+        
+        return OSMNodeTable(ids, coordinates, self.__tags)
+    
+class OSMWay (OSMObject):
+    __slots__ = ("__noderefs",)
+    
+    def __init__ (self, objid, tags, noderefs):
+        super().__init__(objid, tags)
+        
+        self.__noderefs = noderefs
+        
+    def noderefs (self):
+        return self.__noderefs
+    
+    def _noderef_list (self):
+        # Integer id mode keeps the refs as an int64 array, iterating it in
+        # Python would yield numpy scalars instead of plain ids
+        if isinstance(self.__noderefs, np.ndarray):
+            return self.__noderefs.tolist()
+        else:
+            return self.__noderefs
+    
+    def coordinates (self, node_dict):
+        # Geometry up to the first missing node, None if that leaves fewer
+        # than two points. node_dict may also be an OSMNodeLocations store
+        # or an OSMCollections, which resolves the refs through its store if
+        # it has one. A collection parsed with a store and prune_nodes only
+        # holds the tagged nodes, so its nodes() cannot resolve the refs.
+        # OSMCollections.resolve_way_coordinates does the same for many ways
+        # at once.
+        if isinstance(node_dict, OSMCollections):
+            table, rows = node_dict._join_refs(np.asarray(self.__noderefs, dtype=np.int64))
+            missing = np.flatnonzero(rows == -1)
+            rows = rows[:missing[0]] if len(missing) != 0 else rows
+            
+            return table.coordinates()[rows] if len(rows) >= 2 else None
+        
+        if isinstance(node_dict, OSMNodeLocations):
+            coords = node_dict.get(np.asarray(self.__noderefs, dtype=np.int64))
+            missing = np.flatnonzero(np.isnan(coords[:,0]))
+            coords = coords[:missing[0]] if len(missing) != 0 else coords
+            
+            return coords if len(coords) >= 2 else None
+        
+        coords = []
+        
+        for ref in self._noderef_list():
+            if ref not in node_dict:
+                break
+            
+            node = node_dict[ref]
+            coords.append((node.lat(), node.lon()))
+        
+        if len(coords) < 2:
+            return None
+        
+        return np.array(coords, dtype=np.float64)
+    
+    def adjacency_list (self, symmetric=True):
+        adjlist = defaultdict(set)
+        
+        noderefs = self._noderef_list()
+        node_count = len(noderefs)
+        
+        for i in range(1, node_count):
+            last = noderefs[i-1]
+            current = noderefs[i]
+            
+            adjlist[last].add(current)
+            
+            if symmetric:
+                adjlist[current].add(last)
+        
+        return adjlist
+        
+    
+class OSMMember ():
+    __slots__ = ("__type", "__ref", "__role")
+    
+    def __init__ (self, member_type, ref, role):
+        self.__type = member_type
+        self.__ref = ref
+        self.__role = role
+        
+    def type (self):
+        return self.__type
+    
+    def ref (self):
+        return self.__ref
+    
+    def role (self):
+        return self.__role
+    
+class OSMRelation (OSMObject):
+    __slots__ = ("__members",)
+    
+    def __init__ (self, objid, tags, members):
+        super().__init__(objid, tags)
+        
+        self.__members = members
+        
+    def members (self):
+        return self.__members
+        
+
+class OSMWayGeometries ():
+    # Resolved way geometries in CSR form: the points of way i are
+    # coordinates[offsets[i]:offsets[i+1]]. Item access returns views into
+    # the flat coordinate array. missing() maps way ids to the node refs
+    # that could not be resolved.
+    MISSING_MODES = ("truncate", "skip", "drop")
+    
+    def __init__ (self, way_ids, offsets, coordinates, missing):
+        self.__way_ids = way_ids
+        self.__offsets = offsets
+        self.__coordinates = coordinates
+        self.__missing = missing
+        self.__indices = None
+        
+    def way_ids (self):
+        return self.__way_ids
+    
+    def offsets (self):
+        return self.__offsets
+    
+    def coordinates (self):
+        return self.__coordinates
+    
+    def missing (self):
+        return self.__missing
+    
+    def index (self, way_id):
+        if self.__indices is None:
+            self.__indices = {
+                    way_id : i
+                    for i, way_id in enumerate(self.__way_ids)
+                }
+            
+        return self.__indices[way_id]
+    
+    def geometry (self, i):
+        return self.__coordinates[self.__offsets[i]:self.__offsets[i+1]]
+    
+    def __len__ (self):
+        return len(self.__way_ids)
+    
+    def __iter__ (self):
+        return iter(self.__way_ids)
+    
+    def __contains__ (self, way_id):
+        try:
+            self.index(way_id)
+        except KeyError:
+            return False
+        
+        return True
+    
+    def __getitem__ (self, way_id):
+        return self.geometry(self.index(way_id))
+    
+    def keys (self):
+        return list(self.__way_ids)
+    
+    def values (self):
+        return [
+                self.geometry(i)
+                for i in range(len(self.__way_ids))
+            ]
+    
+    def items (self):
+        return zip(self.keys(), self.values())
+    
+class OSMMultipolygon ():
+    # Area of a multipolygon or boundary relation as closed (n, 2) lat/lon
+    # rings. Member ways which could not be assembled into a complete ring
+    # are listed in open_ways.
+    def __init__ (self, relation_id, outer, inner, open_ways):
+        self.__relation_id = relation_id
+        self.__outer = outer
+        self.__inner = inner
+        self.__open_ways = open_ways
+        
+    def relation_id (self):
+        return self.__relation_id
+    
+    def outer (self):
+        return self.__outer
+    
+    def inner (self):
+        return self.__inner
+    
+    def open_ways (self):
+        return self.__open_ways
+    
+    def is_complete (self):
+        return len(self.__open_ways) == 0
+
+class OSMChangeSummary ():
+    # Ids touched by an applied osmChange per action and element type.
+    # affected_ways() also holds the unchanged ways whose nodes were moved
+    # or deleted, i.e. all ways with a geometry to rebuild.
+    def __init__ (self):
+        self.__ids = {
+                action : {element_type : {} for element_type in OSMParser.ELEMENT_TAGS}
+                for action in OSMParser.CHANGE_ACTIONS
+            }
+        self.__affected_ways = {}
+    
+    def add (self, action, element_type, obj_id):
+        self.__ids[action][element_type][obj_id] = None
+    
+    def ids (self, action, element_type):
+        return self.__ids[action][element_type].keys()
+    
+    def created (self, element_type):
+        return self.ids("create", element_type)
+    
+    def modified (self, element_type):
+        return self.ids("modify", element_type)
+    
+    def deleted (self, element_type):
+        return self.ids("delete", element_type)
+    
+    def add_affected_ways (self, way_ids):
+        self.__affected_ways.update(dict.fromkeys(way_ids))
+    
+    def affected_ways (self):
+        return self.__affected_ways.keys()
+    
+    def __len__ (self):
+        return sum(
+                len(ids)
+                for by_type in self.__ids.values()
+                for ids in by_type.values()
+            )
+    
+class OSMTagIndex ():
+    # Inverted index from key and (key, value) to the ids carrying them.
+    # The id containers are dicts used as ordered sets, so results come back
+    # in the order the objects were indexed.
+    def __init__ (self):
+        self.__keys = defaultdict(dict)
+        self.__values = defaultdict(dict)
+        
+    @classmethod
+    def from_tags (cls, tags_dict):
+        index = cls()
+        
+        for obj_id in tags_dict:
+            index.add(obj_id, tags_dict[obj_id])
+            
+        return index
+    
+    @classmethod
+    def from_objects (cls, object_dict):
+        if isinstance(object_dict, OSMNodeTable):
+            return cls.from_tags(object_dict.tagged())
+        
+        index = cls()
+        
+        for obj_id in object_dict:
+            index.add(obj_id, object_dict[obj_id].tags())
+            
+        return index
+    
+    def add (self, obj_id, tags):
+        for key in tags:
+            self.__keys[key][obj_id] = None
+            self.__values[(key, tags[key])][obj_id] = None
+            
+    def remove (self, obj_id, tags):
+        for key in tags:
+            self.__keys[key].pop(obj_id, None)
+            self.__values[(key, tags[key])].pop(obj_id, None)
+    
+    def ids_with_tag (self, key):
+        return self.__keys.get(key, {}).keys()
+    
+    def ids_with_tag_value (self, key, value):
+        return self.__values.get((key, value), {}).keys()
+    
+    def ids_with_tag_value_in (self, key, values):
+        # Merging the id lists of the values would group the ids by value,
+        # so with more than one matching value the ids are taken from the
+        # key list instead, keeping the object order of a full scan
+        matches = [
+                self.__values[(key, value)]
+                for value in values
+                if len(self.__values.get((key, value), {})) != 0
+            ]
+        
+        if len(matches) <= 1:
+            return (matches[0] if len(matches) != 0 else {}).keys()
+            
+        return dict.fromkeys(
+                obj_id
+                for obj_id in self.__keys[key]
+                if any(obj_id in ids for ids in matches)
+            ).keys()
+    
+class OSMRefIndex ():
+    # Reverse index from referenced ids to the elements referencing them,
+    # e.g. from nodes to the ways using them. Unique (ref, owner) pairs of
+    # int64 ids are kept in two arrays sorted by ref, so lookups and
+    # updates only search for the ids at hand.
+    def __init__ (self, refs, owners):
+        refs = np.asarray(refs, dtype=np.int64)
+        owners = np.asarray(owners, dtype=np.int64)
+        order = np.lexsort((owners, refs))
+        refs = refs[order]
+        owners = owners[order]
+        unique = np.ones(len(refs), dtype=bool)
+        unique[1:] = (refs[1:] != refs[:-1]) | (owners[1:] != owners[:-1])
+        
+        self.__refs = refs[unique]
+        self.__owners = owners[unique]
+    
+    def _positions (self, refs):
+        # Pair positions of the refs with the ref each one belongs to
+        refs = np.asarray(refs, dtype=np.int64)
+        starts = np.searchsorted(self.__refs, refs, side="left")
+        counts = np.searchsorted(self.__refs, refs, side="right") - starts
+        
+        return OSMGraph.range_positions(starts, counts), np.repeat(np.arange(len(refs)), counts)
+    
+    def owners (self, refs):
+        positions, _ = self._positions(refs)
+        
+        return np.unique(self.__owners[positions])
+    
+    def update (self, removed, added):
+        # removed and added are (refs, owners) pair arrays, the removed
+        # pairs are taken out before the added ones go in
+        removed_refs, removed_owners = (np.asarray(x, dtype=np.int64) for x in removed)
+        positions, pairs = self._positions(removed_refs)
+        positions = positions[self.__owners[positions] == removed_owners[pairs]]
+        
+        refs = np.delete(self.__refs, positions)
+        owners = np.delete(self.__owners, positions)
+        
+        added = OSMRefIndex(*added)
+        inserts = np.searchsorted(refs, added.__refs)
+        
+        self.__refs = np.insert(refs, inserts, added.__refs)
+        self.__owners = np.insert(owners, inserts, added.__owners)
+
+class OSMCollections ():
+    ONEWAY_FORWARD = ("yes", "true", "1")
+    ONEWAY_BACKWARD = ("-1", "reverse")
+    AREA_TYPES = ("multipolygon", "boundary")
+    
+    def __init__ (self, nodes, ways, relations, node_locations=None):
+        self.__nodes = nodes
+        self.__ways = ways
+        self.__relations = relations
+        self.__node_locations = node_locations
+        
+        self.__node_table = None
+        self.__tag_indexes = {}
+        self.__way_refs = None
+        self.__projections = {}
+        self.__spatial_indexes = None
+        self.__way_indices = None
+        self.__multipolygons = {}
+        self.__node_ways = None
+        self.__member_indexes = {}
+        self.__located_projections = {}
+        self.__relation_slots = None
+        
+    def nodes (self):
+        return self.__nodes
+    
+    def node_table (self):
+        if isinstance(self.__nodes, OSMNodeTable):
+            return self.__nodes
+        
+        if self.__node_table is None:
+            self.__node_table = OSMNodeTable.from_nodes(self.__nodes)
+            
+        return self.__node_table
+    
+    def node_locations (self):
+        return self.__node_locations
+    
+    def _join_refs (self, refs, nodes=False):
+        # Node table and its rows for the refs. With a node location store
+        # the table only holds the nodes of the refs, looked up in the store,
+        # so the nodes themselves need not be in the collection. With nodes
+        # it covers the nodes of the collection as well.
+        if self.__node_locations is None:
+            table = self.node_table()
+        else:
+            ids = np.union1d(refs, self.node_table().ids()) if nodes else np.unique(refs)
+            coordinates = self.__node_locations.get(ids)
+            found = ~np.isnan(coordinates[:,0])
+            table = OSMNodeTable(ids[found], coordinates[found])
+        
+        return table, table.rows(refs)
+    
+    def ways (self):
+        return self.__ways
+    
+    def relations (self):
+        return self.__relations
+    
+    def save (self, path):
+        # Imported here, the snapshot module itself builds on this one
+        from control.snapshot import OSMSnapshot
+        
+        OSMSnapshot.save(self, path)
+        
+    @classmethod
+    def load (cls, path, mmap=False):
+        from control.snapshot import OSMSnapshot
+        
+        return OSMSnapshot.load(path, mmap)
+    
+    def _objects (self, element_type):
+        if element_type == "node":
+            return self.__nodes
+        elif element_type == "way":
+            return self.__ways
+        elif element_type == "relation":
+            return self.__relations
+        else:
+            raise ValueError("Unknown element type: {:s}".format(element_type))
+    
+    def tag_index (self, element_type, stats=None):
+        if element_type not in self.__tag_indexes:
+            with OSMStats.measure(stats, "tag_index") as phase:
+                objects = self._objects(element_type)
+                self.__tag_indexes[element_type] = OSMTagIndex.from_objects(objects)
+                phase.add(len(objects))
+            
+        return self.__tag_indexes[element_type]
+    
+    def build_tag_indexes (self):
+        for element_type in OSMParser.ELEMENT_TAGS:
+            self.tag_index(element_type)
+            
+    def _select (self, element_type, lookup, stats=None):
+        # lookup maps the tag index of the element type to the matching ids
+        with OSMStats.measure(stats, "select_" + element_type + "s") as phase:
+            objects = self._objects(element_type)
+            selected = {
+                    obj_id : objects[obj_id]
+                    for obj_id in lookup(self.tag_index(element_type, stats))
+                }
+            phase.add(len(selected))
+            
+        return selected
+    
+    def nodes_with_tag (self, key, stats=None):
+        return self._select("node", lambda index: index.ids_with_tag(key), stats)
+        
+    def nodes_with_tag_value (self, key, value, stats=None):
+        return self._select("node", lambda index: index.ids_with_tag_value(key, value), stats)
+    
+    def nodes_with_tag_value_in (self, key, values, stats=None):
+        return self._select("node", lambda index: index.ids_with_tag_value_in(key, values), stats)
+        
+    def ways_with_tag (self, key, stats=None):
+        return self._select("way", lambda index: index.ids_with_tag(key), stats)
+        
+    def ways_with_tag_value (self, key, value, stats=None):
+        return self._select("way", lambda index: index.ids_with_tag_value(key, value), stats)
+    
+    def ways_with_tag_value_in (self, key, values, stats=None):
+        return self._select("way", lambda index: index.ids_with_tag_value_in(key, values), stats)
+    
+    def relations_with_tag (self, key, stats=None):
+        return self._select("relation", lambda index: index.ids_with_tag(key), stats)
+        
+    def relations_with_tag_value (self, key, value, stats=None):
+        return self._select("relation", lambda index: index.ids_with_tag_value(key, value), stats)
+    
+    def relations_with_tag_value_in (self, key, values, stats=None):
+        return self._select("relation", lambda index: index.ids_with_tag_value_in(key, values), stats)
+        
+    def projection (self, method="equirectangular"):
+        return self._projected(method)[0]
+    
+    def projected_coordinates (self, method="equirectangular"):
+        # Node table coordinates in meters, row aligned with node_table().
+        # Projected once per method with one origin shared by all nodes and
+        # ways, read-only since all views hand out slices of it.
+        return self._projected(method)[1]
+    
+    def _projected (self, method):
+        if method not in self.__projections:
+            coordinates = self.node_table().coordinates()
+            projection = OSMProjection.fit(coordinates, method)
+            projected = projection.project(coordinates)
+            projected.flags.writeable = False
+            
+            self.__projections[method] = (projection, projected)
+            
+        return self.__projections[method]
+    
+    def nodes_with_projected_coordinates (self, nodes=None, method="equirectangular"):
+        if nodes is None:
+            nodes = self.__nodes
+        
+        node_ids = list(nodes)
+        table, rows = self._join_refs(np.asarray(node_ids, dtype=np.int64))
+        
+        if self.__node_locations is None:
+            projected = self.projected_coordinates(method)
+        else:
+            projected = self._project_located(table.coordinates(), method)
+        
+        return {
+                node_id : projected[row]
+                for node_id, row in zip(node_ids, rows.tolist())
+                if row != -1
+            }
+    
+    def ways_with_projected_coordinates (self, ways=None, method="equirectangular", missing="truncate"):
+        return dict(self.resolve_way_coordinates(ways, missing, method).items())
+    
+    def nodes_with_coordinates (self, nodes=None):
+        if nodes is None:
+            nodes = self.__nodes
+            
+        coords = {
+                node_id : np.array([nodes[node_id].lat(), nodes[node_id].lon()])
+                for node_id in nodes
+            }
+        return coords
+        
+    @classmethod
+    def _build_way_refs (cls, ways):
+        way_ids = list(ways)
+        refs = [
+                np.asarray(ways[way_id].noderefs(), dtype=np.int64)
+                for way_id in way_ids
+            ]
+        
+        offsets = np.zeros(len(refs) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(x) for x in refs])
+        
+        if len(refs) != 0:
+            refs = np.concatenate(refs)
+        else:
+            refs = np.empty(0, dtype=np.int64)
+            
+        return way_ids, offsets, refs
+    
+    def way_refs (self, ways=None):
+        # All node refs of the ways as one flat int64 array plus offsets,
+        # cached for the full way set
+        if ways is not None:
+            return self._build_way_refs(ways)
+        
+        if self.__way_refs is None:
+            self.__way_refs = self._build_way_refs(self.__ways)
+            
+        return self.__way_refs
+    
+    def _way_indices (self):
+        if self.__way_indices is None:
+            self.__way_indices = {
+                    way_id : i
+                    for i, way_id in enumerate(self.way_refs()[0])
+                }
+            
+        return self.__way_indices
+    
+    def way_index (self, way_id):
+        # Position of a way in the cached way_refs arrays, None if unknown
+        return self._way_indices().get(way_id, None)
+    
+    def _project_located (self, coordinates, method):
+        # Store coordinates share the projection of the collection nodes.
+        # Without any, the projection is fitted on the first coordinates
+        # projected and kept, so later calls share its origin.
+        if len(self.node_table()) != 0:
+            return self.projection(method).project(coordinates)
+        
+        if method not in self.__located_projections and len(coordinates) != 0:
+            self.__located_projections[method] = OSMProjection.fit(coordinates, method)
+        
+        return self.__located_projections.get(method, OSMProjection(method)).project(coordinates)
+    
+    def resolve_way_coordinates (self, ways=None, missing="truncate", projection=None, stats=None):
+        # Resolves all refs with one join against the node table or the node
+        # location store. Refs to unknown nodes are handled per missing:
+        # "truncate" ends a way at its first missing node, "skip" leaves the
+        # missing nodes out and "drop" discards such ways entirely. Ways
+        # left with fewer than two points are always discarded. With a
+        # projection method the geometries are in projected meters.
+        if missing not in OSMWayGeometries.MISSING_MODES:
+            raise ValueError("Unknown missing node mode: {:s}".format(str(missing)))
+        
+        with OSMStats.measure(stats, "way_refs") as phase:
+            way_ids, offsets, refs = self.way_refs(ways)
+            phase.add(len(way_ids))
+            
+        way_count = len(way_ids)
+        lengths = np.diff(offsets)
+        
+        with OSMStats.measure(stats, "node_join") as phase:
+            table, rows = self._join_refs(refs)
+            phase.add(len(refs))
+            
+        found = rows != -1
+        
+        way_index = np.repeat(np.arange(way_count), lengths)
+        absent = ~found
+        
+        if missing == "truncate":
+            positions = np.arange(len(refs)) - offsets[way_index]
+            first_missing = lengths.copy()
+            np.minimum.at(first_missing, way_index[absent], positions[absent])
+            keep = positions < first_missing[way_index]
+        elif missing == "skip":
+            keep = found
+        else:
+            incomplete = np.zeros(way_count, dtype=bool)
+            incomplete[way_index[absent]] = True
+            keep = ~incomplete[way_index]
+            
+        kept_lengths = np.bincount(way_index[keep], minlength=way_count)
+        valid = kept_lengths >= 2
+        keep &= valid[way_index]
+        
+        kept_offsets = np.zeros(np.count_nonzero(valid) + 1, dtype=np.int64)
+        kept_offsets[1:] = np.cumsum(kept_lengths[valid])
+        
+        if projection is None:
+            coordinates = table.coordinates()[rows[keep]]
+        elif self.__node_locations is None:
+            coordinates = self.projected_coordinates(projection)[rows[keep]]
+        else:
+            coordinates = self._project_located(table.coordinates()[rows[keep]], projection)
+        
+        missing_refs = {}
+        
+        if np.any(absent):
+            absent_ways = way_index[absent]
+            splits = np.flatnonzero(np.diff(absent_ways)) + 1
+            
+            for group in np.split(np.flatnonzero(absent), splits):
+                missing_refs[way_ids[way_index[group[0]]]] = refs[group]
+                
+        kept_way_ids = [
+                way_ids[i]
+                for i in np.flatnonzero(valid).tolist()
+            ]
+        
+        return OSMWayGeometries(kept_way_ids, kept_offsets, coordinates, missing_refs)
+        
+    def ways_with_coordinates (self, ways=None, missing="truncate", stats=None):
+        with OSMStats.measure(stats, "ways_with_coordinates") as phase:
+            geometries = dict(self.resolve_way_coordinates(ways, missing, stats=stats).items())
+            phase.add(len(geometries))
+            
+        return geometries
+    
+    def ways_to_graph (self, ways=None, symmetric=True, stats=None):
+        # Returns points and adjacency list over all nodes of the ways
+        with OSMStats.measure(stats, "ways_to_graph") as phase:
+            result = self._ways_to_adjlist(ways, symmetric, stats)
+            phase.add(len(result[0]))
+                
+        return result
+    
+    def ways_to_contracted_graph (self, ways=None, symmetric=True, keep_nodes=None, stats=None):
+        # Dict counterpart of ways_to_csr_graph with contract, only way
+        # endpoints, intersections and keep_nodes become vertices. Returns
+        # points, adjacency list, edge lengths and the node path of every
+        # edge.
+        with OSMStats.measure(stats, "ways_to_contracted_graph") as phase:
+            graph = self.ways_to_csr_graph(ways, symmetric, True, keep_nodes, stats)
+            
+            with OSMStats.measure(stats, "to_dicts"):
+                node_keys = self._node_keys(graph.node_ids())
+                paths = {
+                        tuple(self._node_keys(np.asarray(edge))) : self._node_keys(np.asarray(path))
+                        for edge, path in graph.to_path_adjlist().items()
+                    }
+                result = (graph.to_points(node_keys), graph.to_adjlist(node_keys),
+                          graph.to_weight_adjlist(node_keys), paths)
+                
+            phase.add(len(result[0]))
+            
+        return result
+    
+    def _ways_to_adjlist (self, ways, symmetric, stats):
+        # The refs are joined against the node table or the node location
+        # store first, located maps the found node keys to their rows
+        with OSMStats.measure(stats, "node_join") as phase:
+            refs = self.way_refs(ways)[2]
+            table, rows = self._join_refs(refs)
+            found = rows != -1
+            located = dict(zip(self._node_keys(refs[found]), rows[found].tolist()))
+            phase.add(len(refs))
+        
+        if ways is None:
+            ways = self.__ways
+        
+        all_noderefs = set()
+        adjlist = defaultdict(set)
+        
+        with OSMStats.measure(stats, "adjacency") as phase:
+            for way_id in ways:
+                way = ways[way_id]
+                
+                c_adjlist = way.adjacency_list(symmetric)
+                
+                for node_id in c_adjlist:
+                    if node_id in located:
+                        all_noderefs.add(node_id)
+                        adjs = c_adjlist[node_id]
+                        
+                        for adj in adjs:
+                            if adj in located:
+                                all_noderefs.add(adj)
+                                adjlist[node_id].add(adj)
+                                
+            phase.add(len(ways))
+            
+        with OSMStats.measure(stats, "points") as phase:
+            coordinates = table.coordinates()
+            all_noderefs = {
+                    x : coordinates[located[x]].copy()
+                    for x in all_noderefs
+                }
+            phase.add(len(all_noderefs))
+            
+        return all_noderefs, adjlist
+    
+    def _way_directions (self, ways, way_ids, symmetric):
+        # 0 for ways usable in both directions, 1 for forward only and -1
+        # for backward only oneways
+        directions = np.zeros(len(way_ids), dtype=np.int8)
+        
+        if symmetric:
+            return directions
+        
+        for i, way_id in enumerate(way_ids):
+            oneway = ways[way_id].tags().get("oneway", None)
+            
+            if oneway in self.ONEWAY_FORWARD:
+                directions[i] = 1
+            elif oneway in self.ONEWAY_BACKWARD:
+                directions[i] = -1
+                
+        return directions
+    
+    def _way_segments (self, ways=None, symmetric=True):
+        # Directed segments between consecutive refs of the ways as rows of
+        # the returned node table, segments touching missing nodes are left
+        # out
+        if ways is None:
+            ways = self.__ways
+            
+        way_ids, offsets, refs = self.way_refs(ways)
+        way_index = np.repeat(np.arange(len(way_ids)), np.diff(offsets))
+        table, rows = self._join_refs(refs)
+        
+        consecutive = way_index[1:] == way_index[:-1]
+        sources = rows[:-1][consecutive]
+        targets = rows[1:][consecutive]
+        segment_ways = way_index[:-1][consecutive]
+        
+        valid = (sources != -1) & (targets != -1) & (sources != targets)
+        sources = sources[valid]
+        targets = targets[valid]
+        segment_ways = segment_ways[valid]
+        
+        directions = self._way_directions(ways, way_ids, symmetric)[segment_ways]
+        forward = directions >= 0
+        backward = directions <= 0
+        
+        return (table, np.concatenate((sources[forward], targets[backward])),
+                np.concatenate((targets[forward], sources[backward])))
+    
+    def _contracted_segments (self, ways=None, symmetric=True, keep_nodes=None):
+        # Chains of segments between vertices as single edges. Vertices are
+        # the ends of every run of found refs, nodes referenced more than
+        # once and keep_nodes. Returns the node table, source and target
+        # rows, the summed lengths and the node rows along every edge as
+        # (offsets, rows).
+        if ways is None:
+            ways = self.__ways
+            
+        way_ids, offsets, refs = self.way_refs(ways)
+        table, rows = self._join_refs(refs)
+        found = rows != -1
+        safe_rows = np.maximum(rows, 0)
+        way_index = np.repeat(np.arange(len(way_ids)), np.diff(offsets))
+        
+        # segment[p] marks a segment from ref p to ref p+1 of the same way
+        segment = np.zeros(len(rows), dtype=bool)
+        segment[:-1] = (way_index[1:] == way_index[:-1]) & found[:-1] & found[1:]
+        previous = np.zeros(len(rows), dtype=bool)
+        previous[1:] = segment[:-1]
+        
+        occurrences = np.bincount(rows[found], minlength=len(table))
+        vertex = found & (~previous | ~segment | (occurrences[safe_rows] > 1))
+        
+        if keep_nodes is not None:
+            keep_rows = table.rows(np.asarray(list(keep_nodes), dtype=np.int64))
+            keep = np.zeros(len(table), dtype=bool)
+            keep[keep_rows[keep_rows != -1]] = True
+            vertex |= found & keep[safe_rows]
+            
+        # Every segment belongs to the chain of the last vertex before it
+        starts = np.flatnonzero(segment)
+        chains = np.cumsum(vertex)[starts]
+        lengths = OSMGraph.haversine(table.coordinates()[rows[starts]],
+                                     table.coordinates()[rows[starts + 1]])
+        
+        first = np.flatnonzero(np.diff(chains, prepend=-1))
+        last = np.append(first[1:], len(starts)) - 1
+        
+        path_starts = starts[first]
+        path_lengths = starts[last] + 2 - path_starts
+        weights = np.add.reduceat(lengths, first) if len(first) != 0 else lengths
+        
+        sources = rows[path_starts]
+        targets = rows[path_starts + path_lengths - 1]
+        directions = self._way_directions(ways, way_ids, symmetric)[way_index[path_starts]]
+        
+        forward = (directions >= 0) & (sources != targets)
+        backward = (directions <= 0) & (sources != targets)
+        
+        path_rows = np.concatenate((
+                rows[OSMGraph.range_positions(path_starts[forward], path_lengths[forward])],
+                rows[OSMGraph.range_positions(path_starts[backward], path_lengths[backward], True)]
+            ))
+        path_offsets = np.zeros(np.count_nonzero(forward) + np.count_nonzero(backward) + 1, dtype=np.int64)
+        path_offsets[1:] = np.cumsum(np.concatenate((path_lengths[forward], path_lengths[backward])))
+        
+        return (table, np.concatenate((sources[forward], targets[backward])),
+                np.concatenate((targets[forward], sources[backward])),
+                np.concatenate((weights[forward], weights[backward])),
+                (path_offsets, path_rows))
+    
+    def snap_to_graph (self, graph, nodes, k=1, ways=None):
+        # Nearest graph node ids for every node of the given node dict, in
+        # one batched spatial index query. With ways only graph nodes lying
+        # on those ways are candidates, e.g. to snap to certain highway
+        # classes. Returns an id for k=1, otherwise arrays of k ids.
+        node_ids = list(nodes)
+        table, rows = self._join_refs(np.asarray(node_ids, dtype=np.int64))
+        
+        found = rows != -1
+        node_ids = [
+                node_id
+                for node_id, is_found in zip(node_ids, found.tolist())
+                if is_found
+            ]
+        
+        mask = None
+        
+        if ways is not None:
+            mask = np.isin(graph.node_ids(), self.way_refs(ways)[2])
+        
+        _, indices = graph.nearest_nodes(table.coordinates()[rows[found]], k, mask)
+        graph_ids = np.where(indices != -1, graph.node_ids()[np.maximum(indices, 0)], -1)
+        
+        if k == 1:
+            return dict(zip(node_ids, graph_ids[:,0].tolist()))
+        else:
+            return dict(zip(node_ids, graph_ids))
+    
+    def ways_to_csr_graph (self, ways=None, symmetric=True, contract=False, keep_nodes=None, stats=None):
+        # Array based counterpart of ways_to_graph. With symmetric=False
+        # edges follow the way direction and oneway tags are respected.
+        # With contract chains of nodes are collapsed, only way endpoints,
+        # nodes shared between or within ways and keep_nodes stay vertices.
+        # The edges then have the summed length and keep their node path.
+        with OSMStats.measure(stats, "ways_to_csr_graph") as phase:
+            paths = None
+            
+            with OSMStats.measure(stats, "contract" if contract else "segments") as segment_phase:
+                if contract:
+                    table, sources, targets, weights, (path_offsets, path_rows) = self._contracted_segments(
+                            ways, symmetric, keep_nodes)
+                    paths = (path_offsets, table.ids()[path_rows])
+                else:
+                    table, sources, targets = self._way_segments(ways, symmetric)
+                    weights = OSMGraph.haversine(table.coordinates()[sources], table.coordinates()[targets])
+                    
+                segment_phase.add(len(sources))
+                
+            with OSMStats.measure(stats, "from_edges"):
+                node_rows = np.unique(np.concatenate((sources, targets)))
+                coordinates = table.coordinates()[node_rows]
+                
+                graph = OSMGraph.from_edges(table.ids()[node_rows], coordinates,
+                                            np.searchsorted(node_rows, sources),
+                                            np.searchsorted(node_rows, targets),
+                                            weights, paths)
+                
+            phase.add(graph.edge_count())
+            
+        return graph
+    
+    @classmethod
+    def _way_boxes (cls, coordinates, rows, offsets):
+        # (min_lat, min_lon, max_lat, max_lon) of every way over its found
+        # refs, ways without any found ref get an empty inverted box
+        way_count = len(offsets) - 1
+        boxes = np.empty((way_count, 4), dtype=np.float64)
+        boxes[:,:2] = np.inf
+        boxes[:,2:] = -np.inf
+        
+        found = rows != -1
+        way_index = np.repeat(np.arange(way_count), np.diff(offsets))[found]
+        points = coordinates[rows[found]]
+        
+        if len(points) != 0:
+            present, starts = np.unique(way_index, return_index=True)
+            boxes[present,:2] = np.minimum.reduceat(points, starts, axis=0)
+            boxes[present,2:] = np.maximum.reduceat(points, starts, axis=0)
+            
+        return boxes
+    
+    def _relation_boxes (self, relation_ids, way_boxes, way_indices, table):
+        boxes = np.empty((len(relation_ids), 4), dtype=np.float64)
+        boxes[:,:2] = np.inf
+        boxes[:,2:] = -np.inf
+        
+        for i, relation_id in enumerate(relation_ids):
+            for member in self.__relations[relation_id].members():
+                if member.type() == "way" and member.ref() in way_indices:
+                    box = way_boxes[way_indices[member.ref()]]
+                elif member.type() == "node":
+                    row = table.row(member.ref())
+                    
+                    if row == -1:
+                        continue
+                    
+                    box = np.tile(table.coordinates()[row], 2)
+                else:
+                    continue
+                
+                boxes[i,:2] = np.minimum(boxes[i,:2], box[:2])
+                boxes[i,2:] = np.maximum(boxes[i,2:], box[2:])
+                
+        return boxes
+    
+    @classmethod
+    def _stitch_rings (cls, way_ids, offsets, refs, slots):
+        # Joins the ways at the given slots of the flat way refs at matching
+        # end nodes into closed rings. Returns the rings as (way_ids, refs)
+        # and the way ids left open. The end nodes of all ways are looked up
+        # and sorted at once, only the walk along a chain goes way by way
+        # since every step depends on the end the previous one reached.
+        slot_ids = [way_ids[slot] for slot in slots]
+        slots = np.asarray(slots, dtype=np.int64)
+        starts = offsets[slots]
+        lengths = offsets[slots + 1] - starts
+        linear = lengths >= 2
+        
+        if not np.any(linear):
+            return [], slot_ids
+                
+        firsts = np.where(linear, refs[np.minimum(starts, len(refs) - 1)], -1)
+        lasts = np.where(linear, refs[np.maximum(starts + lengths - 1, 0)], -1)
+        closed = linear & (firsts == lasts)
+        
+        # Both end nodes of every open way, sorted by node and then by way
+        # so the ways sharing an end node are tried in member order
+        chained = np.flatnonzero(linear & ~closed)
+        end_nodes = np.concatenate((firsts[chained], lasts[chained]))
+        end_ways = np.concatenate((chained, chained))
+        order = np.lexsort((end_ways, end_nodes))
+        end_nodes = end_nodes[order]
+        end_ways = end_ways[order].tolist()
+        
+        def segment (i):
+            return refs[starts[i]:starts[i] + lengths[i]]
+        
+        rings = [
+                ([slot_ids[i]], segment(i))
+                for i in np.flatnonzero(closed).tolist()
+            ]
+        open_ways = [
+                slot_ids[i]
+                for i in np.flatnonzero(~linear).tolist()
+            ]
+        
+        firsts = firsts.tolist()
+        lasts = lasts.tolist()
+        used = np.zeros(len(slots), dtype=bool)
+        
+        for i in chained.tolist():
+            if used[i]:
+                continue
+            
+            used[i] = True
+            chain = [slot_ids[i]]
+            parts = [segment(i)]
+            start = firsts[i]
+            end = lasts[i]
+            
+            while end != start:
+                low = np.searchsorted(end_nodes, end, "left")
+                high = np.searchsorted(end_nodes, end, "right")
+                following = [
+                        j
+                        for j in end_ways[low:high]
+                        if not used[j]
+                    ]
+                
+                if len(following) == 0:
+                    break
+                
+                j = following[0]
+                used[j] = True
+                next_refs = segment(j)
+                
+                if firsts[j] != end:
+                    next_refs = next_refs[::-1]
+                
+                chain.append(slot_ids[j])
+                parts.append(next_refs[1:])
+                end = int(next_refs[-1])
+                
+            if end == start:
+                rings.append((chain, np.concatenate(parts)))
+            else:
+                open_ways.extend(chain)
+                
+        return rings, open_ways
+    
+    def multipolygons (self, relations=None):
+        # Assembled areas of all multipolygon and boundary relations, or of
+        # the given relation dict. Results are cached per relation. The
+        # rings of all relations not cached yet are resolved against the
+        # node table in one join, rings with missing nodes are left out.
+        if relations is None:
+            relations = self.relations_with_tag_value_in("type", self.AREA_TYPES)
+            
+        way_ids, offsets, refs = self.way_refs()
+        assembled = []
+        
+        for relation_id in relations:
+            if relation_id in self.__multipolygons:
+                continue
+            
+            slots = {"outer" : [], "inner" : []}
+            open_ways = []
+            
+            for member in relations[relation_id].members():
+                if member.type() != "way":
+                    continue
+                
+                role = "inner" if member.role() == "inner" else "outer"
+                i = self.way_index(member.ref())
+                
+                if i is None:
+                    open_ways.append(member.ref())
+                else:
+                    slots[role].append(i)
+                    
+            outer, outer_open = self._stitch_rings(way_ids, offsets, refs, slots["outer"])
+            inner, inner_open = self._stitch_rings(way_ids, offsets, refs, slots["inner"])
+            assembled.append((relation_id, outer, inner, open_ways + outer_open + inner_open))
+            
+        ring_refs = [
+                ring_refs
+                for _, outer, inner, _ in assembled
+                for _, ring_refs in outer + inner
+            ]
+        
+        if len(ring_refs) != 0:
+            ring_offsets = np.zeros(len(ring_refs) + 1, dtype=np.int64)
+            ring_offsets[1:] = np.cumsum([len(x) for x in ring_refs])
+            table, rows = self._join_refs(np.concatenate(ring_refs))
+            
+            ring_complete = np.logical_and.reduceat(rows != -1, ring_offsets[:-1]).tolist()
+            coordinates = table.coordinates()[np.maximum(rows, 0)]
+            ring_coordinates = np.split(coordinates, ring_offsets[1:-1])
+            
+        ring = 0
+        
+        for relation_id, outer, inner, open_ways in assembled:
+            rings = {"outer" : [], "inner" : []}
+            
+            for role, role_rings in (("outer", outer), ("inner", inner)):
+                for ring_ways, _ in role_rings:
+                    if ring_complete[ring]:
+                        rings[role].append(ring_coordinates[ring])
+                    else:
+                        open_ways.extend(ring_ways)
+                        
+                    ring += 1
+                    
+            self.__multipolygons[relation_id] = OSMMultipolygon(relation_id, rings["outer"],
+                                                                rings["inner"], open_ways)
+            
+        return {
+                relation_id : self.__multipolygons[relation_id]
+                for relation_id in relations
+            }
+    
+    def multipolygon (self, relation_id):
+        return self.multipolygons({relation_id : self.__relations[relation_id]})[relation_id]
+    
+    def _spatial_indexes (self):
+        # Grid over the node coordinates and R-trees over the way and
+        # relation bounding boxes, built once for all extracts. With a node
+        # location store the grid covers the nodes of the collection and
+        # the way refs located in the store, the last entry is the table
+        # the grid and the way ref rows refer to.
+        if self.__spatial_indexes is None:
+            way_ids, offsets, refs = self.way_refs()
+            table, rows = self._join_refs(refs, nodes=True)
+            way_boxes = self._way_boxes(table.coordinates(), rows, offsets)
+            
+            way_indices = {
+                    way_id : i
+                    for i, way_id in enumerate(way_ids)
+                }
+            relation_ids = list(self.__relations)
+            relation_boxes = self._relation_boxes(relation_ids, way_boxes, way_indices, table)
+            
+            self.__spatial_indexes = [GridIndex(table.coordinates()), rows,
+                                      PackedRTree(way_boxes), relation_ids,
+                                      PackedRTree(relation_boxes), table]
+            self.__relation_slots = {
+                    relation_id : i
+                    for i, relation_id in enumerate(relation_ids)
+                }
+            
+        return self.__spatial_indexes
+    
+    def _node_keys (self, ids):
+        # Node table ids back to the keys of the node dict, which are
+        # strings unless parsed with integer ids
+        ids = ids.tolist()
+        
+        if self._integer_ids():
+            return ids
+        
+        return [str(node_id) for node_id in ids]
+    
+    def extract (self, area):
+        # Sub-collection for a (min_lat, min_lon, max_lat, max_lon) box or a
+        # lat/lon polygon: the nodes inside the area, the ways with at least
+        # one node inside together with all of their nodes, and the
+        # relations with a member node inside or a member way among those.
+        # The indexes are built on the first call, later extracts only touch
+        # the candidates.
+        area = ExtractArea(area)
+        bounds = area.bounds()
+        node_index, rows, way_index, relation_ids, relation_index, table = self._spatial_indexes()
+        coordinates = table.coordinates()
+        
+        candidates = node_index.query_box(bounds[:2], bounds[2:])
+        inside_rows = candidates[area.contains(coordinates[candidates])]
+        
+        way_ids, offsets, _ = self.way_refs()
+        candidate_ways = way_index.query(bounds)
+        starts = offsets[candidate_ways]
+        lengths = offsets[candidate_ways + 1] - starts
+        positions = OSMGraph.range_positions(starts, lengths)
+        
+        way_rows = rows[positions]
+        owners = np.repeat(np.arange(len(candidate_ways)), lengths)
+        hit = np.zeros(len(candidate_ways), dtype=bool)
+        hit[owners[np.isin(way_rows, inside_rows)]] = True
+        
+        selected_rows = way_rows[hit[owners] & (way_rows != -1)]
+        node_rows = np.union1d(inside_rows, selected_rows)
+        
+        if self.__node_locations is not None:
+            # Nodes only located in the store stay there
+            node_rows = node_rows[self.node_table().rows(table.ids()[node_rows]) != -1]
+        
+        node_ids = table.ids()[node_rows]
+        
+        ways = {
+                way_ids[i] : self.__ways[way_ids[i]]
+                for i in candidate_ways[hit].tolist()
+            }
+        
+        if isinstance(self.__nodes, OSMNodeTable):
+            tagged = self.__nodes.tagged()
+            nodes = OSMNodeTable(node_ids, coordinates[node_rows], {
+                    node_id : tagged[node_id]
+                    for node_id in node_ids.tolist()
+                    if node_id in tagged
+                })
+        else:
+            nodes = {
+                    node_id : self.__nodes[node_id]
+                    for node_id in self._node_keys(node_ids)
+                }
+        
+        inside_ids = set(self._node_keys(table.ids()[inside_rows]))
+        relations = {}
+        
+        for i in relation_index.query(bounds).tolist():
+            relation = self.__relations[relation_ids[i]]
+            
+            for member in relation.members():
+                if ((member.type() == "node" and member.ref() in inside_ids)
+                        or (member.type() == "way" and member.ref() in ways)):
+                    relations[relation_ids[i]] = relation
+                    break
+                
+        return OSMCollections(nodes, ways, relations, self.__node_locations)
+
+    def _integer_ids (self):
+        if isinstance(self.__nodes, OSMNodeTable):
+            return True
+        
+        for objects in (self.__nodes, self.__ways, self.__relations):
+            for obj_id in objects:
+                return not isinstance(obj_id, str)
+        
+        return True
+    
+    def _int_ids (self, ids):
+        return np.fromiter((int(obj_id) for obj_id in ids), dtype=np.int64, count=len(ids))
+    
+    def _keys (self, ids):
+        # int64 way or relation ids back to the keys of their dicts
+        ids = ids.tolist()
+        
+        if self._integer_ids():
+            return ids
+        
+        return [str(obj_id) for obj_id in ids]
+    
+    def _node_way_index (self):
+        # Nodes to the ways referencing them, built from the way refs once
+        # and kept up to date by apply_change
+        if self.__node_ways is None:
+            way_ids, offsets, refs = self.way_refs()
+            self.__node_ways = OSMRefIndex(refs, np.repeat(self._int_ids(way_ids), np.diff(offsets)))
+        
+        return self.__node_ways
+    
+    @classmethod
+    def _member_pairs (cls, relations, member_type):
+        # (ref, relation id) pairs of the members of one type as int64
+        pairs = [
+                (int(member.ref()), int(relation_id))
+                for relation_id, relation in relations.items()
+                if relation is not None
+                for member in relation.members()
+                if member.type() == member_type
+            ]
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        
+        return pairs[:,0], pairs[:,1]
+    
+    def _member_index (self, member_type):
+        # Node or way members to the relations holding them
+        if member_type not in self.__member_indexes:
+            self.__member_indexes[member_type] = OSMRefIndex(*self._member_pairs(self.__relations, member_type))
+        
+        return self.__member_indexes[member_type]
+    
+    def _ways_with_nodes (self, node_ids):
+        # Ways referencing any of the node ids
+        if len(node_ids) == 0:
+            return []
+        
+        return self._keys(self._node_way_index().owners(node_ids))
+    
+    def _update_objects (self, element_type, changes):
+        # changes maps ids to their new element or None for deletions. A
+        # tag index that was already built is updated per element.
+        objects = self._objects(element_type)
+        index = self.__tag_indexes.get(element_type, None)
+        
+        for obj_id, obj in changes.items():
+            old = objects.get(obj_id, None)
+            
+            if index is not None and old is not None:
+                index.remove(obj_id, old.tags())
+            
+            if obj is None:
+                objects.pop(obj_id, None)
+            else:
+                objects[obj_id] = obj
+                
+                if index is not None:
+                    index.add(obj_id, obj.tags())
+    
+    def _updated_node_table (self, table, changes):
+        # Merges the node changes into a node table, returns the new table
+        # and its OSMRowChanges
+        written = [
+                node
+                for node in changes.values()
+                if node is not None
+            ]
+        deleted = [
+                int(node_id)
+                for node_id, node in changes.items()
+                if node is None
+            ]
+        coordinates = np.array([(node.lat(), node.lon()) for node in written], dtype=np.float64)
+        tags = {
+                int(node.id()) : node.tags()
+                for node in written
+                if len(node.tags()) != 0
+            }
+        
+        return table.updated([int(node.id()) for node in written], coordinates, tags, deleted)
+    
+    def _update_nodes (self, changes):
+        if not isinstance(self.__nodes, OSMNodeTable):
+            self._update_objects("node", changes)
+            
+            if self.__node_table is None:
+                return
+            
+            old_table = self.__node_table
+            self.__node_table, rows = self._updated_node_table(old_table, changes)
+        else:
+            index = self.__tag_indexes.get("node", None)
+            
+            if index is not None:
+                for node_id, node in changes.items():
+                    row = self.__nodes.row(node_id)
+                    
+                    if row != -1:
+                        index.remove(node_id, self.__nodes.tags_at(row))
+                    
+                    if node is not None:
+                        index.add(node_id, node.tags())
+            
+            old_table = self.__nodes
+            self.__nodes, rows = self._updated_node_table(old_table, changes)
+        
+        self._update_node_rows(old_table, rows)
+    
+    def _update_node_rows (self, old_table, changes):
+        # Carries the caches aligned with the node table rows over: the
+        # projections keep their origin and only project the changed
+        # nodes, the node grid moves them between its cells and the node
+        # rows of the way refs are remapped
+        table = self.node_table()
+        
+        for method, (projection, projected) in list(self.__projections.items()):
+            projected = changes.patch(projected, lambda rows: projection.project(table.coordinates()[rows]))
+            projected.flags.writeable = False
+            self.__projections[method] = (projection, projected)
+        
+        if self.__spatial_indexes is not None:
+            remap = changes.remap(np.arange(len(old_table)))
+            remap[changes.modified()] = -1
+            added = np.concatenate((changes.inserted(), changes.rewritten()))
+            
+            self.__spatial_indexes[0] = self.__spatial_indexes[0].updated(table.coordinates(), remap, added)
+            
+            if changes.shifted():
+                self.__spatial_indexes[1] = changes.remap(self.__spatial_indexes[1])
+            
+            self.__spatial_indexes[5] = table
+    
+    def _update_node_locations (self, changes):
+        # Writes the node changes through to the node location store, which
+        # resolves the way refs instead of the node table
+        if self.__node_locations is None:
+            return
+        
+        written = [
+                node
+                for node in changes.values()
+                if node is not None
+            ]
+        
+        self.__node_locations.set([int(node.id()) for node in written],
+                                  np.round([(node.lat(), node.lon()) for node in written], 6).reshape(-1, 2))
+        self.__node_locations.delete([
+                int(node_id)
+                for node_id, node in changes.items()
+                if node is None
+            ])
+    
+    def _update_way_refs (self, changes, moved_ways):
+        # Patches the way refs and what is built on them for the changed
+        # ways. A deleted way is replaced by the last one and new ways are
+        # appended, so all other ways keep their position. The ways in
+        # moved_ways only get their node rows and boxes refreshed.
+        if self.__way_refs is None:
+            return
+        
+        way_ids, offsets, refs = self.__way_refs
+        way_ids = list(way_ids)
+        indices = self._way_indices()
+        count = len(way_ids)
+        sources = np.arange(count)
+        removed = []
+        removed_refs = [np.empty(0, dtype=np.int64)]
+        removed_owners = [np.empty(0, dtype=np.int64)]
+        
+        for way_id, way in changes.items():
+            slot = indices.get(way_id, None)
+            
+            if slot is None:
+                continue
+            
+            old_refs = refs[offsets[slot]:offsets[slot+1]]
+            removed_refs.append(old_refs)
+            removed_owners.append(np.full(len(old_refs), int(way_id), dtype=np.int64))
+            
+            if way is None:
+                count -= 1
+                del indices[way_id]
+                
+                if slot != count:
+                    way_ids[slot] = way_ids[count]
+                    indices[way_ids[slot]] = slot
+                    sources[slot] = sources[count]
+                
+                way_ids.pop()
+                removed.append(slot)
+        
+        segments = {}
+        
+        for way_id, way in changes.items():
+            if way is None:
+                continue
+            
+            if way_id not in indices:
+                indices[way_id] = len(way_ids)
+                way_ids.append(way_id)
+            
+            segments[indices[way_id]] = np.asarray(way.noderefs(), dtype=np.int64)
+        
+        sources = np.concatenate((sources[:count], np.full(len(way_ids) - count, -1, dtype=np.int64)))
+        slots = np.fromiter(segments, dtype=np.int64, count=len(segments))
+        sources[slots] = -1
+        
+        # -1 picks the appended zero length
+        lengths = np.append(np.diff(offsets), 0)[sources]
+        lengths[slots] = [len(x) for x in segments.values()]
+        new_offsets = np.zeros(len(way_ids) + 1, dtype=np.int64)
+        new_offsets[1:] = np.cumsum(lengths)
+        
+        copied = np.flatnonzero(sources != -1)
+        targets = OSMGraph.range_positions(new_offsets[copied], lengths[copied])
+        origins = OSMGraph.range_positions(offsets[sources[copied]], lengths[copied])
+        new_refs = np.empty(new_offsets[-1], dtype=np.int64)
+        new_refs[targets] = refs[origins]
+        
+        for slot, segment in segments.items():
+            new_refs[new_offsets[slot]:new_offsets[slot+1]] = segment
+        
+        self.__way_refs = (way_ids, new_offsets, new_refs)
+        
+        if self.__node_ways is not None:
+            added_refs = np.concatenate([np.empty(0, dtype=np.int64)] + list(segments.values()))
+            added_owners = np.repeat(self._int_ids([way_ids[slot] for slot in segments]),
+                                     [len(x) for x in segments.values()])
+            self.__node_ways.update((np.concatenate(removed_refs), np.concatenate(removed_owners)),
+                                   (added_refs, added_owners))
+        
+        if self.__spatial_indexes is not None:
+            rows = np.full(len(new_refs), -1, dtype=np.int64)
+            rows[targets] = self.__spatial_indexes[1][origins]
+            way_tree = self.__spatial_indexes[2]
+            
+            for slot in removed:
+                way_tree.remove(slot)
+            
+            way_tree.append(np.tile(PackedRTree.EMPTY_BOX, (len(way_ids) - len(way_tree), 1)))
+            
+            refreshed = set(segments)
+            refreshed.update(indices[way_id] for way_id in moved_ways if way_id in indices)
+            refreshed = np.array(sorted(refreshed), dtype=np.int64)
+            
+            table = self.node_table()
+            positions = OSMGraph.range_positions(new_offsets[refreshed], lengths[refreshed])
+            rows[positions] = table.rows(new_refs[positions])
+            
+            local_offsets = np.zeros(len(refreshed) + 1, dtype=np.int64)
+            local_offsets[1:] = np.cumsum(lengths[refreshed])
+            way_tree.update(refreshed, self._way_boxes(table.coordinates(), rows[positions], local_offsets))
+            
+            self.__spatial_indexes[1] = rows
+    
+    def _update_relations (self, changes, affected_ways, node_ids):
+        # Relation side of apply_change: member indexes, multipolygons and
+        # the relation R-tree. changes holds the old relations, the new
+        # ones are already in place.
+        if len(self.__member_indexes) != 0:
+            for member_type, index in self.__member_indexes.items():
+                index.update(self._member_pairs(changes, member_type),
+                             self._member_pairs({
+                                     relation_id : self.__relations.get(relation_id, None)
+                                     for relation_id in changes
+                                 }, member_type))
+        
+        if len(self.__multipolygons) == 0 and self.__spatial_indexes is None:
+            return
+        
+        affected = set(changes)
+        affected.update(self._keys(self._member_index("way").owners(self._int_ids(affected_ways))))
+        
+        for relation_id in affected:
+            self.__multipolygons.pop(relation_id, None)
+        
+        if self.__spatial_indexes is None:
+            return
+        
+        affected.update(self._keys(self._member_index("node").owners(node_ids)))
+        relation_ids = self.__spatial_indexes[3]
+        relation_tree = self.__spatial_indexes[4]
+        slots = self.__relation_slots
+        
+        for relation_id in changes:
+            if relation_id in self.__relations or relation_id not in slots:
+                continue
+            
+            slot = slots.pop(relation_id)
+            last = relation_ids.pop()
+            
+            if slot != len(relation_ids):
+                relation_ids[slot] = last
+                slots[last] = slot
+            
+            relation_tree.remove(slot)
+        
+        for relation_id in changes:
+            if relation_id in self.__relations and relation_id not in slots:
+                slots[relation_id] = len(relation_ids)
+                relation_ids.append(relation_id)
+                relation_tree.append(PackedRTree.EMPTY_BOX)
+        
+        updated = [
+                relation_id
+                for relation_id in affected
+                if relation_id in slots
+            ]
+        member_ways = {
+                member.ref() : None
+                for relation_id in updated
+                for member in self.__relations[relation_id].members()
+                if member.type() == "way" and self.way_index(member.ref()) is not None
+            }
+        way_boxes = self.__spatial_indexes[2].boxes([self.way_index(way_id) for way_id in member_ways])
+        way_indices = {
+                way_id : i
+                for i, way_id in enumerate(member_ways)
+            }
+        
+        relation_tree.update([slots[relation_id] for relation_id in updated],
+                             self._relation_boxes(updated, way_boxes, way_indices, self.node_table()))
+    
+    def apply_change (self, filepath, stats=None):
+        # Applies the create, modify and delete actions of an osmChange file
+        # in place, later actions on the same element win. A node location
+        # store gets the changed coordinates as well. The cost follows
+        # the size of the diff: changed elements are found through reverse
+        # indexes from nodes to ways and from members to relations, tag
+        # indexes are updated per element, and the way refs, projections and
+        # spatial indexes are patched for the changed rows instead of being
+        # rebuilt, only copying their arrays once. Cached multipolygons are
+        # dropped for the changed relations and the ones with an affected
+        # member way. Returns an OSMChangeSummary, its affected ways are the
+        # ones whose geometries and graph edges have to be rebuilt.
+        summary = OSMChangeSummary()
+        changes = {element_type : {} for element_type in OSMParser.ELEMENT_TAGS}
+        
+        with OSMStats.measure(stats, "read") as phase:
+            for action, element_type, obj_id, obj in OSMParser.iter_change(filepath, self._integer_ids()):
+                changes[element_type][obj_id] = obj
+                summary.add(action, element_type, obj_id)
+            
+            phase.add(len(summary))
+        
+        with OSMStats.measure(stats, "apply") as phase:
+            node_ids = self._int_ids(changes["node"])
+            moved_ways = self._ways_with_nodes(node_ids)
+            summary.add_affected_ways(moved_ways)
+            summary.add_affected_ways(changes["way"])
+            
+            old_relations = {
+                    relation_id : self.__relations.get(relation_id, None)
+                    for relation_id in changes["relation"]
+                }
+            
+            if self.__node_locations is not None:
+                # Spatial indexes over store coordinates are not aligned
+                # with the node table rows, they are rebuilt on demand
+                self.__spatial_indexes = None
+            
+            self._update_nodes(changes["node"])
+            self._update_node_locations(changes["node"])
+            self._update_objects("way", changes["way"])
+            self._update_way_refs(changes["way"], moved_ways)
+            self._update_objects("relation", changes["relation"])
+            self._update_relations(old_relations, summary.affected_ways(), node_ids)
+            
+            phase.add(len(summary))
+        
+        return summary
+
+class OSMTagFilter ():
+    # Picklable tag predicate for the parser filters: matches elements
+    # having the key, or having the key with one of the given values.
+    def __init__ (self, key, values=None):
+        if isinstance(values, str):
+            values = (values,)
+        
+        self.__key = key
+        self.__values = None if values is None else frozenset(values)
+        
+    def __call__ (self, tags):
+        if self.__values is None:
+            return self.__key in tags
+        else:
+            return tags.get(self.__key, None) in self.__values
+        
+    def __repr__ (self):
+        # Stable across runs, snapshots use it to tell filtered parses apart
+        if self.__values is None:
+            return "OSMTagFilter({:s})".format(repr(self.__key))
+        else:
+            return "OSMTagFilter({:s}, {:s})".format(repr(self.__key), repr(sorted(self.__values)))
+        
+class OSMCollectionsBuilder ():
+    # Collects parsed elements into an OSMCollections and applies the
+    # parser filters. Nodes rejected by the node filter are only kept as
+    # bare coordinates until the ways are known, afterwards the ones
+    # referenced by kept ways are added back without tags. With a node
+    # location store all coordinates go into the store instead, rejected
+    # nodes are not added back then.
+    LOCATION_BATCH = 1 << 16
+    
+    def __init__ (self, columnar=False, integer_ids=False, node_filter=None,
+                  way_filter=None, relation_filter=None, prune_nodes=False,
+                  node_locations=None):
+        self.__columnar = columnar
+        self.__integer_ids = integer_ids
+        self.__node_filter = node_filter
+        self.__way_filter = way_filter
+        self.__relation_filter = relation_filter
+        self.__prune_nodes = prune_nodes
+        
+        self.__nodes = OSMNodeTableBuilder() if columnar else {}
+        self.__ways = {}
+        self.__relations = {}
+        
+        self.__node_locations = node_locations
+        self.__located_nodes = OSMNodeTableBuilder()
+        
+        if node_locations is not None:
+            self.__pending_nodes = None
+            self.__way_refs = None
+        elif node_filter is not None or prune_nodes:
+            self.__pending_nodes = OSMNodeTableBuilder()
+            self.__way_refs = []
+        else:
+            self.__pending_nodes = None
+            self.__way_refs = None
+            
+    def _keeps_node (self, tags):
+        if self.__node_filter is not None:
+            return self.__node_filter(tags)
+        elif self.__prune_nodes:
+            return len(tags) != 0
+        else:
+            return True
+        
+    def _flush_locations (self):
+        if len(self.__located_nodes) != 0:
+            ids, coordinates = self.__located_nodes.columns()
+            self.__node_locations.set(ids, np.round(coordinates, 6))
+            self.__located_nodes = OSMNodeTableBuilder()
+    
+    def add_node (self, node_id, lat, lon, tags):
+        if self.__node_locations is not None:
+            self.__located_nodes.add(int(node_id), lat, lon, {})
+            
+            if len(self.__located_nodes) >= self.LOCATION_BATCH:
+                self._flush_locations()
+        
+        if not self._keeps_node(tags):
+            if self.__pending_nodes is not None:
+                self.__pending_nodes.add(int(node_id), lat, lon, {})
+        elif self.__columnar:
+            self.__nodes.add(node_id, lat, lon, tags)
+        else:
+            self.__nodes[node_id] = OSMNode(node_id, tags, np.round(lat, 6), np.round(lon, 6))
+    
+    def add_nodes (self, ids, coordinates, tagged):
+        # Batch variant of add_node for decoders producing node columns,
+        # tagged maps row indices of the batch to their tags
+        keep = np.full(len(ids), self._keeps_node({}), dtype=bool)
+        
+        for row in tagged:
+            keep[row] = self._keeps_node(tagged[row])
+        
+        if self.__node_locations is not None:
+            self.__node_locations.set(ids, np.round(coordinates, 6))
+            
+        if self.__pending_nodes is not None:
+            self.__pending_nodes.extend(ids[~keep], coordinates[~keep])
+            
+        if self.__columnar:
+            self.__nodes.extend(ids[keep], coordinates[keep], {
+                    int(ids[row]) : tagged[row]
+                    for row in tagged
+                    if keep[row]
+                })
+        else:
+            coordinates = np.round(coordinates, 6)
+            
+            for row in np.flatnonzero(keep).tolist():
+                node_id = int(ids[row]) if self.__integer_ids else str(ids[row])
+                self.__nodes[node_id] = OSMNode(node_id, tagged.get(row, {}),
+                                                coordinates[row, 0], coordinates[row, 1])
+    
+    def add_block (self, block):
+        # Adds the columns decoded by a parser worker: node id, coordinate
+        # and tag batches plus way and relation tuples
+        # Strings unpickled from a worker are only shared within a block, so
+        # the tags are interned again here
+        node_ids, node_coordinates, node_tags, ways, relations = block
+        
+        for ids, coordinates, tagged in zip(node_ids, node_coordinates, node_tags):
+            tagged = {
+                    row : OSMObject.intern_tags(tagged[row])
+                    for row in tagged
+                }
+            self.add_nodes(ids, coordinates, tagged)
+        
+        for way_id, tags, refs in ways:
+            self.add_way(OSMWay(way_id, OSMObject.intern_tags(tags), refs))
+        
+        for relation_id, tags, members in relations:
+            members = [
+                    OSMMember(sys.intern(member_type), ref, sys.intern(role))
+                    for member_type, ref, role in members
+                ]
+            self.add_relation(OSMRelation(relation_id, OSMObject.intern_tags(tags), members))
+    
+    def add_way (self, way):
+        if self.__way_filter is not None and not self.__way_filter(way.tags()):
+            return
+        
+        self.__ways[way.id()] = way
+        
+        if self.__way_refs is not None:
+            self.__way_refs.append(np.asarray(way.noderefs(), dtype=np.int64))
+    
+    def add_relation (self, relation):
+        if self.__relation_filter is not None and not self.__relation_filter(relation.tags()):
+            return
+        
+        self.__relations[relation.id()] = relation
+        
+    def _resolve_pending_nodes (self):
+        if self.__pending_nodes is None or len(self.__pending_nodes) == 0:
+            return
+        
+        ids, coordinates = self.__pending_nodes.columns()
+        self.__pending_nodes = None
+        
+        if len(self.__way_refs) != 0:
+            refs = np.unique(np.concatenate(self.__way_refs))
+        else:
+            refs = np.empty(0, dtype=np.int64)
+            
+        referenced = np.isin(ids, refs)
+        ids = ids[referenced]
+        coordinates = coordinates[referenced]
+        
+        if self.__columnar:
+            self.__nodes.extend(ids, coordinates)
+        else:
+            coordinates = np.round(coordinates, 6)
+            
+            for node_id, (lat, lon) in zip(ids.tolist(), coordinates):
+                node_id = node_id if self.__integer_ids else str(node_id)
+                self.__nodes[node_id] = OSMNode(node_id, {}, lat, lon)
+    
+    def build (self):
+        self._resolve_pending_nodes()
+        
+        if self.__node_locations is not None:
+            self._flush_locations()
+            self.__node_locations.flush()
+        
+        nodes = self.__nodes.build() if self.__columnar else self.__nodes
+        
+        return OSMCollections(nodes, self.__ways, self.__relations, self.__node_locations)
+
+class OSMHandler ():
+    # Callbacks driven by OSMParser.apply while the elements stream in,
+    # nothing is kept for them afterwards. Subclasses override the ones
+    # they need. With a batch size node gets OSMNodeTables and way and
+    # relation get lists of up to that many elements, in file order.
+    def node (self, obj):
+        pass
+    
+    def way (self, obj):
+        pass
+    
+    def relation (self, obj):
+        pass
+
+class OSMLocatedWay (OSMWay):
+    # Way handed to an OSMHandler together with the (n, 2) lat/lon of its
+    # nodes, NaN for nodes that did not come before the way
+    __slots__ = ("__locations",)
+    
+    def __init__ (self, objid, tags, noderefs, locations):
+        super().__init__(objid, tags, noderefs)
+        
+        self.__locations = locations
+    
+    def locations (self):
+        return self.__locations
+
+class OSMHandlerDispatcher ():
+    # Takes the place of OSMCollectionsBuilder when the parser drives an
+    # OSMHandler, elements are handed on instead of collected. Batches are
+    # flushed when full and whenever the element type changes, so the
+    # handler sees the file order. With locations the node coordinates are
+    # kept for the ways in an OSMNodeLocations store, which is the only
+    # state growing with the file. locations is either such a store or
+    # True for an in-memory SortedNodeLocations.
+    def __init__ (self, handler, batch_size=None, locations=False, integer_ids=False):
+        self.__handler = handler
+        self.__batch_size = batch_size
+        self.__integer_ids = integer_ids
+        
+        self.__nodes = OSMNodeTableBuilder()
+        self.__ways = []
+        self.__relations = []
+        
+        if locations is True:
+            locations = SortedNodeLocations()
+        elif locations is False:
+            locations = None
+        
+        self.__locations = locations
+        self.__pending_locations = OSMNodeTableBuilder()
+    
+    def _flush_nodes (self):
+        if len(self.__nodes) != 0:
+            self.__handler.node(self.__nodes.build())
+            self.__nodes = OSMNodeTableBuilder()
+    
+    def _flush_ways (self):
+        if len(self.__ways) != 0:
+            self.__handler.way(self._locate(self.__ways))
+            self.__ways = []
+    
+    def _flush_relations (self):
+        if len(self.__relations) != 0:
+            self.__handler.relation(self.__relations)
+            self.__relations = []
+    
+    def _flush_locations (self):
+        # Single nodes are written to the store in batches
+        if len(self.__pending_locations) != 0:
+            ids, coordinates = self.__pending_locations.columns()
+            self.__locations.set(ids, np.round(coordinates, 6))
+            self.__pending_locations = OSMNodeTableBuilder()
+            
+    def _locate (self, ways):
+        # Resolves the refs of all ways with one lookup
+        if self.__locations is None:
+            return ways
+        
+        self._flush_locations()
+        refs = [np.asarray(way.noderefs(), dtype=np.int64) for way in ways]
+        offsets = np.zeros(len(refs) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(x) for x in refs])
+        
+        coordinates = self.__locations.get(np.concatenate(refs))
+        
+        return [
+                OSMLocatedWay(way.id(), way.tags(), way.noderefs(), coordinates[offsets[i]:offsets[i+1]])
+                for i, way in enumerate(ways)
+            ]
+    
+    def add_node (self, node_id, lat, lon, tags):
+        self._flush_ways()
+        self._flush_relations()
+        
+        if self.__locations is not None:
+            self.__pending_locations.add(int(node_id), lat, lon, {})
+            
+            if len(self.__pending_locations) >= OSMCollectionsBuilder.LOCATION_BATCH:
+                self._flush_locations()
+        
+        if self.__batch_size is None:
+            self.__handler.node(OSMNode(node_id, tags, np.round(lat, 6), np.round(lon, 6)))
+            return
+        
+        self.__nodes.add(int(node_id), lat, lon, tags)
+        
+        if len(self.__nodes) >= self.__batch_size:
+            self._flush_nodes()
+    
+    def add_nodes (self, ids, coordinates, tagged):
+        if self.__batch_size is None:
+            for row in range(len(ids)):
+                node_id = int(ids[row]) if self.__integer_ids else str(ids[row])
+                self.add_node(node_id, coordinates[row, 0], coordinates[row, 1], tagged.get(row, {}))
+            
+            return
+        
+        self._flush_ways()
+        self._flush_relations()
+        
+        if self.__locations is not None:
+            self.__locations.set(ids, np.round(coordinates, 6))
+        
+        # Batch sized slices of the columns, without a call per node
+        start = 0
+        
+        while start < len(ids):
+            end = min(start + self.__batch_size - len(self.__nodes), len(ids))
+            self.__nodes.extend(ids[start:end], coordinates[start:end], {
+                    int(ids[row]) : tagged[row]
+                    for row in tagged
+                    if start <= row < end
+                })
+            start = end
+            
+            if len(self.__nodes) >= self.__batch_size:
+                self._flush_nodes()
+    
+    def add_block (self, block):
+        node_ids, node_coordinates, node_tags, ways, relations = block
+        
+        for ids, coordinates, tagged in zip(node_ids, node_coordinates, node_tags):
+            self.add_nodes(ids, coordinates, tagged)
+        
+        for way_id, tags, refs in ways:
+            self.add_way(OSMWay(way_id, tags, refs))
+        
+        for relation_id, tags, members in relations:
+            members = [
+                    OSMMember(member_type, ref, role)
+                    for member_type, ref, role in members
+                ]
+            self.add_relation(OSMRelation(relation_id, tags, members))
+    
+    def add_way (self, way):
+        self._flush_nodes()
+        self._flush_relations()
+        
+        if self.__batch_size is None:
+            self.__handler.way(self._locate([way])[0])
+            return
+        
+        self.__ways.append(way)
+        
+        if len(self.__ways) >= self.__batch_size:
+            self._flush_ways()
+    
+    def add_relation (self, relation):
+        self._flush_nodes()
+        self._flush_ways()
+        
+        if self.__batch_size is None:
+            self.__handler.relation(relation)
+            return
+        
+        self.__relations.append(relation)
+        
+        if len(self.__relations) >= self.__batch_size:
+            self._flush_relations()
+    
+    def build (self):
+        self._flush_nodes()
+        self._flush_ways()
+        self._flush_relations()
+        
+        if self.__locations is not None:
+            self._flush_locations()
+            self.__locations.flush()
+        
+        return self.__handler
+
+class OSMParser():
+    ELEMENT_TAGS = ("node", "way", "relation")
+    ELEMENT_START_TAGS = (b"<node ", b"<way ", b"<relation ")
+    CHANGE_ACTIONS = ("create", "modify", "delete")
+    
+    # Streaming parses of files from PARALLEL_MIN_BYTES on are split into
+    # chunks of about CHUNK_BYTES and parsed by a process pool
+    PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+    CHUNK_BYTES = 16 * 1024 * 1024
+    
+    @classmethod
+    def _parse_tags (cls, elem):
+        tags = {}
+        
+        for tag_elem in elem.findall("tag"):
+            tags[tag_elem.get("k")] = tag_elem.get("v")
+            
+        return OSMObject.intern_tags(tags)
+    
+    @classmethod
+    def _parse_id (cls, value, integer_ids):
+        if integer_ids:
+            return int(value)
+        else:
+            return value
+    
+    @classmethod
+    def _parse_node (cls, node, integer_ids=False):
+        node_id = cls._parse_id(node.get("id"), integer_ids)
+        lat = np.round(float(node.get("lat")), 6)
+        lon = np.round(float(node.get("lon")), 6)
+        
+        tags = cls._parse_tags(node)
+        
+        return OSMNode(node_id, tags, lat, lon)
+    
+    @classmethod
+    def _parse_way (cls, way, integer_ids=False):
+        way_id = cls._parse_id(way.get("id"), integer_ids)
+        
+        tags = cls._parse_tags(way)
+        
+        if integer_ids:
+            node_refs = np.fromiter((
+                    int(nd.get("ref"))
+                    for nd in way.iterfind("nd")
+                ), dtype=np.int64)
+        else:
+            node_refs = [
+                    nd.get("ref")
+                    for nd in way.findall("nd")
+                ]
+        
+        return OSMWay(way_id, tags, node_refs)
+    
+    @classmethod
+    def _parse_relation (cls, relation, integer_ids=False):
+        relation_id = cls._parse_id(relation.get("id"), integer_ids)
+        
+        tags = cls._parse_tags(relation)
+        members = [
+                OSMMember(sys.intern(member.get("type")), cls._parse_id(member.get("ref"), integer_ids),
+                          sys.intern(member.get("role")))
+                for member in relation.findall("member")
+            ]
+        
+        return OSMRelation(relation_id, tags, members)
+    
+    @classmethod
+    def _add_element (cls, builder, elem, integer_ids):
+        if elem.tag == "node":
+            builder.add_node(cls._parse_id(elem.get("id"), integer_ids),
+                             float(elem.get("lat")), float(elem.get("lon")),
+                             cls._parse_tags(elem))
+        elif elem.tag == "way":
+            builder.add_way(cls._parse_way(elem, integer_ids))
+        else:
+            builder.add_relation(cls._parse_relation(elem, integer_ids))
+    
+    @classmethod
+    def _iterparse (cls, filepath):
+        # Yields every top level node/way/relation element once it is
+        # complete. The root is cleared after each element, so only the
+        # element currently being handled is kept in memory.
+        context = ElementTree.iterparse(filepath, events=("start", "end"))
+        _, root = next(context)
+        
+        for event, elem in context:
+            if event == "end" and elem.tag in cls.ELEMENT_TAGS:
+                yield elem
+                root.clear()
+    
+    @classmethod
+    def iter_change (cls, filepath, integer_ids=False):
+        # Streams an osmChange file as (action, element type, id, element)
+        # tuples in file order, the element being None for deletions. Each
+        # action block is cleared after every element, the blocks are not
+        # children of the root any more once that is cleared. Compressed
+        # files like the .osc.gz diffs of the replication feeds are read
+        # while being decompressed.
+        with OSMInput.open(filepath) as source:
+            yield from cls._iter_change(source, integer_ids)
+    
+    @classmethod
+    def _iter_change (cls, source, integer_ids):
+        context = ElementTree.iterparse(source, events=("start", "end"))
+        _, root = next(context)
+        action = None
+        block = root
+        
+        for event, elem in context:
+            if event == "start":
+                if elem.tag in cls.CHANGE_ACTIONS:
+                    action = elem.tag
+                    block = elem
+            elif elem.tag in cls.CHANGE_ACTIONS:
+                action = None
+                block = root
+                root.clear()
+            elif elem.tag in cls.ELEMENT_TAGS and action is not None:
+                obj_id = cls._parse_id(elem.get("id"), integer_ids)
+                
+                if action == "delete":
+                    yield action, elem.tag, obj_id, None
+                elif elem.tag == "node":
+                    yield action, elem.tag, obj_id, cls._parse_node(elem, integer_ids)
+                elif elem.tag == "way":
+                    yield action, elem.tag, obj_id, cls._parse_way(elem, integer_ids)
+                else:
+                    yield action, elem.tag, obj_id, cls._parse_relation(elem, integer_ids)
+                
+                block.clear()
+    
+    @classmethod
+    def _next_element (cls, f, offset, end):
+        # Offset of the first top level element starting at or after
+        # offset, or end. The windows overlap so no start tag is cut.
+        window = 1 << 20
+        
+        while offset < end:
+            f.seek(offset)
+            data = f.read(window + 16)
+            found = [
+                    position
+                    for position in (data.find(start_tag) for start_tag in cls.ELEMENT_START_TAGS)
+                    if position != -1
+                ]
+            
+            if len(found) != 0:
+                return min(offset + min(found), end)
+            
+            offset += window
+            
+        return end
+    
+    @classmethod
+    def _chunk_ranges (cls, filepath, chunk_bytes):
+        # Byte ranges of about chunk_bytes, each starting at a top level
+        # element. The last one ends before the closing </osm>.
+        size = os.path.getsize(filepath)
+        
+        with open(filepath, "rb") as f:
+            tail_start = max(size - 4096, 0)
+            f.seek(tail_start)
+            closing = f.read().rfind(b"</osm>")
+            end = size if closing == -1 else tail_start + closing
+            
+            boundaries = [cls._next_element(f, 0, end)]
+            
+            while boundaries[-1] < end:
+                boundaries.append(cls._next_element(f, boundaries[-1] + chunk_bytes, end))
+                
+        return list(zip(boundaries[:-1], boundaries[1:]))
+    
+    @classmethod
+    def _parse_chunk (cls, filepath, start, end, integer_ids):
+        # Parses one byte range wrapped into its own <osm> root into the
+        # column block format of OSMCollectionsBuilder.add_block
+        with open(filepath, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        
+        node_ids = array("q")
+        lats = array("d")
+        lons = array("d")
+        node_tags = {}
+        ways = []
+        relations = []
+        
+        for elem in cls._iterparse(io.BytesIO(b"<osm>" + data + b"</osm>")):
+            if elem.tag == "node":
+                tags = cls._parse_tags(elem)
+                
+                if len(tags) != 0:
+                    node_tags[len(node_ids)] = tags
+                
+                node_ids.append(int(elem.get("id")))
+                lats.append(float(elem.get("lat")))
+                lons.append(float(elem.get("lon")))
+            elif elem.tag == "way":
+                way = cls._parse_way(elem, integer_ids)
+                ways.append((way.id(), way.tags(), way.noderefs()))
+            else:
+                relation = cls._parse_relation(elem, integer_ids)
+                relations.append((relation.id(), relation.tags(), [
+                        (member.type(), member.ref(), member.role())
+                        for member in relation.members()
+                    ]))
+        
+        coordinates = np.empty((len(node_ids), 2), dtype=np.float64)
+        coordinates[:,0] = lats
+        coordinates[:,1] = lons
+        
+        return [np.array(node_ids, dtype=np.int64)], [coordinates], [node_tags], ways, relations
+    
+    @classmethod
+    def _parse_parallel (cls, filepath, builder, integer_ids, processes, stats=None):
+        # Chunks are parsed by the workers and merged in file order, with
+        # at most a few chunks per worker in flight. The merge time is
+        # recorded within the read phase, which holds the memory deltas.
+        max_pending = processes * 2
+        pending = deque()
+        merge_seconds = 0.0
+        
+        with OSMStats.measure(stats, "read") as phase, Pool(processes) as pool:
+            ranges = cls._chunk_ranges(filepath, cls.CHUNK_BYTES)
+            
+            for start, end in ranges:
+                pending.append(pool.apply_async(cls._parse_chunk, (filepath, start, end, integer_ids)))
+                
+                if len(pending) >= max_pending:
+                    block = pending.popleft().get()
+                    merge_start = time.perf_counter()
+                    builder.add_block(block)
+                    merge_seconds += time.perf_counter() - merge_start
+                    
+            while len(pending) != 0:
+                block = pending.popleft().get()
+                merge_start = time.perf_counter()
+                builder.add_block(block)
+                merge_seconds += time.perf_counter() - merge_start
+                
+            phase.add(len(ranges))
+            
+            if stats is not None:
+                stats.record("merge", merge_seconds, len(ranges))
+            
+        with OSMStats.measure(stats, "build"):
+            return builder.build()
+    
+    @classmethod
+    def _parse_tree (cls, filepath, builder, integer_ids):
+        root = ElementTree.parse(filepath).getroot()
+        
+        for element_type in cls.ELEMENT_TAGS:
+            for elem in root.findall(element_type):
+                cls._add_element(builder, elem, integer_ids)
+        
+        return builder.build()
+    
+    @classmethod
+    def _parse_stream (cls, filepath, builder, integer_ids, stats=None):
+        if stats is None:
+            for elem in cls._iterparse(filepath):
+                cls._add_element(builder, elem, integer_ids)
+        else:
+            cls._parse_stream_measured(filepath, builder, integer_ids, stats)
+            
+        with OSMStats.measure(stats, "build"):
+            return builder.build()
+    
+    @classmethod
+    def _parse_stream_measured (cls, filepath, builder, integer_ids, stats):
+        # Splits the time between XML decoding and adding the elements by
+        # type. Per element phases would cost more than they measure, so
+        # the times are summed here and recorded once within the read
+        # phase, which holds the memory deltas of the whole loop.
+        clock = time.perf_counter
+        seconds = dict.fromkeys(("xml",) + cls.ELEMENT_TAGS, 0.0)
+        counts = dict.fromkeys(cls.ELEMENT_TAGS, 0)
+        
+        with OSMStats.measure(stats, "read") as phase:
+            decoded = clock()
+        
+            for elem in cls._iterparse(filepath):
+                added = clock()
+                seconds["xml"] += added - decoded
+            
+                cls._add_element(builder, elem, integer_ids)
+            
+                decoded = clock()
+                seconds[elem.tag] += decoded - added
+                counts[elem.tag] += 1
+            
+            phase.add(sum(counts.values()))
+            stats.record("xml", seconds["xml"], sum(counts.values()))
+        
+            for element_type in cls.ELEMENT_TAGS:
+                stats.record(element_type + "s", seconds[element_type], counts[element_type])
+    
+    @classmethod
+    def _parse_with_snapshot (cls, filepath, snapshot, streaming, columnar, integer_ids,
+                              node_filter, way_filter, relation_filter, prune_nodes, processes,
+                              stats=None):
+        # The snapshot is reused while the source file keeps its size and
+        # mtime and the parse options are the same. Filters are compared by
+        # repr, so ad hoc callables never match and always cause a re-parse.
+        # A snapshot that can't be written, e.g. next to a source in a
+        # read-only directory, is skipped, the parse result is still good.
+        from control.snapshot import OSMSnapshot
+        
+        if snapshot is True:
+            snapshot = str(filepath) + ".snapshot"
+            
+        source = OSMSnapshot.source_stamp(filepath)
+        options = {
+                "columnar" : columnar,
+                "integer_ids" : integer_ids or columnar,
+                "node_filter" : repr(node_filter),
+                "way_filter" : repr(way_filter),
+                "relation_filter" : repr(relation_filter),
+                "prune_nodes" : prune_nodes
+            }
+        
+        if OSMSnapshot.matches(snapshot, source, options):
+            with OSMStats.measure(stats, "snapshot_load"):
+                return OSMSnapshot.load(snapshot)
+        
+        collection = cls._parse(filepath, streaming, columnar, integer_ids, node_filter,
+                                way_filter, relation_filter, prune_nodes, processes, None, None,
+                                stats)
+        
+        try:
+            with OSMStats.measure(stats, "snapshot_save"):
+                OSMSnapshot.save(collection, snapshot, source, options)
+        except OSError:
+            pass
+        
+        return collection
+    
+    @classmethod
+    def parse (cls, filepath, streaming=True, columnar=False, integer_ids=False,
+               node_filter=None, way_filter=None, relation_filter=None, prune_nodes=False,
+               processes=None, snapshot=None, stats=None, node_locations=None):
+        # filepath may also be a gzip or bzip2 file or an open binary stream
+        # of either, see OSMInput. With an OSMNodeLocations store as
+        # node_locations the coordinates of all nodes are written to it and
+        # the ways are resolved against it, so a node filter or prune_nodes
+        # can keep the nodes out of memory. With an OSMStats as stats the
+        # phases of the parse are recorded under "parse", counting the
+        # elements of the result
+        with OSMStats.measure(stats, "parse") as phase:
+            collection = cls._parse(filepath, streaming, columnar, integer_ids, node_filter,
+                                    way_filter, relation_filter, prune_nodes, processes,
+                                    snapshot, node_locations, stats)
+            
+            if stats is not None:
+                phase.add(len(collection.nodes()) + len(collection.ways()) + len(collection.relations()))
+                
+        return collection
+    
+    @classmethod
+    def _parse (cls, filepath, streaming, columnar, integer_ids, node_filter, way_filter,
+                relation_filter, prune_nodes, processes, snapshot, node_locations, stats):
+        # Snapshots are stamped with the source file, streams never use one.
+        # A snapshot would not hold the node location store either.
+        if snapshot is not None and node_locations is None and not OSMInput.is_stream(filepath):
+            return cls._parse_with_snapshot(filepath, snapshot, streaming, columnar, integer_ids,
+                                            node_filter, way_filter, relation_filter, prune_nodes,
+                                            processes, stats)
+        
+        if not OSMInput.is_stream(filepath) and str(filepath).endswith(".pbf"):
+            # Imported here, the PBF module itself builds on this one. PBF
+            # files are always decoded block by block, streaming=False has
+            # no tree to build for them and is ignored.
+            from control.pbfparser import PBFParser
+            
+            return PBFParser.parse(filepath, processes, columnar, integer_ids, node_filter,
+                                   way_filter, relation_filter, prune_nodes, node_locations,
+                                   stats)
+        
+        # The node table is keyed by int64 ids, so the columnar mode always
+        # uses integer ids for ways and relations as well
+        integer_ids = integer_ids or columnar
+        
+        # Filters are predicates on the tag dict of an element. Nodes
+        # referenced by a kept way are always kept. With prune_nodes all
+        # other nodes are dropped unless they are tagged.
+        builder = OSMCollectionsBuilder(columnar, integer_ids, node_filter,
+                                        way_filter, relation_filter, prune_nodes, node_locations)
+        
+        return cls._parse_source(filepath, builder, integer_ids, streaming, processes, stats)
+    
+    @classmethod
+    def _parse_source (cls, filepath, builder, integer_ids, streaming=True, processes=None, stats=None):
+        # Feeds an XML source into a builder and returns what it builds
+        if processes is None:
+            processes = os.cpu_count()
+        
+        # Streams and compressed files can't be split into byte ranges, they
+        # are parsed while being decompressed instead
+        if OSMInput.is_stream(filepath) or OSMInput.compression(filepath) is not None:
+            with OSMInput.open(filepath, processes) as source:
+                if streaming:
+                    return cls._parse_stream(source, builder, integer_ids, stats)
+                else:
+                    return cls._parse_tree(source, builder, integer_ids)
+        
+        if streaming and processes > 1 and os.path.getsize(filepath) >= cls.PARALLEL_MIN_BYTES:
+            return cls._parse_parallel(filepath, builder, integer_ids, processes, stats)
+        elif streaming:
+            return cls._parse_stream(filepath, builder, integer_ids, stats)
+        else:
+            return cls._parse_tree(filepath, builder, integer_ids)
+    
+    @classmethod
+    def apply (cls, filepath, handler, batch_size=None, locations=False, integer_ids=False,
+               processes=None):
+        # Streams the elements of an XML or PBF source into the callbacks of
+        # an OSMHandler without building a collection, see OSMHandler for
+        # the batching. With locations, True or an OSMNodeLocations store,
+        # the ways are OSMLocatedWays carrying their node coordinates.
+        # Returns the handler.
+        if not OSMInput.is_stream(filepath) and str(filepath).endswith(".pbf"):
+            from control.pbfparser import PBFParser
+            
+            dispatcher = OSMHandlerDispatcher(handler, batch_size, locations, integer_ids)
+            PBFParser.feed(filepath, dispatcher, processes, integer_ids)
+            
+            return dispatcher.build()
+        
+        dispatcher = OSMHandlerDispatcher(handler, batch_size, locations, integer_ids)
+        
+        return cls._parse_source(filepath, dispatcher, integer_ids, True, processes)
\ No newline at end of file
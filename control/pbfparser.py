@@ -0,0 +1,453 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import time
+import zlib
+import struct
+import numpy as np
+from collections import deque
+from multiprocessing import Pool
+from control.osmparser import OSMCollectionsBuilder
+from control.stats import OSMStats
+
+class ProtobufReader ():
+    # Minimal protobuf wire format decoding, just enough for the OSM PBF
+    # messages. Packed varint fields are decoded with numpy in one go.
+    VARINT = 0
+    FIXED64 = 1
+    LENGTH_DELIMITED = 2
+    FIXED32 = 5
+    
+    @classmethod
+    def read_varint (cls, buf, pos):
+        result = 0
+        shift = 0
+        
+        while True:
+            byte = buf[pos]
+            pos += 1
+            result |= (byte & 0x7f) << shift
+            
+            if byte < 0x80:
+                return result, pos
+            
+            shift += 7
+    
+    @classmethod
+    def fields (cls, buf):
+        # Yields (field number, wire type, value), value being an int for
+        # varints and a memoryview for length delimited fields
+        buf = memoryview(buf)
+        pos = 0
+        end = len(buf)
+        
+        while pos < end:
+            key, pos = cls.read_varint(buf, pos)
+            number = key >> 3
+            wire_type = key & 0x07
+            
+            if wire_type == cls.VARINT:
+                value, pos = cls.read_varint(buf, pos)
+            elif wire_type == cls.LENGTH_DELIMITED:
+                length, pos = cls.read_varint(buf, pos)
+                value = buf[pos:pos+length]
+                pos += length
+            elif wire_type == cls.FIXED64:
+                value = bytes(buf[pos:pos+8])
+                pos += 8
+            elif wire_type == cls.FIXED32:
+                value = bytes(buf[pos:pos+4])
+                pos += 4
+            else:
+                raise ValueError("Unsupported protobuf wire type: {:d}".format(wire_type))
+            
+            yield number, wire_type, value
+    
+    @classmethod
+    def packed_varints (cls, buf):
+        data = np.frombuffer(buf, dtype=np.uint8)
+        
+        if len(data) == 0:
+            return np.empty(0, dtype=np.uint64)
+        
+        ends = np.flatnonzero(data < 0x80)
+        starts = np.empty_like(ends)
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+        
+        lengths = ends - starts + 1
+        shifts = np.arange(len(data)) - np.repeat(starts, lengths)
+        shifts = (shifts * 7).astype(np.uint64)
+        
+        payload = (data & 0x7f).astype(np.uint64) << shifts
+        
+        return np.bitwise_or.reduceat(payload, starts)
+    
+    @classmethod
+    def zigzag (cls, values):
+        values = np.asarray(values, dtype=np.uint64)
+        
+        return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+    
+    @classmethod
+    def zigzag_scalar (cls, value):
+        return (value >> 1) ^ -(value & 1)
+    
+    @classmethod
+    def int64 (cls, value):
+        # Plain int64 fields send negative values as 64 bit two's complement
+        return value - (1 << 64) if value >= (1 << 63) else value
+    
+    @classmethod
+    def repeated (cls, wire_type, value):
+        # Repeated scalar fields may be sent packed or one value per field
+        if wire_type == cls.LENGTH_DELIMITED:
+            return cls.packed_varints(value)
+        else:
+            return np.array([value], dtype=np.uint64)
+    
+    @classmethod
+    def concatenate (cls, chunks):
+        if len(chunks) == 0:
+            return np.empty(0, dtype=np.uint64)
+        elif len(chunks) == 1:
+            return chunks[0]
+        else:
+            return np.concatenate(chunks)
+
+class PBFParser ():
+    SUPPORTED_FEATURES = ("OsmSchema-V0.6", "DenseNodes")
+    MEMBER_TYPES = ("node", "way", "relation")
+    
+    @classmethod
+    def _read_blobs (cls, filepath):
+        # Yields (type, blob bytes) for every fileblock of the file
+        with open(filepath, "rb") as f:
+            while True:
+                header_size = f.read(4)
+                
+                if len(header_size) == 0:
+                    break
+                elif len(header_size) != 4:
+                    raise ValueError("Truncated PBF file: {:s}".format(str(filepath)))
+                
+                header_size, = struct.unpack(">I", header_size)
+                header = f.read(header_size)
+                
+                blob_type = None
+                data_size = 0
+                
+                for number, _, value in ProtobufReader.fields(header):
+                    if number == 1:
+                        blob_type = bytes(value).decode("utf-8")
+                    elif number == 3:
+                        data_size = value
+                
+                yield blob_type, f.read(data_size)
+    
+    @classmethod
+    def _blob_data (cls, blob):
+        for number, _, value in ProtobufReader.fields(blob):
+            if number == 1:
+                return bytes(value)
+            elif number == 3:
+                return zlib.decompress(value)
+            elif number in (4, 5, 6, 7):
+                raise ValueError("Unsupported PBF blob compression (field {:d})".format(number))
+        
+        return b""
+    
+    @classmethod
+    def _check_header (cls, blob):
+        for number, _, value in ProtobufReader.fields(cls._blob_data(blob)):
+            if number == 4:
+                feature = bytes(value).decode("utf-8")
+                
+                if feature not in cls.SUPPORTED_FEATURES:
+                    raise ValueError("Unsupported PBF feature: {:s}".format(feature))
+    
+    @classmethod
+    def _tags (cls, strings, keys, values):
+        return {
+                strings[key] : strings[value]
+                for key, value in zip(keys.tolist(), values.tolist())
+            }
+    
+    @classmethod
+    def _decode_dense (cls, buf, strings, block):
+        ids = []
+        lats = []
+        lons = []
+        keys_vals = []
+        
+        for number, wire_type, value in ProtobufReader.fields(buf):
+            if number == 1:
+                ids.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 8:
+                lats.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 9:
+                lons.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 10:
+                keys_vals.append(ProtobufReader.repeated(wire_type, value))
+        
+        ids = np.cumsum(ProtobufReader.zigzag(ProtobufReader.concatenate(ids)))
+        lats = np.cumsum(ProtobufReader.zigzag(ProtobufReader.concatenate(lats)))
+        lons = np.cumsum(ProtobufReader.zigzag(ProtobufReader.concatenate(lons)))
+        keys_vals = ProtobufReader.concatenate(keys_vals).astype(np.int64)
+        
+        tagged = {}
+        
+        if len(keys_vals) != 0:
+            # Tags of all nodes in one array, every node terminated by a 0
+            ends = np.flatnonzero(keys_vals == 0)
+            starts = np.empty_like(ends)
+            starts[0] = 0
+            starts[1:] = ends[:-1] + 1
+            
+            for row in np.flatnonzero(ends != starts).tolist():
+                pairs = keys_vals[starts[row]:ends[row]]
+                tagged[row] = cls._tags(strings, pairs[0::2], pairs[1::2])
+        
+        block["node_ids"].append(ids)
+        block["node_coordinates"].append(cls._coordinates(lats, lons, block))
+        block["node_tags"].append(tagged)
+    
+    @classmethod
+    def _decode_node (cls, buf, strings, block):
+        node_id = 0
+        lat = 0
+        lon = 0
+        keys = []
+        values = []
+        
+        for number, wire_type, value in ProtobufReader.fields(buf):
+            if number == 1:
+                node_id = ProtobufReader.zigzag_scalar(value)
+            elif number == 2:
+                keys.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 3:
+                values.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 8:
+                lat = ProtobufReader.zigzag_scalar(value)
+            elif number == 9:
+                lon = ProtobufReader.zigzag_scalar(value)
+        
+        tags = cls._tags(strings, ProtobufReader.concatenate(keys), ProtobufReader.concatenate(values))
+        
+        block["node_ids"].append(np.array([node_id], dtype=np.int64))
+        block["node_coordinates"].append(cls._coordinates(np.array([lat]), np.array([lon]), block))
+        block["node_tags"].append({0 : tags} if len(tags) != 0 else {})
+    
+    @classmethod
+    def _decode_way (cls, buf, strings, block):
+        way_id = 0
+        keys = []
+        values = []
+        refs = []
+        
+        for number, wire_type, value in ProtobufReader.fields(buf):
+            if number == 1:
+                way_id = ProtobufReader.int64(value)
+            elif number == 2:
+                keys.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 3:
+                values.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 8:
+                refs.append(ProtobufReader.repeated(wire_type, value))
+        
+        tags = cls._tags(strings, ProtobufReader.concatenate(keys), ProtobufReader.concatenate(values))
+        refs = np.cumsum(ProtobufReader.zigzag(ProtobufReader.concatenate(refs)))
+        
+        block["ways"].append((way_id, tags, refs))
+    
+    @classmethod
+    def _decode_relation (cls, buf, strings, block):
+        relation_id = 0
+        keys = []
+        values = []
+        roles = []
+        refs = []
+        types = []
+        
+        for number, wire_type, value in ProtobufReader.fields(buf):
+            if number == 1:
+                relation_id = ProtobufReader.int64(value)
+            elif number == 2:
+                keys.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 3:
+                values.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 8:
+                roles.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 9:
+                refs.append(ProtobufReader.repeated(wire_type, value))
+            elif number == 10:
+                types.append(ProtobufReader.repeated(wire_type, value))
+        
+        tags = cls._tags(strings, ProtobufReader.concatenate(keys), ProtobufReader.concatenate(values))
+        refs = np.cumsum(ProtobufReader.zigzag(ProtobufReader.concatenate(refs)))
+        members = [
+                (cls.MEMBER_TYPES[member_type], ref, strings[role])
+                for member_type, ref, role in zip(ProtobufReader.concatenate(types).tolist(),
+                                                  refs.tolist(),
+                                                  ProtobufReader.concatenate(roles).tolist())
+            ]
+        
+        block["relations"].append((relation_id, tags, members))
+    
+    @classmethod
+    def _coordinates (cls, lats, lons, block):
+        coordinates = np.empty((len(lats), 2), dtype=np.float64)
+        coordinates[:,0] = (block["lat_offset"] + block["granularity"] * lats) * 1e-9
+        coordinates[:,1] = (block["lon_offset"] + block["granularity"] * lons) * 1e-9
+        
+        return coordinates
+    
+    @classmethod
+    def _decode_block (cls, blob, integer_ids=True):
+        # Decodes one OSMData fileblock into plain columns and tuples, which
+        # are cheap to send back from a worker process
+        data = cls._blob_data(blob)
+        
+        strings = []
+        groups = []
+        block = {
+                "granularity" : 100,
+                "lat_offset" : 0,
+                "lon_offset" : 0,
+                "node_ids" : [],
+                "node_coordinates" : [],
+                "node_tags" : [],
+                "ways" : [],
+                "relations" : []
+            }
+        
+        for number, _, value in ProtobufReader.fields(data):
+            if number == 1:
+                strings = [
+                        bytes(string).decode("utf-8")
+                        for string_number, _, string in ProtobufReader.fields(value)
+                        if string_number == 1
+                    ]
+            elif number == 2:
+                groups.append(value)
+            elif number == 17:
+                block["granularity"] = value
+            elif number == 19:
+                block["lat_offset"] = ProtobufReader.int64(value)
+            elif number == 20:
+                block["lon_offset"] = ProtobufReader.int64(value)
+        
+        # The string table and offsets may follow the groups in the message
+        for group in groups:
+            for number, _, value in ProtobufReader.fields(group):
+                if number == 1:
+                    cls._decode_node(value, strings, block)
+                elif number == 2:
+                    cls._decode_dense(value, strings, block)
+                elif number == 3:
+                    cls._decode_way(value, strings, block)
+                elif number == 4:
+                    cls._decode_relation(value, strings, block)
+        
+        if not integer_ids:
+            # String ids like the XML parser gives without integer_ids, the
+            # builders convert the node ids themselves
+            block["ways"] = [
+                    (str(way_id), tags, [str(ref) for ref in refs.tolist()])
+                    for way_id, tags, refs in block["ways"]
+                ]
+            block["relations"] = [
+                    (str(relation_id), tags, [
+                            (member_type, str(ref), role)
+                            for member_type, ref, role in members
+                        ])
+                    for relation_id, tags, members in block["relations"]
+                ]
+        
+        return block["node_ids"], block["node_coordinates"], block["node_tags"], \
+            block["ways"], block["relations"]
+    
+    @classmethod
+    def _data_blobs (cls, filepath):
+        for blob_type, blob in cls._read_blobs(filepath):
+            if blob_type == "OSMHeader":
+                cls._check_header(blob)
+            elif blob_type == "OSMData":
+                yield blob
+    
+    @classmethod
+    def _add_block (cls, builder, decode, seconds):
+        # Adds the block returned by decode and sums the time of both steps
+        start = time.perf_counter()
+        block = decode()
+        decoded = time.perf_counter()
+        builder.add_block(block)
+        
+        seconds["decode"] += decoded - start
+        seconds["merge"] += time.perf_counter() - decoded
+    
+    @classmethod
+    def _decode_parallel (cls, filepath, builder, processes, integer_ids, seconds):
+        # At most a few blocks per worker are in flight, so memory stays
+        # bounded while blocks are merged in file order. Returns the number
+        # of blocks.
+        max_pending = processes * 4
+        pending = deque()
+        blocks = 0
+        
+        with Pool(processes) as pool:
+            for blob in cls._data_blobs(filepath):
+                pending.append(pool.apply_async(cls._decode_block, (blob, integer_ids)))
+                blocks += 1
+                
+                if len(pending) >= max_pending:
+                    cls._add_block(builder, pending.popleft().get, seconds)
+            
+            while len(pending) != 0:
+                cls._add_block(builder, pending.popleft().get, seconds)
+        
+        return blocks
+    
+    @classmethod
+    def parse (cls, filepath, processes=None, columnar=False, integer_ids=True, node_filter=None,
+               way_filter=None, relation_filter=None, prune_nodes=False, node_locations=None,
+               stats=None):
+        # Without integer_ids the ids are strings as in the XML parser, the
+        # columnar mode always uses integer ids
+        integer_ids = integer_ids or columnar
+        builder = OSMCollectionsBuilder(columnar, integer_ids, node_filter,
+                                        way_filter, relation_filter, prune_nodes, node_locations)
+        cls.feed(filepath, builder, processes, integer_ids, stats)
+        
+        with OSMStats.measure(stats, "build"):
+            return builder.build()
+    
+    @classmethod
+    def feed (cls, filepath, builder, processes=None, integer_ids=True, stats=None):
+        # Adds all decoded blocks to a builder in file order. Like the XML
+        # parser the whole loop is measured as the read phase, within it the
+        # time spent decoding the blocks, or waiting for the workers decoding
+        # them, is recorded as decode and the time adding them as merge.
+        if processes is None:
+            processes = os.cpu_count()
+        
+        seconds = dict.fromkeys(("decode", "merge"), 0.0)
+        
+        with OSMStats.measure(stats, "read") as phase:
+            if processes == 1:
+                blocks = 0
+                
+                for blob in cls._data_blobs(filepath):
+                    cls._add_block(builder, lambda: cls._decode_block(blob, integer_ids), seconds)
+                    blocks += 1
+            else:
+                blocks = cls._decode_parallel(filepath, builder, processes, integer_ids, seconds)
+            
+            phase.add(blocks)
+            
+            if stats is not None:
+                stats.record("decode", seconds["decode"], blocks)
+                stats.record("merge", seconds["merge"], blocks)
\ No newline at end of file
@@ -0,0 +1,127 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import numpy as np
+
+class OSMProjection ():
+    # Projects (n, 2) lat/lon arrays to (n, 2) north/east meters relative to
+    # an origin, keeping the lat/lon column order. "equirectangular" uses
+    # the cosine of a single reference latitude, "utm" the transverse
+    # mercator of one UTM zone on WGS84.
+    METHODS = ("equirectangular", "utm")
+    METERS_PER_DEGREE = 111120.0
+    
+    WGS84_A = 6378137.0
+    WGS84_F = 1 / 298.257223563
+    UTM_SCALE = 0.9996
+    UTM_FALSE_EASTING = 500000.0
+    UTM_FALSE_NORTHING = 10000000.0
+    
+    def __init__ (self, method="equirectangular", reference_lat=0.0, zone=None,
+                  southern=False, origin=None):
+        if method not in self.METHODS:
+            raise ValueError("Unknown projection method: {:s}".format(str(method)))
+        
+        self.__method = method
+        self.__reference_lat = reference_lat
+        self.__zone = zone
+        self.__southern = southern
+        self.__origin = np.zeros(2, dtype=np.float64) if origin is None else np.asarray(origin, dtype=np.float64)
+    
+    @classmethod
+    def utm_zone (cls, lon):
+        return int(np.floor((lon + 180.0) / 6.0)) % 60 + 1
+    
+    @classmethod
+    def fit (cls, coordinates, method="equirectangular"):
+        # Projection centered on the coordinates, with the origin at the
+        # minimum so all projected values are non-negative
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        
+        if len(coordinates) == 0:
+            return cls(method)
+        
+        lower = np.min(coordinates, axis=0)
+        upper = np.max(coordinates, axis=0)
+        center = (lower + upper) / 2
+        
+        projection = cls(method, center[0], cls.utm_zone(center[1]), center[0] < 0)
+        
+        return projection.with_origin(np.min(projection.project(coordinates), axis=0))
+    
+    def method (self):
+        return self.__method
+    
+    def origin (self):
+        return self.__origin
+    
+    def zone (self):
+        return self.__zone
+    
+    def with_origin (self, origin):
+        return OSMProjection(self.__method, self.__reference_lat, self.__zone,
+                             self.__southern, origin)
+    
+    def _equirectangular (self, lats, lons):
+        north = lats * self.METERS_PER_DEGREE
+        east = lons * self.METERS_PER_DEGREE * np.cos(np.radians(self.__reference_lat))
+        
+        return north, east
+    
+    def _utm (self, lats, lons):
+        zone = self.__zone if self.__zone is not None else self.utm_zone(np.mean(lons))
+        
+        e2 = self.WGS84_F * (2 - self.WGS84_F)
+        ep2 = e2 / (1 - e2)
+        
+        lat = np.radians(lats)
+        lon = np.radians(lons)
+        lon0 = np.radians((zone - 1) * 6 - 180 + 3)
+        
+        sin_lat = np.sin(lat)
+        cos_lat = np.cos(lat)
+        tan_lat = np.tan(lat)
+        
+        n = self.WGS84_A / np.sqrt(1 - e2 * sin_lat ** 2)
+        t = tan_lat ** 2
+        c = ep2 * cos_lat ** 2
+        a = cos_lat * (lon - lon0)
+        
+        m = self.WGS84_A * (
+                (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256) * lat
+                - (3 * e2 / 8 + 3 * e2 ** 2 / 32 + 45 * e2 ** 3 / 1024) * np.sin(2 * lat)
+                + (15 * e2 ** 2 / 256 + 45 * e2 ** 3 / 1024) * np.sin(4 * lat)
+                - (35 * e2 ** 3 / 3072) * np.sin(6 * lat)
+            )
+        
+        east = self.UTM_SCALE * n * (
+                a
+                + (1 - t + c) * a ** 3 / 6
+                + (5 - 18 * t + t ** 2 + 72 * c - 58 * ep2) * a ** 5 / 120
+            ) + self.UTM_FALSE_EASTING
+        north = self.UTM_SCALE * (m + n * tan_lat * (
+                a ** 2 / 2
+                + (5 - t + 9 * c + 4 * c ** 2) * a ** 4 / 24
+                + (61 - 58 * t + t ** 2 + 600 * c - 330 * ep2) * a ** 6 / 720
+            ))
+        
+        if self.__southern:
+            north = north + self.UTM_FALSE_NORTHING
+        
+        return north, east
+    
+    def project (self, coordinates):
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        
+        if self.__method == "utm":
+            north, east = self._utm(coordinates[...,0], coordinates[...,1])
+        else:
+            north, east = self._equirectangular(coordinates[...,0], coordinates[...,1])
+        
+        meters = np.empty(coordinates.shape, dtype=np.float64)
+        meters[...,0] = north - self.__origin[0]
+        meters[...,1] = east - self.__origin[1]
+        
+        return meters
\ No newline at end of file
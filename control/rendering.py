@@ -0,0 +1,241 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import numpy as np
+from control.osmgraph import OSMGraph
+
+class OSMRenderer ():
+    # Draws road networks as one batch of (m, 2, 2) segments instead of one
+    # artist per way or edge. Segments keep the lat/lon or north/east column
+    # order of the collection, so y comes first and is flipped for drawing.
+    # line_collection hands them to matplotlib as a single LineCollection,
+    # rasterize draws them straight into an RGB image array with numpy.
+    HIGHWAY_COLORS = {
+            "motorway" : "#e03a3e",
+            "trunk" : "#f07d26",
+            "primary" : "#f2b701",
+            "secondary" : "#80ba27",
+            "tertiary" : "#27a6a4",
+            "unclassified" : "#5a6fd1",
+            "residential" : "#7f7f7f",
+            "living_street" : "#a5a5a5",
+            "service" : "#bfbfbf"
+        }
+    DEFAULT_COLOR = "#4d4d4d"
+    
+    # Samples per raster batch, bounds the memory of large areas
+    RASTER_BATCH = 1 << 22
+    
+    @classmethod
+    def rgb (cls, color):
+        # "#rrggbb" to a float RGB array in [0, 1]
+        color = color.lstrip("#")
+        
+        return np.array([int(color[i:i+2], 16) for i in (0, 2, 4)], dtype=np.float64) / 255
+    
+    @classmethod
+    def highway_class (cls, tags):
+        # Link roads are drawn like the road they belong to
+        highway = tags.get("highway", None)
+        
+        if highway is not None and highway.endswith("_link"):
+            highway = highway[:-len("_link")]
+        
+        return highway
+    
+    @classmethod
+    def way_colors (cls, ways, way_ids):
+        # (n, 3) RGB rows of the ways by highway class, one lookup per way
+        palette = {
+                highway : cls.rgb(color)
+                for highway, color in cls.HIGHWAY_COLORS.items()
+            }
+        default = cls.rgb(cls.DEFAULT_COLOR)
+        
+        colors = [
+                palette.get(cls.highway_class(ways[way_id].tags()), default)
+                for way_id in way_ids
+            ]
+        
+        if len(colors) == 0:
+            return np.empty((0, 3), dtype=np.float64)
+        
+        return np.array(colors)
+    
+    @classmethod
+    def geometry_segments (cls, geometries):
+        # Segments of an OSMWayGeometries or a dict of (n, 2) way geometries
+        # with the index of the owning way per segment, in way order
+        if isinstance(geometries, dict):
+            way_ids = list(geometries)
+            arrays = [np.asarray(geometries[way_id], dtype=np.float64).reshape(-1, 2) for way_id in way_ids]
+            offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(x) for x in arrays])
+            coordinates = np.concatenate(arrays) if len(arrays) != 0 else np.empty((0, 2))
+        else:
+            way_ids = geometries.way_ids()
+            offsets = geometries.offsets()
+            coordinates = geometries.coordinates()
+        
+        lengths = np.maximum(np.diff(offsets) - 1, 0)
+        starts = OSMGraph.range_positions(offsets[:-1], lengths)
+        segments = np.stack((coordinates[starts], coordinates[starts + 1]), axis=1)
+        owners = np.repeat(np.arange(len(lengths)), lengths)
+        
+        return segments, owners, way_ids
+    
+    @classmethod
+    def graph_segments (cls, graph, coordinates=None):
+        # One segment per edge of an OSMGraph, edges in both directions are
+        # drawn once. coordinates are row aligned with the graph nodes and
+        # default to their lat/lon.
+        if coordinates is None:
+            coordinates = graph.coordinates()
+        
+        sources, targets, _ = graph.edges()
+        pairs = np.unique(np.stack((np.minimum(sources, targets), np.maximum(sources, targets)), axis=1), axis=0)
+        
+        return np.stack((coordinates[pairs[:,0]], coordinates[pairs[:,1]]), axis=1)
+    
+    @classmethod
+    def adjlist_segments (cls, points, adjlist):
+        # Segments of a dict adjacency list over a dict of node coordinates
+        segments = [
+                (points[node], points[adj])
+                for node in adjlist
+                for adj in adjlist[node]
+            ]
+        
+        if len(segments) == 0:
+            return np.empty((0, 2, 2), dtype=np.float64)
+        
+        return np.array(segments, dtype=np.float64)
+    
+    @classmethod
+    def line_collection (cls, segments, colors=None, linewidths=1.0, **kwargs):
+        # matplotlib is only needed here, so it is imported on first use
+        from matplotlib.collections import LineCollection
+        
+        if colors is None:
+            colors = cls.DEFAULT_COLOR
+        
+        return LineCollection(np.flip(segments, axis=2), colors=colors, linewidths=linewidths, **kwargs)
+    
+    @classmethod
+    def plot_ways (cls, ax, geometries, ways, **kwargs):
+        # Adds the way geometries colored by highway class to a matplotlib
+        # axis, ways maps the way ids to their OSMWay
+        segments, owners, way_ids = cls.geometry_segments(geometries)
+        colors = cls.way_colors(ways, way_ids)[owners]
+        
+        collection = cls.line_collection(segments, colors, **kwargs)
+        ax.add_collection(collection)
+        ax.autoscale_view()
+        
+        return collection
+    
+    @classmethod
+    def plot_graph (cls, ax, graph, coordinates=None, **kwargs):
+        collection = cls.line_collection(cls.graph_segments(graph, coordinates), **kwargs)
+        ax.add_collection(collection)
+        ax.autoscale_view()
+        
+        return collection
+    
+    @classmethod
+    def bounds (cls, segments):
+        # (min y, min x, max y, max x) of the segments
+        points = segments.reshape(-1, 2)
+        
+        return np.concatenate((np.min(points, axis=0), np.max(points, axis=0)))
+    
+    @classmethod
+    def _clip (cls, pixels, height, width):
+        # Liang-Barsky clipping of (m, 2, 2) pixel segments to the box of
+        # the pixel centers, so clipped ends never round to half a pixel
+        # outside. Returns the clipped segments and which of them are
+        # visible at all.
+        start = pixels[:,0]
+        delta = pixels[:,1] - start
+        enter = np.zeros(len(pixels))
+        leave = np.ones(len(pixels))
+        visible = np.all(np.isfinite(pixels), axis=(1, 2))
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for axis, size in enumerate((height, width)):
+                lower = -start[:,axis] / delta[:,axis]
+                upper = (size - 1 - start[:,axis]) / delta[:,axis]
+                moving = delta[:,axis] != 0
+                
+                enter = np.where(moving, np.maximum(enter, np.minimum(lower, upper)), enter)
+                leave = np.where(moving, np.minimum(leave, np.maximum(lower, upper)), leave)
+                visible &= moving | ((start[:,axis] >= 0) & (start[:,axis] <= size - 1))
+        
+        visible &= enter <= leave
+        clipped = np.stack((start + enter[:,None] * delta, start + leave[:,None] * delta), axis=1)
+        
+        return clipped, visible
+    
+    @classmethod
+    def rasterize (cls, segments, width, height=None, bounds=None, colors=None, background="#ffffff"):
+        # Draws the segments into a (height, width, 3) uint8 image, row 0
+        # at the top. The segments are clipped to the image first, then
+        # every one is sampled once per pixel along its longer axis, so no
+        # segment takes more samples than the image is wide and high. All
+        # samples of a batch are placed with one fancy index, later
+        # segments overwrite earlier ones. Without a height
+        # the aspect ratio of the bounds is kept, which suits projected
+        # coordinates. colors is one "#rrggbb" or (m, 3) RGB rows.
+        segments = np.asarray(segments, dtype=np.float64).reshape(-1, 2, 2)
+        
+        if bounds is None:
+            bounds = cls.bounds(segments) if len(segments) != 0 else np.array([0.0, 0.0, 1.0, 1.0])
+        
+        bounds = np.asarray(bounds, dtype=np.float64)
+        extent = np.maximum(bounds[2:] - bounds[:2], np.finfo(np.float64).tiny)
+        
+        if height is None:
+            height = max(int(round(width * extent[0] / extent[1])), 1)
+        
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        image[...] = np.round(cls.rgb(background) * 255)
+        
+        if colors is None:
+            colors = cls.DEFAULT_COLOR
+        
+        if isinstance(colors, str):
+            colors = np.repeat(cls.rgb(colors)[None], len(segments), axis=0)
+        
+        colors = np.round(np.asarray(colors, dtype=np.float64) * 255).astype(np.uint8)
+        
+        # Pixel positions with rows growing downwards, y being the first column
+        scale = np.array([height - 1, width - 1]) / extent
+        pixels = (segments - bounds[:2]) * scale
+        pixels[...,0] = (height - 1) - pixels[...,0]
+        
+        pixels, visible = cls._clip(pixels, height, width)
+        pixels = pixels[visible]
+        colors = colors[visible]
+        
+        steps = np.ceil(np.max(np.abs(pixels[:,1] - pixels[:,0]), axis=1)).astype(np.int64) + 1
+        steps = np.minimum(steps, height + width)
+        ends = np.cumsum(steps)
+        first = 0
+        
+        while first < len(pixels):
+            last = max(int(np.searchsorted(ends, ends[first] - steps[first] + cls.RASTER_BATCH)), first + 1)
+            batch_steps = steps[first:last]
+            owners = np.repeat(np.arange(first, last), batch_steps)
+            local = np.arange(len(owners)) - np.repeat(np.cumsum(batch_steps) - batch_steps, batch_steps)
+            t = (local / np.maximum(steps[owners] - 1, 1))[:,None]
+            
+            points = np.round(pixels[owners,0] + t * (pixels[owners,1] - pixels[owners,0])).astype(np.int64)
+            inside = ((points[:,0] >= 0) & (points[:,0] < height)
+                      & (points[:,1] >= 0) & (points[:,1] < width))
+            
+            image[points[inside,0], points[inside,1]] = colors[owners[inside]]
+            first = last
+        
+        return image
\ No newline at end of file
@@ -0,0 +1,329 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import math
+import heapq
+import numpy as np
+from control.shortestpath import ShortestPathEngine
+
+class OSMLandmarks ():
+    # ALT preprocessing: exact distances from and to a few landmark nodes.
+    # By the triangle inequality they bound every distance from below,
+    # d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L), which
+    # steers the searches of the router towards the target. forward holds
+    # d(L, v) and backward d(v, L) as (landmarks, nodes) arrays, inf where
+    # there is no path. The tables belong to the graph with the same node
+    # ids and can be saved to reuse them with it.
+    def __init__ (self, landmarks, node_ids, forward, backward):
+        self.__landmarks = landmarks
+        self.__node_ids = node_ids
+        self.__forward = forward
+        self.__backward = backward
+    
+    @classmethod
+    def compute (cls, graph, count=16, processes=None, seed=0):
+        # Farthest selection: the first landmark is the node farthest from
+        # a random start, every further one the node farthest from all
+        # landmarks so far, which places them around the border of the
+        # network. The selection needs one search after the other, the
+        # backward searches on the reversed graph then run in one batch.
+        node_count = graph.node_count()
+        nodes = np.arange(node_count)
+        forward = np.empty((min(count, node_count), node_count))
+        landmarks = []
+        
+        if node_count != 0:
+            start = int(np.random.default_rng(seed).integers(node_count))
+            
+            with ShortestPathEngine(graph, 1) as engine:
+                nearest = engine.distance_matrix([start], nodes)[0]
+                
+                while len(landmarks) < len(forward):
+                    scores = np.where(np.isfinite(nearest), nearest, -1.0)
+                    scores[landmarks] = -1.0
+                    landmark = int(np.argmax(scores))
+                    
+                    if scores[landmark] < 0:
+                        break
+                    
+                    forward[len(landmarks)] = engine.distance_matrix([landmark], nodes)[0]
+                    nearest = forward[0] if len(landmarks) == 0 else np.minimum(nearest, forward[len(landmarks)])
+                    landmarks.append(landmark)
+        
+        landmarks = np.array(landmarks, dtype=np.int64)
+        forward = forward[:len(landmarks)]
+        
+        if len(landmarks) != 0:
+            backward = graph.reverse().distance_matrix(landmarks, nodes, processes=processes)
+        else:
+            backward = np.empty((0, node_count))
+        
+        return cls(landmarks, graph.node_ids().copy(), forward, backward)
+    
+    def landmarks (self):
+        return self.__landmarks
+    
+    def node_ids (self):
+        return self.__node_ids
+    
+    def forward (self):
+        return self.__forward
+    
+    def backward (self):
+        return self.__backward
+    
+    def matches (self, graph):
+        return np.array_equal(self.__node_ids, graph.node_ids())
+    
+    def save (self, path):
+        np.savez(path, landmarks=self.__landmarks, node_ids=self.__node_ids,
+                 forward=self.__forward, backward=self.__backward)
+    
+    @classmethod
+    def load (cls, path):
+        with np.load(path) as data:
+            return cls(data["landmarks"], data["node_ids"], data["forward"], data["backward"])
+
+class OSMRouter ():
+    # Point-to-point shortest paths between node indices of an OSMGraph.
+    # dijkstra searches from both ends at once, astar goes from the source
+    # only but towards the target, bidirectional_astar combines both. Its
+    # nodes cost two bounds each, so plain A* usually finishes first and
+    # is what OSMGraph.route uses. The lower bounds of A* are the great
+    # circle distances, which no road beats, and with landmarks the larger
+    # ALT bounds as well. Searches touch only the nodes they reach, over
+    # memoryviews of the CSR arrays of the graph and of its reverse. Every
+    # query returns the distance in meters and the node indices of the path,
+    # inf and an empty path if there is none.
+    
+    # Landmark distances of unreachable nodes, far above any real bound
+    UNREACHABLE = 1e15
+    
+    # The bounds are shrunk by rounding noise, so the haversine sum of a
+    # way never ends up below the bound of its ends
+    BOUND_SCALE = 1 - 1e-9
+    
+    def __init__ (self, graph, landmarks=None):
+        if landmarks is not None and not landmarks.matches(graph):
+            raise ValueError("The landmarks belong to a graph with other nodes")
+        
+        reverse = graph.reverse()
+        coordinates = graph.coordinates()
+        
+        self.__graph = graph
+        self.__arrays = (
+                (memoryview(graph.indptr()), memoryview(graph.indices()), memoryview(graph.weights())),
+                (memoryview(reverse.indptr()), memoryview(reverse.indices()), memoryview(reverse.weights()))
+            )
+        self.__lat = np.radians(coordinates[:,0]).tolist()
+        self.__lon = np.radians(coordinates[:,1]).tolist()
+        self.__cos_lat = np.cos(np.radians(coordinates[:,0])).tolist()
+        self.__landmark_bounds = None
+        
+        if landmarks is not None and len(landmarks.landmarks()) != 0:
+            # One (nodes, 2 * landmarks) row array [d(L, v), -d(v, L)], so
+            # both kinds of bounds of a node come from one row difference
+            forward = np.where(np.isfinite(landmarks.forward()), landmarks.forward(), self.UNREACHABLE)
+            backward = np.where(np.isfinite(landmarks.backward()), landmarks.backward(), self.UNREACHABLE)
+            self.__landmark_bounds = np.ascontiguousarray(np.concatenate((forward, -backward)).T)
+    
+    def graph (self):
+        return self.__graph
+    
+    def _bound (self, node, to_node=True):
+        # Lower bound function of d(v, node), or of d(node, v) without
+        # to_node, inf for nodes the landmarks prove unconnected
+        lat = self.__lat
+        lon = self.__lon
+        cos_lat = self.__cos_lat
+        lat_node = lat[node]
+        lon_node = lon[node]
+        cos_node = cos_lat[node]
+        scale = 2 * self.__graph.EARTH_RADIUS * self.BOUND_SCALE
+        bounds = self.__landmark_bounds
+        
+        def haversine (v):
+            a = (math.sin((lat[v] - lat_node) / 2) ** 2
+                 + cos_node * cos_lat[v] * math.sin((lon[v] - lon_node) / 2) ** 2)
+            
+            return scale * math.asin(math.sqrt(min(a, 1.0)))
+        
+        if bounds is None:
+            return haversine
+        
+        row = bounds[node]
+        unreachable = self.UNREACHABLE / 2
+        
+        def bound (v):
+            if to_node:
+                landmark = (row - bounds[v]).max()
+            else:
+                landmark = (bounds[v] - row).max()
+            
+            if landmark >= unreachable:
+                return np.inf
+            
+            return max(haversine(v), float(landmark) * self.BOUND_SCALE)
+        
+        return bound
+    
+    def _cached (self, function):
+        cache = {}
+        
+        def cached (v):
+            if v not in cache:
+                cache[v] = function(v)
+            
+            return cache[v]
+        
+        return cached
+    
+    @classmethod
+    def _path (cls, parents, node):
+        nodes = [node]
+        
+        while parents[nodes[-1]] != -1:
+            nodes.append(parents[nodes[-1]])
+        
+        return nodes
+    
+    @classmethod
+    def _unreached (cls):
+        return np.inf, np.empty(0, dtype=np.int64)
+    
+    def astar (self, source, target):
+        source = int(source)
+        target = int(target)
+        indptr, indices, weights = self.__arrays[0]
+        bound = self._cached(self._bound(target))
+        
+        if bound(source) == np.inf:
+            return self._unreached()
+        
+        distances = {source : 0.0}
+        parents = {source : -1}
+        settled = set()
+        heap = [(bound(source), 0.0, source)]
+        
+        while len(heap) != 0:
+            _, distance, node = heapq.heappop(heap)
+            
+            if node in settled:
+                continue
+            
+            if node == target:
+                return distance, np.array(self._path(parents, node)[::-1], dtype=np.int64)
+            
+            settled.add(node)
+            
+            for j in range(indptr[node], indptr[node+1]):
+                neighbor = indices[j]
+                candidate = distance + weights[j]
+                
+                if candidate < distances.get(neighbor, np.inf):
+                    estimate = bound(neighbor)
+                    
+                    if estimate == np.inf:
+                        continue
+                    
+                    distances[neighbor] = candidate
+                    parents[neighbor] = node
+                    heapq.heappush(heap, (candidate + estimate, candidate, neighbor))
+        
+        return self._unreached()
+    
+    def _bidirectional (self, source, target, potential=None):
+        # Forward search on the graph and backward search on its reverse,
+        # always advancing the one with the smaller queue. The heaps are
+        # keyed by distance plus potential, the forward potential of a node
+        # and its backward one sum to zero, so both searches run on the
+        # same reduced costs and may stop once the two smallest keys add
+        # up to the best path found. Nodes without a potential are known
+        # to lie on no path and are skipped.
+        source = int(source)
+        target = int(target)
+        
+        if source == target:
+            return 0.0, np.array([source], dtype=np.int64)
+        
+        if potential is None:
+            potentials = (lambda v: 0.0, lambda v: 0.0)
+        else:
+            def backward (v):
+                key = potential(v)
+                
+                return None if key is None else -key
+            
+            potentials = (potential, backward)
+            
+            if potential(source) is None or potential(target) is None:
+                return self._unreached()
+        
+        distances = ({source : 0.0}, {target : 0.0})
+        parents = ({source : -1}, {target : -1})
+        settled = (set(), set())
+        heaps = ([(potentials[0](source), 0.0, source)], [(potentials[1](target), 0.0, target)])
+        best = np.inf
+        meeting = -1
+        
+        while len(heaps[0]) != 0 and len(heaps[1]) != 0:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            _, distance, node = heapq.heappop(heaps[side])
+            
+            if node in settled[side]:
+                continue
+            
+            settled[side].add(node)
+            indptr, indices, weights = self.__arrays[side]
+            own = distances[side]
+            other = distances[1-side]
+            
+            for j in range(indptr[node], indptr[node+1]):
+                neighbor = indices[j]
+                candidate = distance + weights[j]
+                
+                if candidate < own.get(neighbor, np.inf):
+                    key = potentials[side](neighbor)
+                    
+                    if key is None:
+                        continue
+                    
+                    own[neighbor] = candidate
+                    parents[side][neighbor] = node
+                    heapq.heappush(heaps[side], (candidate + key, candidate, neighbor))
+                    
+                    if neighbor in other and candidate + other[neighbor] < best:
+                        best = candidate + other[neighbor]
+                        meeting = neighbor
+        
+        if meeting == -1:
+            return self._unreached()
+        
+        nodes = self._path(parents[0], meeting)[::-1] + self._path(parents[1], meeting)[1:]
+        
+        return best, np.array(nodes, dtype=np.int64)
+    
+    def dijkstra (self, source, target):
+        return self._bidirectional(source, target)
+    
+    def bidirectional_astar (self, source, target):
+        # Bidirectional A* with the average of the two bounds as potential,
+        # (d(v, target) bound - d(source, v) bound) / 2 forward
+        to_target = self._bound(target)
+        from_source = self._bound(source, False)
+        
+        def potential (v):
+            ahead = to_target(v)
+            behind = from_source(v)
+            
+            if ahead == np.inf or behind == np.inf:
+                return None
+            
+            return (ahead - behind) / 2
+        
+        return self._bidirectional(source, target, self._cached(potential))
\ No newline at end of file
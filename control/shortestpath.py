@@ -0,0 +1,238 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import heapq
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+class SharedArrays ():
+    # Named numpy arrays in shared memory blocks. The creating process owns
+    # the blocks and unlinks them on close, other processes attach to them
+    # through the handles without copying.
+    def __init__ (self, blocks, arrays, owner):
+        self.__blocks = blocks
+        self.__arrays = arrays
+        self.__owner = owner
+    
+    @classmethod
+    def create (cls, arrays):
+        blocks = {}
+        views = {}
+        
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            views[name] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            views[name][...] = array
+            blocks[name] = block
+        
+        return cls(blocks, views, True)
+    
+    @classmethod
+    def attach (cls, handles):
+        blocks = {}
+        views = {}
+        
+        for name, (block_name, shape, dtype) in handles.items():
+            block = SharedMemory(name=block_name)
+            views[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            blocks[name] = block
+        
+        return cls(blocks, views, False)
+    
+    def handles (self):
+        return {
+                name : (self.__blocks[name].name, self.__arrays[name].shape, self.__arrays[name].dtype.str)
+                for name in self.__arrays
+            }
+    
+    def __getitem__ (self, name):
+        return self.__arrays[name]
+    
+    def close (self):
+        # The views have to be gone before a block can be closed
+        self.__arrays = {}
+        
+        for block in self.__blocks.values():
+            block.close()
+            
+            if self.__owner:
+                block.unlink()
+        
+        self.__blocks = {}
+    
+    def __enter__ (self):
+        return self
+    
+    def __exit__ (self, exc_type, exc_value, traceback):
+        self.close()
+
+class ShortestPathEngine ():
+    # Many-to-many shortest paths over the CSR arrays of an OSMGraph. With
+    # more than one process the arrays are put into shared memory once and
+    # the pool workers attach to them in their initializer, so a task only
+    # carries its source and the targets.
+    GRAPH_ARRAYS = ("indptr", "indices", "weights")
+    
+    _worker_arrays = None
+    
+    def __init__ (self, graph, processes=None):
+        if processes is None:
+            processes = os.cpu_count()
+        
+        self.__graph = graph
+        self.__shared = None
+        self.__pool = None
+        
+        if processes > 1:
+            self.__shared = SharedArrays.create({
+                    "indptr" : graph.indptr(),
+                    "indices" : graph.indices(),
+                    "weights" : graph.weights()
+                })
+            self.__pool = Pool(processes, initializer=ShortestPathEngine._attach,
+                               initargs=(self.__shared.handles(),))
+    
+    @classmethod
+    def _attach (cls, handles):
+        cls._worker_arrays = SharedArrays.attach(handles)
+    
+    @classmethod
+    def dijkstra (cls, indptr, indices, weights, source, targets, predecessors=None):
+        # Distances from source to every target, inf for unreachable ones.
+        # The search stops as soon as all targets are settled. Given a
+        # predecessors array, the parents of all settled nodes are written
+        # into it. Memoryviews of the CSR arrays index fastest here.
+        distances = {source : 0.0}
+        parents = {source : -1}
+        settled = set()
+        remaining = set(targets)
+        heap = [(0.0, source)]
+        
+        while len(heap) != 0 and len(remaining) != 0:
+            distance, node = heapq.heappop(heap)
+            
+            if node in settled:
+                continue
+            
+            settled.add(node)
+            remaining.discard(node)
+            
+            for j in range(indptr[node], indptr[node+1]):
+                neighbor = indices[j]
+                candidate = distance + weights[j]
+                
+                if candidate < distances.get(neighbor, np.inf):
+                    distances[neighbor] = candidate
+                    parents[neighbor] = node
+                    heapq.heappush(heap, (candidate, neighbor))
+        
+        if predecessors is not None and len(settled) != 0:
+            nodes = np.fromiter(settled, dtype=np.int64, count=len(settled))
+            predecessors[nodes] = [parents[node] for node in nodes.tolist()]
+        
+        return [
+                distances[target] if target in settled else np.inf
+                for target in targets
+            ]
+    
+    @classmethod
+    def _memoryviews (cls, arrays):
+        return [
+                memoryview(arrays[name])
+                for name in cls.GRAPH_ARRAYS
+            ]
+    
+    @classmethod
+    def _search (cls, task):
+        row, source, targets, tree_handles = task
+        
+        if tree_handles is None:
+            return row, cls.dijkstra(*cls._memoryviews(cls._worker_arrays), source, targets)
+        
+        with SharedArrays.attach(tree_handles) as trees:
+            distances = cls.dijkstra(*cls._memoryviews(cls._worker_arrays), source, targets,
+                                     trees["predecessors"][row])
+        
+        return row, distances
+    
+    @classmethod
+    def path (cls, predecessors, source, target):
+        # Node indices from source to target along a predecessors row, empty
+        # if target was not reached
+        if target != source and predecessors[target] == -1:
+            return np.empty(0, dtype=np.int64)
+        
+        nodes = [target]
+        
+        while predecessors[nodes[-1]] != -1:
+            nodes.append(int(predecessors[nodes[-1]]))
+        
+        return np.array(nodes[::-1], dtype=np.int64)
+    
+    def distance_matrix (self, sources, targets=None, predecessors=False):
+        # Shortest path lengths in meters between node indices as a
+        # (sources, targets) matrix, the targets default to the sources.
+        # With predecessors a (sources, node_count) int64 array holding the
+        # search tree of every source is returned as well, -1 outside of it.
+        sources = np.asarray(sources, dtype=np.int64).tolist()
+        targets = sources if targets is None else np.asarray(targets, dtype=np.int64).tolist()
+        matrix = np.full((len(sources), len(targets)), np.inf)
+        trees = None
+        
+        if predecessors:
+            trees = np.full((len(sources), self.__graph.node_count()), -1, dtype=np.int64)
+        
+        if self.__pool is None:
+            arrays = {
+                    "indptr" : self.__graph.indptr(),
+                    "indices" : self.__graph.indices(),
+                    "weights" : self.__graph.weights()
+                }
+            
+            for row, source in enumerate(sources):
+                matrix[row] = self.dijkstra(*self._memoryviews(arrays), source, targets,
+                                            None if trees is None else trees[row])
+        else:
+            shared_trees = None if trees is None else SharedArrays.create({"predecessors" : trees})
+            tree_handles = None if shared_trees is None else shared_trees.handles()
+            
+            tasks = [
+                    (row, source, targets, tree_handles)
+                    for row, source in enumerate(sources)
+                ]
+            
+            try:
+                for row, distances in self.__pool.imap_unordered(ShortestPathEngine._search, tasks):
+                    matrix[row] = distances
+                
+                if shared_trees is not None:
+                    trees = shared_trees["predecessors"].copy()
+            finally:
+                if shared_trees is not None:
+                    shared_trees.close()
+        
+        if predecessors:
+            return matrix, trees
+        else:
+            return matrix
+    
+    def close (self):
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+        
+        if self.__shared is not None:
+            self.__shared.close()
+            self.__shared = None
+    
+    def __enter__ (self):
+        return self
+    
+    def __exit__ (self, exc_type, exc_value, traceback):
+        self.close()
\ No newline at end of file
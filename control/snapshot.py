@@ -0,0 +1,307 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import json
+import numpy as np
+from control.osmparser import OSMCollections, OSMNodeTable, OSMNode, OSMWay, OSMMember, OSMRelation
+
+class OSMStringTable ():
+    def __init__ (self):
+        self.__ids = {}
+        self.__strings = []
+    
+    def id (self, string):
+        string_id = self.__ids.get(string, None)
+        
+        if string_id is None:
+            string_id = len(self.__strings)
+            self.__ids[string] = string_id
+            self.__strings.append(string)
+        
+        return string_id
+    
+    def encode (self):
+        encoded = [
+                string.encode("utf-8")
+                for string in self.__strings
+            ]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(x) for x in encoded])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        
+        return data, offsets
+    
+    @classmethod
+    def decode (cls, data, offsets):
+        data = bytes(data)
+        offsets = offsets.tolist()
+        
+        return [
+                data[offsets[i]:offsets[i+1]].decode("utf-8")
+                for i in range(len(offsets) - 1)
+            ]
+
+class OSMSnapshot ():
+    # A snapshot is a directory of .npy arrays plus a meta.json. Ids, node
+    # coordinates, way refs and relation members are stored as flat arrays
+    # with offsets, tags as string table ids. meta.json is written last, a
+    # snapshot without it is treated as missing.
+    VERSION = 1
+    META_FILE = "meta.json"
+    MEMBER_TYPES = ("node", "way", "relation")
+    ELEMENT_TYPES = ("node", "way", "relation")
+    
+    @classmethod
+    def source_stamp (cls, filepath):
+        stat = os.stat(filepath)
+        
+        return {
+                "size" : stat.st_size,
+                "mtime_ns" : stat.st_mtime_ns
+            }
+    
+    @classmethod
+    def _integer_ids (cls, collection):
+        for objects in (collection.nodes(), collection.ways(), collection.relations()):
+            for obj_id in objects:
+                return not isinstance(obj_id, str)
+        
+        return True
+    
+    @classmethod
+    def _tag_arrays (cls, tags_by_id, strings):
+        ids = []
+        offsets = [0]
+        keys = []
+        values = []
+        
+        for obj_id in tags_by_id:
+            tags = tags_by_id[obj_id]
+            
+            if len(tags) == 0:
+                continue
+            
+            ids.append(int(obj_id))
+            
+            for key in tags:
+                keys.append(strings.id(key))
+                values.append(strings.id(tags[key]))
+            
+            offsets.append(len(keys))
+        
+        return {
+                "tag_ids" : np.array(ids, dtype=np.int64),
+                "tag_offsets" : np.array(offsets, dtype=np.int64),
+                "tag_keys" : np.array(keys, dtype=np.int32),
+                "tag_values" : np.array(values, dtype=np.int32)
+            }
+    
+    @classmethod
+    def _way_arrays (cls, ways):
+        ids = np.fromiter((int(way_id) for way_id in ways), dtype=np.int64, count=len(ways))
+        refs = [
+                np.asarray(ways[way_id].noderefs(), dtype=np.int64)
+                for way_id in ways
+            ]
+        offsets = np.zeros(len(refs) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(x) for x in refs])
+        
+        if len(refs) != 0:
+            refs = np.concatenate(refs)
+        else:
+            refs = np.empty(0, dtype=np.int64)
+        
+        return {
+                "ids" : ids,
+                "offsets" : offsets,
+                "refs" : refs
+            }
+    
+    @classmethod
+    def _relation_arrays (cls, relations, strings):
+        ids = np.fromiter((int(relation_id) for relation_id in relations), dtype=np.int64,
+                          count=len(relations))
+        offsets = [0]
+        types = []
+        refs = []
+        roles = []
+        
+        for relation_id in relations:
+            for member in relations[relation_id].members():
+                types.append(cls.MEMBER_TYPES.index(member.type()))
+                refs.append(int(member.ref()))
+                roles.append(strings.id(member.role()))
+            
+            offsets.append(len(types))
+        
+        return {
+                "ids" : ids,
+                "offsets" : np.array(offsets, dtype=np.int64),
+                "member_types" : np.array(types, dtype=np.uint8),
+                "member_refs" : np.array(refs, dtype=np.int64),
+                "member_roles" : np.array(roles, dtype=np.int32)
+            }
+    
+    @classmethod
+    def save (cls, collection, path, source=None, options=None):
+        os.makedirs(path, exist_ok=True)
+        
+        meta_path = os.path.join(path, cls.META_FILE)
+        
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        
+        strings = OSMStringTable()
+        nodes = collection.nodes()
+        ways = collection.ways()
+        relations = collection.relations()
+        table = collection.node_table()
+        
+        if isinstance(nodes, OSMNodeTable):
+            node_tags = table.tagged()
+        else:
+            node_tags = {
+                    node_id : nodes[node_id].tags()
+                    for node_id in nodes
+                }
+        
+        arrays = {
+                "node_ids" : table.ids(),
+                "node_coordinates" : table.coordinates()
+            }
+        
+        for name, array in cls._way_arrays(ways).items():
+            arrays["way_" + name] = array
+        
+        for name, array in cls._relation_arrays(relations, strings).items():
+            arrays["relation_" + name] = array
+        
+        tags_by_type = {
+                "node" : node_tags,
+                "way" : {way_id : ways[way_id].tags() for way_id in ways},
+                "relation" : {relation_id : relations[relation_id].tags() for relation_id in relations}
+            }
+        
+        for element_type in cls.ELEMENT_TYPES:
+            for name, array in cls._tag_arrays(tags_by_type[element_type], strings).items():
+                arrays[element_type + "_" + name] = array
+        
+        arrays["string_data"], arrays["string_offsets"] = strings.encode()
+        
+        for name, array in arrays.items():
+            np.save(os.path.join(path, name + ".npy"), array)
+        
+        meta = {
+                "version" : cls.VERSION,
+                "columnar" : isinstance(nodes, OSMNodeTable),
+                "integer_ids" : cls._integer_ids(collection),
+                "source" : source,
+                "options" : options
+            }
+        
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+    
+    @classmethod
+    def meta (cls, path):
+        meta_path = os.path.join(path, cls.META_FILE)
+        
+        if not os.path.exists(meta_path):
+            return None
+        
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        
+        if meta.get("version", None) != cls.VERSION:
+            return None
+        
+        return meta
+    
+    @classmethod
+    def matches (cls, path, source, options):
+        meta = cls.meta(path)
+        
+        return meta is not None and meta["source"] == source and meta["options"] == options
+    
+    @classmethod
+    def _decode_tags (cls, arrays, element_type, strings):
+        ids = arrays[element_type + "_tag_ids"].tolist()
+        offsets = arrays[element_type + "_tag_offsets"].tolist()
+        keys = arrays[element_type + "_tag_keys"].tolist()
+        values = arrays[element_type + "_tag_values"].tolist()
+        
+        return {
+                ids[i] : {
+                        strings[keys[j]] : strings[values[j]]
+                        for j in range(offsets[i], offsets[i+1])
+                    }
+                for i in range(len(ids))
+            }
+    
+    @classmethod
+    def load (cls, path, mmap=False):
+        meta = cls.meta(path)
+        
+        if meta is None:
+            raise ValueError("No valid OSM snapshot at {:s}".format(str(path)))
+        
+        mmap_mode = "r" if mmap else None
+        arrays = {}
+        
+        for filename in os.listdir(path):
+            if filename.endswith(".npy"):
+                arrays[filename[:-4]] = np.load(os.path.join(path, filename), mmap_mode=mmap_mode)
+        
+        strings = OSMStringTable.decode(arrays["string_data"], arrays["string_offsets"])
+        integer_ids = meta["integer_ids"]
+        
+        def to_id (obj_id):
+            return obj_id if integer_ids else str(obj_id)
+        
+        node_tags = cls._decode_tags(arrays, "node", strings)
+        way_tags = cls._decode_tags(arrays, "way", strings)
+        relation_tags = cls._decode_tags(arrays, "relation", strings)
+        
+        if meta["columnar"]:
+            nodes = OSMNodeTable(arrays["node_ids"], arrays["node_coordinates"], node_tags)
+        else:
+            coordinates = arrays["node_coordinates"]
+            nodes = {}
+            
+            for row, node_id in enumerate(arrays["node_ids"].tolist()):
+                nodes[to_id(node_id)] = OSMNode(to_id(node_id), node_tags.get(node_id, {}),
+                                                coordinates[row, 0], coordinates[row, 1])
+        
+        # With integer ids the way refs stay slices of the (possibly memory
+        # mapped) flat ref array
+        way_offsets = arrays["way_offsets"].tolist()
+        way_refs = arrays["way_refs"]
+        ways = {}
+        
+        for i, way_id in enumerate(arrays["way_ids"].tolist()):
+            refs = way_refs[way_offsets[i]:way_offsets[i+1]]
+            
+            if not integer_ids:
+                refs = [str(ref) for ref in refs.tolist()]
+            
+            ways[to_id(way_id)] = OSMWay(to_id(way_id), way_tags.get(way_id, {}), refs)
+        
+        relation_offsets = arrays["relation_offsets"].tolist()
+        member_types = arrays["relation_member_types"].tolist()
+        member_refs = arrays["relation_member_refs"].tolist()
+        member_roles = arrays["relation_member_roles"].tolist()
+        relations = {}
+        
+        for i, relation_id in enumerate(arrays["relation_ids"].tolist()):
+            members = [
+                    OSMMember(cls.MEMBER_TYPES[member_types[j]], to_id(member_refs[j]),
+                              strings[member_roles[j]])
+                    for j in range(relation_offsets[i], relation_offsets[i+1])
+                ]
+            relations[to_id(relation_id)] = OSMRelation(to_id(relation_id),
+                                                        relation_tags.get(relation_id, {}), members)
+        
+        return OSMCollections(nodes, ways, relations)
\ No newline at end of file
@@ -0,0 +1,466 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import numpy as np
+
+class GridIndex ():
+    # Uniform grid over planar (n, 2) points, e.g. projected meters. Points
+    # are sorted by cell and only occupied cells are stored, so sparse data
+    # costs nothing for empty cells. Queries are answered for whole query
+    # batches at once, ring by ring around the query cells.
+    def __init__ (self, points, cell_size=None, points_per_cell=2.0):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        
+        if len(points) != 0:
+            lower = np.min(points, axis=0)
+            upper = np.max(points, axis=0)
+        else:
+            lower = np.zeros(2)
+            upper = np.zeros(2)
+        
+        if cell_size is None:
+            extent = np.maximum(upper - lower, 1e-9)
+            cell_size = np.sqrt(extent[0] * extent[1] * points_per_cell / max(len(points), 1))
+            cell_size = max(cell_size, np.max(extent) / 4096, 1e-9)
+        
+        self.__points = points
+        self.__lower = lower
+        self.__cell_size = float(cell_size)
+        self.__shape = np.floor((upper - lower) / self.__cell_size).astype(np.int64) + 1
+        
+        cell_ids = self._cell_ids(self._cells(points))
+        order = np.argsort(cell_ids, kind="stable")
+        cell_ids = cell_ids[order]
+        
+        self.__order = order
+        self.__cells, self.__starts = np.unique(cell_ids, return_index=True)
+        self.__ends = np.append(self.__starts[1:], len(cell_ids)).astype(np.int64)
+    
+    def updated (self, points, remap, added):
+        # Index over the new points without sorting them again: remap maps
+        # the old point indices to the new ones, -1 for removed points, and
+        # added holds the new indices to insert. Moved points are removed
+        # and added. The grid stays, points outside of it rebuild the index.
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        added = np.asarray(added, dtype=np.int64)
+        added_cells = self._cells(points[added])
+        
+        if len(self.__points) == 0 or np.any((added_cells < 0) | (added_cells >= self.__shape)):
+            return GridIndex(points)
+        
+        removed = np.flatnonzero(remap == -1)
+        counts = self.__ends - self.__starts
+        np.subtract.at(counts, np.searchsorted(self.__cells, self._cell_ids(self._cells(self.__points[removed]))), 1)
+        
+        order = remap[self.__order]
+        order = order[order != -1]
+        
+        # Cells not occupied yet are inserted empty, the added points then
+        # go to the end of their cell ranges
+        added_ids = self._cell_ids(added_cells)
+        sort = np.argsort(added_ids, kind="stable")
+        added = added[sort]
+        added_ids = added_ids[sort]
+        
+        new_cells = np.unique(added_ids)
+        positions = np.searchsorted(self.__cells, new_cells)
+        absent = (positions == len(self.__cells)) | (self.__cells[np.minimum(positions, len(self.__cells) - 1)] != new_cells)
+        cells = np.insert(self.__cells, positions[absent], new_cells[absent])
+        counts = np.insert(counts, positions[absent], 0)
+        
+        added_positions = np.searchsorted(cells, added_ids)
+        order = np.insert(order, np.cumsum(counts)[added_positions], added)
+        np.add.at(counts, added_positions, 1)
+        
+        occupied = counts != 0
+        ends = np.cumsum(counts)[occupied]
+        
+        index = GridIndex.__new__(GridIndex)
+        index.__points = points
+        index.__lower = self.__lower
+        index.__cell_size = self.__cell_size
+        index.__shape = self.__shape
+        index.__order = order
+        index.__cells = cells[occupied]
+        index.__starts = ends - counts[occupied]
+        index.__ends = ends
+        
+        return index
+    
+    def points (self):
+        return self.__points
+    
+    def cell_size (self):
+        return self.__cell_size
+    
+    def __len__ (self):
+        return len(self.__points)
+    
+    def _cells (self, points):
+        return np.floor((points - self.__lower) / self.__cell_size).astype(np.int64)
+    
+    def _cell_ids (self, cells):
+        return cells[...,0] * self.__shape[1] + cells[...,1]
+    
+    def _cell_ranges (self, cells):
+        # Start and end into the cell sorted points for each (m, 2) cell,
+        # empty ranges for empty or out of grid cells
+        starts = np.zeros(len(cells), dtype=np.int64)
+        ends = np.zeros(len(cells), dtype=np.int64)
+        
+        if len(self.__cells) == 0:
+            return starts, ends
+        
+        inside = np.all((cells >= 0) & (cells < self.__shape), axis=-1)
+        cell_ids = self._cell_ids(cells)
+        positions = np.searchsorted(self.__cells, cell_ids)
+        positions = np.minimum(positions, len(self.__cells) - 1)
+        found = inside & (self.__cells[positions] == cell_ids)
+        
+        starts[found] = self.__starts[positions[found]]
+        ends[found] = self.__ends[positions[found]]
+        
+        return starts, ends
+    
+    def _gather (self, owners, cells):
+        # Expands (owner, cell) pairs to (owner, point index) pairs
+        starts, ends = self._cell_ranges(cells)
+        counts = ends - starts
+        total = int(np.sum(counts))
+        
+        pair_owners = np.repeat(owners, counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_points = self.__order[np.repeat(starts, counts) + offsets]
+        
+        return pair_owners, pair_points
+    
+    @classmethod
+    def _ring_offsets (cls, ring):
+        if ring == 0:
+            return np.zeros((1, 2), dtype=np.int64)
+        
+        span = np.arange(-ring, ring + 1)
+        offsets = np.concatenate((
+                np.stack((np.full(len(span), -ring), span), axis=1),
+                np.stack((np.full(len(span), ring), span), axis=1),
+                np.stack((span[1:-1], np.full(len(span) - 2, -ring)), axis=1),
+                np.stack((span[1:-1], np.full(len(span) - 2, ring)), axis=1)
+            ))
+        
+        return offsets.astype(np.int64)
+    
+    @classmethod
+    def _best_k (cls, owners, distances, indices, count, k):
+        # Keeps the k smallest distances per owner in (count, k) arrays
+        order = np.lexsort((distances, owners))
+        owners = owners[order]
+        distances = distances[order]
+        indices = indices[order]
+        
+        group_starts = np.searchsorted(owners, np.arange(count))
+        ranks = np.arange(len(owners)) - group_starts[owners]
+        keep = ranks < k
+        
+        best_distances = np.full((count, k), np.inf)
+        best_indices = np.full((count, k), -1, dtype=np.int64)
+        best_distances[owners[keep], ranks[keep]] = distances[keep]
+        best_indices[owners[keep], ranks[keep]] = indices[keep]
+        
+        return best_distances, best_indices
+    
+    def query (self, points, k=1):
+        # k nearest indexed points for every query point. Returns (m, k)
+        # distances and indices, padded with inf and -1 if there are fewer
+        # than k points.
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        count = len(points)
+        
+        best_distances = np.full((count, k), np.inf)
+        best_indices = np.full((count, k), -1, dtype=np.int64)
+        
+        if count == 0 or len(self.__points) == 0:
+            return best_distances, best_indices
+        
+        centers = np.clip(self._cells(points), 0, self.__shape - 1)
+        remaining = np.arange(count)
+        ring = 0
+        
+        while len(remaining) != 0:
+            offsets = self._ring_offsets(ring)
+            owners = np.repeat(np.arange(len(remaining)), len(offsets))
+            cells = centers[remaining][owners] + np.tile(offsets, (len(remaining), 1))
+            
+            owners, candidates = self._gather(owners, cells)
+            distances = np.hypot(*(self.__points[candidates] - points[remaining][owners]).T)
+            
+            current = best_indices[remaining] != -1
+            current_owners = np.repeat(np.arange(len(remaining)), k)[current.ravel()]
+            
+            merged_distances, merged_indices = self._best_k(
+                    np.concatenate((current_owners, owners)),
+                    np.concatenate((best_distances[remaining][current], distances)),
+                    np.concatenate((best_indices[remaining][current], candidates)),
+                    len(remaining), k)
+            best_distances[remaining] = merged_distances
+            best_indices[remaining] = merged_indices
+            
+            # Points not seen yet lie outside the searched block of cells.
+            # A query is done once its k-th distance can't be beaten by them
+            # or the block covers the whole grid.
+            block_lower = self.__lower + (centers[remaining] - ring) * self.__cell_size
+            block_upper = self.__lower + (centers[remaining] + ring + 1) * self.__cell_size
+            margin = np.minimum(points[remaining] - block_lower, block_upper - points[remaining])
+            margin = np.maximum(np.min(margin, axis=1), 0.0)
+            
+            covered = np.all((centers[remaining] - ring <= 0) &
+                             (centers[remaining] + ring >= self.__shape - 1), axis=1)
+            done = covered | (merged_distances[:,-1] <= margin)
+            
+            remaining = remaining[~done]
+            ring += 1
+        
+        return best_distances, best_indices
+    
+    def query_radius (self, points, radius):
+        # Indices of all indexed points within radius of each query point,
+        # as a list of arrays sorted by distance
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        reach = int(np.ceil(radius / self.__cell_size))
+        
+        # Only the cells of the reach that lie on the grid, so a radius far
+        # above the cell size costs no more than the grid itself
+        cells = self._cells(points)
+        first = np.maximum(cells - reach, 0)
+        last = np.minimum(cells + reach, self.__shape - 1)
+        sizes = np.maximum(last - first + 1, 0)
+        counts = sizes[:,0] * sizes[:,1]
+        
+        owners = np.repeat(np.arange(len(points)), counts)
+        offsets = np.arange(int(np.sum(counts))) - np.repeat(np.cumsum(counts) - counts, counts)
+        widths = np.maximum(sizes[owners,1], 1)
+        cells = first[owners] + np.stack((offsets // widths, offsets % widths), axis=1)
+        
+        owners, candidates = self._gather(owners, cells)
+        distances = np.hypot(*(self.__points[candidates] - points[owners]).T)
+        
+        within = distances <= radius
+        owners = owners[within]
+        candidates = candidates[within]
+        distances = distances[within]
+        
+        order = np.lexsort((distances, owners))
+        owners = owners[order]
+        candidates = candidates[order]
+        splits = np.searchsorted(owners, np.arange(1, len(points)))
+        
+        return np.split(candidates, splits)
+    
+    def query_box (self, lower, upper):
+        # Indices of all indexed points inside the closed box
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        
+        if len(self.__points) == 0:
+            return np.empty(0, dtype=np.int64)
+        
+        first = np.clip(self._cells(lower), 0, self.__shape - 1)
+        last = np.clip(self._cells(upper), 0, self.__shape - 1)
+        
+        rows, cols = np.meshgrid(np.arange(first[0], last[0] + 1), np.arange(first[1], last[1] + 1),
+                                 indexing="ij")
+        cells = np.stack((rows.ravel(), cols.ravel()), axis=1)
+        
+        _, candidates = self._gather(np.zeros(len(cells), dtype=np.int64), cells)
+        points = self.__points[candidates]
+        inside = np.all((points >= lower) & (points <= upper), axis=1)
+        
+        return np.sort(candidates[inside])
+    
+class PackedRTree ():
+    # Static R-tree over (n, 4) boxes (min0, min1, max0, max1), packed with
+    # sort-tile-recursive ordering. Every level is a flat box array, entry i
+    # of a level covers entries [i*node_size, (i+1)*node_size) of the level
+    # below, so a query is a few vectorized overlap tests per level.
+    # Entries can be changed in place for collections that are updated:
+    # boxes are rewritten up to the root, appended boxes extend the last
+    # nodes and removed ones stay behind as empty leaves until they make up
+    # half of the tree, which is then packed again.
+    EMPTY_BOX = np.array([np.inf, np.inf, -np.inf, -np.inf])
+    
+    def __init__ (self, boxes, node_size=16):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        
+        self.__node_size = node_size
+        self.__order = self._str_order(boxes, node_size)
+        self.__levels = [boxes[self.__order]]
+        
+        # Leaf of every entry, the inverse of order
+        self.__leaves = np.empty(len(boxes), dtype=np.int64)
+        self.__leaves[self.__order] = np.arange(len(boxes))
+        
+        while len(self.__levels[-1]) > node_size:
+            self.__levels.append(self._parent_boxes(self.__levels[-1], node_size))
+            
+    @classmethod
+    def _str_order (cls, boxes, node_size):
+        count = len(boxes)
+        
+        if count == 0:
+            return np.empty(0, dtype=np.int64)
+        
+        # Empty inverted boxes have no center and go to the start
+        with np.errstate(invalid="ignore"):
+            centers = (boxes[:,:2] + boxes[:,2:]) / 2
+        
+        centers = np.nan_to_num(centers, nan=0.0, posinf=0.0, neginf=0.0)
+        
+        leaf_count = int(np.ceil(count / node_size))
+        slice_count = int(np.ceil(np.sqrt(leaf_count)))
+        slice_size = slice_count * node_size
+        
+        by_first = np.argsort(centers[:,0], kind="stable")
+        slices = np.empty(count, dtype=np.int64)
+        slices[by_first] = np.arange(count) // slice_size
+        
+        return np.lexsort((centers[:,1], slices))
+    
+    @classmethod
+    def _parent_boxes (cls, boxes, node_size):
+        starts = np.arange(0, len(boxes), node_size)
+        
+        return np.concatenate((
+                np.minimum.reduceat(boxes[:,:2], starts, axis=0),
+                np.maximum.reduceat(boxes[:,2:], starts, axis=0)
+            ), axis=1)
+    
+    def __len__ (self):
+        return len(self.__leaves)
+    
+    def boxes (self, entries=None):
+        if entries is None:
+            return self.__levels[0][self.__leaves]
+        
+        return self.__levels[0][self.__leaves[np.asarray(entries, dtype=np.int64)]]
+    
+    def _refresh (self, leaves):
+        # Recomputes the parents of the changed leaves level by level
+        for depth in range(1, len(self.__levels)):
+            parents = np.unique(np.asarray(leaves, dtype=np.int64) // self.__node_size)
+            level = self.__levels[depth - 1]
+            
+            if len(parents) == 0:
+                return
+            
+            if parents[-1] >= len(self.__levels[depth]):
+                missing = parents[-1] + 1 - len(self.__levels[depth])
+                self.__levels[depth] = np.concatenate((self.__levels[depth], np.tile(self.EMPTY_BOX, (missing, 1))))
+            
+            children = parents[:,None] * self.__node_size + np.arange(self.__node_size)
+            inside = children < len(level)
+            boxes = level[np.minimum(children, len(level) - 1)]
+            
+            lower = np.where(inside[...,None], boxes[...,:2], np.inf)
+            upper = np.where(inside[...,None], boxes[...,2:], -np.inf)
+            self.__levels[depth][parents] = np.concatenate((lower.min(axis=1), upper.max(axis=1)), axis=1)
+            leaves = parents
+        
+        while len(self.__levels[-1]) > self.__node_size:
+            self.__levels.append(self._parent_boxes(self.__levels[-1], self.__node_size))
+    
+    def update (self, entries, boxes):
+        # New boxes for existing entries
+        leaves = self.__leaves[np.asarray(entries, dtype=np.int64)]
+        self.__levels[0][leaves] = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self._refresh(leaves)
+    
+    def append (self, boxes):
+        # Adds entries len(self), len(self) + 1, ... behind the last leaf
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        leaves = np.arange(len(self.__levels[0]), len(self.__levels[0]) + len(boxes))
+        
+        self.__levels[0] = np.concatenate((self.__levels[0], boxes))
+        self.__order = np.concatenate((self.__order, np.arange(len(self), len(self) + len(boxes))))
+        self.__leaves = np.concatenate((self.__leaves, leaves))
+        self._refresh(leaves)
+    
+    def remove (self, entry):
+        # Removes an entry the way a list is shrunk by moving its last
+        # element into the gap: the last entry takes over the number
+        last = len(self) - 1
+        leaf = self.__leaves[entry]
+        
+        self.__levels[0][leaf] = self.EMPTY_BOX
+        self.__order[leaf] = -1
+        
+        if entry != last:
+            self.__order[self.__leaves[last]] = entry
+            self.__leaves[entry] = self.__leaves[last]
+        
+        self.__leaves = self.__leaves[:last]
+        self._refresh([leaf])
+        
+        if len(self.__order) > 2 * max(len(self), self.__node_size):
+            self.__init__(self.boxes(), self.__node_size)
+    
+    def query (self, box):
+        # Indices of all boxes intersecting the closed query box
+        box = np.asarray(box, dtype=np.float64)
+        entries = np.arange(len(self.__levels[-1]))
+        
+        for depth in range(len(self.__levels) - 1, -1, -1):
+            level = self.__levels[depth]
+            
+            if depth != len(self.__levels) - 1:
+                children = entries[:,None] * self.__node_size + np.arange(self.__node_size)
+                entries = children[children < len(level)]
+                
+            boxes = level[entries]
+            overlaps = np.all(boxes[:,:2] <= box[2:], axis=1) & np.all(boxes[:,2:] >= box[:2], axis=1)
+            entries = entries[overlaps]
+            
+        return np.sort(self.__order[entries])
+    
+class ExtractArea ():
+    # Query area for extracts, either a (min_lat, min_lon, max_lat, max_lon)
+    # box or a closed polygon given as (n, 2) lat/lon vertices
+    def __init__ (self, area):
+        area = np.asarray(area, dtype=np.float64)
+        
+        if area.shape == (4,):
+            self.__polygon = None
+            self.__bounds = area
+        elif area.ndim == 2 and area.shape[1] == 2 and len(area) >= 3:
+            self.__polygon = area
+            self.__bounds = np.concatenate((np.min(area, axis=0), np.max(area, axis=0)))
+        else:
+            raise ValueError("Area must be a bounding box or a (n, 2) polygon")
+        
+    def bounds (self):
+        return self.__bounds
+    
+    def contains (self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        inside = np.all((points >= self.__bounds[:2]) & (points <= self.__bounds[2:]), axis=1)
+        
+        if self.__polygon is None:
+            return inside
+        
+        # Even-odd ray casting, one vectorized pass per polygon edge
+        crossings = np.zeros(len(points), dtype=bool)
+        x = points[:,1]
+        y = points[:,0]
+        
+        for i in range(len(self.__polygon)):
+            y1, x1 = self.__polygon[i-1]
+            y2, x2 = self.__polygon[i]
+            
+            if y1 == y2:
+                continue
+            
+            spans = (y1 > y) != (y2 > y)
+            crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+            crossings ^= spans & (x < crossing_x)
+            
+        return inside & crossings
\ No newline at end of file
@@ -0,0 +1,183 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, RSS deltas are left out there
+    resource = None
+
+class OSMPhase ():
+    # One measured phase, used as a context manager. Phases opened inside
+    # another one are recorded with the dotted names of all open phases.
+    def __init__ (self, stats, name):
+        self.__stats = stats
+        self.__name = name
+        self.__elements = None
+        self.__peak = 0
+    
+    def name (self):
+        return self.__name
+    
+    def add (self, elements):
+        self.__elements = elements if self.__elements is None else self.__elements + elements
+    
+    def observe_peak (self, peak):
+        self.__peak = max(self.__peak, peak)
+    
+    def __enter__ (self):
+        self.__stats._enter(self)
+        self.__rss = self.__stats.max_rss_kb()
+        self.__traced = self.__stats.traced_memory()
+        self.__start = time.perf_counter()
+        
+        return self
+    
+    def __exit__ (self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.__start
+        traced = self.__stats.traced_memory()
+        allocated = None
+        peak = None
+        
+        if traced is not None:
+            allocated = traced - self.__traced
+            peak = self.__peak - self.__traced
+        
+        rss = self.__stats.max_rss_kb()
+        rss_delta = None if rss is None else rss - self.__rss
+        
+        self.__stats._exit(self)
+        self.__stats.record(self.__name, seconds, self.__elements, allocated, peak, rss_delta)
+
+class OSMNullPhase ():
+    # Stands in for OSMPhase when no stats are collected
+    def add (self, elements):
+        pass
+    
+    def __enter__ (self):
+        return self
+    
+    def __exit__ (self, exc_type, exc_value, traceback):
+        pass
+
+class OSMStats ():
+    # Opt-in instrumentation for the parser and the heavy OSMCollections
+    # methods, passed to them as stats=. Every phase records wall time,
+    # element count and throughput, the growth of the peak RSS and, with
+    # trace_allocations, the allocated and peak traced bytes. callback is
+    # called with every record as it is made. Without stats the methods
+    # use a shared no-op phase, so disabled instrumentation costs a call.
+    NULL_PHASE = OSMNullPhase()
+    
+    def __init__ (self, callback=None, trace_allocations=False):
+        self.__callback = callback
+        self.__trace_allocations = trace_allocations
+        self.__owns_tracing = False
+        self.__open = []
+        self.__records = []
+    
+    @classmethod
+    def measure (cls, stats, name):
+        if stats is None:
+            return cls.NULL_PHASE
+        
+        return OSMPhase(stats, name)
+    
+    @classmethod
+    def max_rss_kb (cls):
+        if resource is None:
+            return None
+        
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        
+        # macOS reports bytes, Linux kilobytes
+        return max_rss // 1024 if sys.platform == "darwin" else max_rss
+    
+    def traced_memory (self):
+        if not self.__trace_allocations:
+            return None
+        
+        current, peak = tracemalloc.get_traced_memory()
+        
+        for phase in self.__open:
+            phase.observe_peak(peak)
+        
+        return current
+    
+    def _enter (self, phase):
+        if self.__trace_allocations:
+            if len(self.__open) == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.__owns_tracing = True
+            
+            # The peak is reset for the new phase, the open ones keep theirs
+            self.traced_memory()
+            tracemalloc.reset_peak()
+        
+        self.__open.append(phase)
+    
+    def _exit (self, phase):
+        self.__open.remove(phase)
+        
+        if self.__owns_tracing and len(self.__open) == 0:
+            tracemalloc.stop()
+            self.__owns_tracing = False
+    
+    def record (self, name, seconds, elements=None, allocated=None, peak=None, rss_delta=None):
+        # Also used directly for phases timed in a tight loop, their name is
+        # nested into the open phases the same way
+        record = {
+                "phase" : ".".join([phase.name() for phase in self.__open] + [name]),
+                "seconds" : seconds,
+                "elements" : elements,
+                "elements_per_second" : None,
+                "allocated_bytes" : allocated,
+                "peak_bytes" : peak,
+                "max_rss_delta_kb" : rss_delta
+            }
+        
+        if elements is not None and seconds > 0:
+            record["elements_per_second"] = elements / seconds
+        
+        self.__records.append(record)
+        
+        if self.__callback is not None:
+            self.__callback(record)
+    
+    def records (self):
+        return self.__records
+    
+    def totals (self):
+        # Seconds and elements summed per phase name
+        totals = {}
+        
+        for record in self.__records:
+            total = totals.setdefault(record["phase"], {"seconds" : 0.0, "elements" : None, "calls" : 0})
+            total["seconds"] += record["seconds"]
+            total["calls"] += 1
+            
+            if record["elements"] is not None:
+                total["elements"] = (total["elements"] or 0) + record["elements"]
+        
+        return totals
+    
+    def report (self):
+        lines = ["{:<48s} {:>6s} {:>12s} {:>12s} {:>14s}".format("phase", "calls", "seconds",
+                                                                  "elements", "elements/s")]
+        
+        for name, total in self.totals().items():
+            elements = total["elements"]
+            rate = elements / total["seconds"] if elements is not None and total["seconds"] > 0 else None
+            
+            lines.append("{:<48s} {:>6d} {:>12.4f} {:>12s} {:>14s}".format(
+                    name, total["calls"], total["seconds"],
+                    "" if elements is None else str(elements),
+                    "" if rate is None else "{:.0f}".format(rate)))
+        
+        return "\n".join(lines)
\ No newline at end of file
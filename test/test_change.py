@@ -0,0 +1,145 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+from control.osmparser import OSMParser, OSMCollections, OSMNodeTable
+from control.nodelocations import SparseNodeLocations, DenseFileNodeLocations, SortedNodeLocations
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+# Deletes way 103 and relation 200, adds way 107 and relation 201
+STRUCTURE_CHANGE = b"""<osmChange version="0.6">
+  <create>
+    <way id="107"><nd ref="1"/><nd ref="12"/></way>
+    <relation id="201">
+      <member type="way" ref="104" role="outer"/>
+      <member type="node" ref="3" role=""/>
+      <tag k="type" v="multipolygon"/>
+    </relation>
+  </create>
+  <delete>
+    <way id="103"/>
+    <relation id="200"/>
+  </delete>
+</osmChange>"""
+
+BOXES = (
+        (50.0095, 9.0095, 50.0105, 9.0105),
+        (50.0, 9.0, 50.0045, 9.003),
+        (50.0105, 9.02, 50.0115, 9.022),
+        (50.029, 9.029, 50.031, 9.031),
+        (49.0, 8.0, 51.0, 10.0)
+    )
+
+class ApplyChangeTest (unittest.TestCase):
+    def parse (self, name, **kwargs):
+        return OSMParser.parse(os.path.join(DATA, name), **kwargs)
+    
+    def warm (self, collection):
+        # Builds every cache that apply_change patches
+        collection.build_tag_indexes()
+        collection.multipolygons()
+        collection.projected_coordinates()
+        collection.extract(BOXES[0])
+        collection._ways_with_nodes(np.array([1]))
+        
+        return collection
+    
+    def fresh (self, collection):
+        # Same elements without any cache
+        nodes = collection.nodes()
+        
+        if isinstance(nodes, OSMNodeTable):
+            nodes = OSMNodeTable(nodes.ids(), nodes.coordinates(), dict(nodes.tagged()))
+        else:
+            nodes = dict(nodes)
+        
+        return OSMCollections(nodes, dict(collection.ways()), dict(collection.relations()))
+    
+    def assertSameCaches (self, collection, expected):
+        self.assertEqual(sorted(map(str, collection.ways())), sorted(map(str, expected.ways())))
+        self.assertEqual(sorted(map(str, collection.relations())), sorted(map(str, expected.relations())))
+        self.assertEqual(sorted(map(str, collection.tag_index("way").ids_with_tag("highway"))),
+                         sorted(map(str, expected.tag_index("way").ids_with_tag("highway"))))
+        self.assertEqual(sorted(map(str, collection.multipolygons())), sorted(map(str, expected.multipolygons())))
+        
+        node_ids = expected.node_table().ids()
+        self.assertEqual(sorted(map(str, collection._ways_with_nodes(node_ids))),
+                         sorted(map(str, expected._ways_with_nodes(node_ids))))
+        
+        for box in BOXES:
+            extract = collection.extract(box)
+            reference = expected.extract(box)
+            
+            self.assertEqual(sorted(map(str, extract.ways())), sorted(map(str, reference.ways())))
+            self.assertEqual(sorted(map(str, extract.relations())), sorted(map(str, reference.relations())))
+            self.assertTrue(np.array_equal(extract.node_table().ids(), reference.node_table().ids()))
+    
+    def test_apply_change (self):
+        for kwargs in ({}, {"integer_ids" : True}, {"columnar" : True}):
+            collection = self.warm(self.parse("small.osm", **kwargs))
+            summary = collection.apply_change(os.path.join(DATA, "change.osc"))
+            expected = self.parse("expected.osm", **kwargs)
+            
+            self.assertEqual(sorted(map(str, summary.affected_ways())), ["100", "101", "102", "103", "106"])
+            self.assertTrue(np.array_equal(collection.node_table().ids(), expected.node_table().ids()))
+            self.assertTrue(np.allclose(collection.node_table().coordinates(), expected.node_table().coordinates()))
+            self.assertSameCaches(collection, expected)
+    
+    def test_projection_keeps_origin (self):
+        collection = self.parse("small.osm", integer_ids=True)
+        projection = collection.projection()
+        
+        collection.projected_coordinates()
+        collection.apply_change(os.path.join(DATA, "change.osc"))
+        
+        self.assertIs(collection.projection(), projection)
+        self.assertTrue(np.allclose(collection.projected_coordinates(),
+                                    projection.project(collection.node_table().coordinates())))
+    
+    def test_structure_change (self):
+        for kwargs in ({}, {"integer_ids" : True}, {"columnar" : True}):
+            collection = self.warm(self.parse("small.osm", **kwargs))
+            collection.apply_change(io.BytesIO(STRUCTURE_CHANGE))
+            
+            self.assertSameCaches(collection, self.fresh(collection))
+            self.assertEqual(sorted(map(str, collection.extract(BOXES[1]).relations())), ["201"])
+    
+    def test_apply_change_with_node_locations (self):
+        expected = self.parse("expected.osm", integer_ids=True).ways_with_coordinates()
+        
+        with tempfile.TemporaryDirectory() as directory:
+            stores = (SparseNodeLocations(), SortedNodeLocations(),
+                      DenseFileNodeLocations(os.path.join(directory, "nodes.bin")))
+            
+            for store in stores:
+                with store:
+                    collection = self.parse("small.osm", integer_ids=True, node_locations=store)
+                    collection.apply_change(os.path.join(DATA, "change.osc"))
+                    geometries = collection.ways_with_coordinates()
+                    
+                    self.assertTrue(np.isnan(store.get([2, 4])).all())
+                    self.assertTrue(np.allclose(store.get([13, 3]), [(50.03, 9.03), (50.0025, 9.0025)]))
+                    self.assertIn(106, geometries)
+                    self.assertEqual(sorted(geometries), sorted(expected))
+                    
+                    for way_id in expected:
+                        self.assertTrue(np.allclose(geometries[way_id], expected[way_id]))
+    
+    def test_node_table_tags_not_shared (self):
+        collection = self.parse("small.osm", columnar=True)
+        table = collection.nodes()
+        
+        collection.apply_change(os.path.join(DATA, "change.osc"))
+        
+        self.assertEqual(dict(table.tags_at(table.row(3))), {"highway" : "traffic_signals"})
+        self.assertEqual(len(collection.nodes().tags_at(collection.nodes().row(3))), 0)
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,59 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import io
+import os
+import unittest
+import numpy as np
+from control.osmparser import OSMParser, OSMCollections
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+# Relation 300 only has a node member that is not in the file
+DANGLING_RELATION = b"""
+  <relation id="300">
+    <member type="node" ref="999" role=""/>
+    <tag k="type" v="site"/>
+  </relation>
+</osm>"""
+
+class ExtractTest (unittest.TestCase):
+    def parse_dangling (self, **kwargs):
+        with open(os.path.join(DATA, "small.osm"), "rb") as f:
+            xml = f.read().replace(b"</osm>", DANGLING_RELATION)
+        
+        return OSMParser.parse(io.BytesIO(xml), **kwargs)
+    
+    def test_dangling_node_member_has_no_box (self):
+        for kwargs in ({}, {"integer_ids" : True}, {"columnar" : True}):
+            collection = self.parse_dangling(**kwargs)
+            relation_ids, relation_index = collection._spatial_indexes()[3:5]
+            
+            # A box around the last node row must not find the relation
+            last = collection.node_table().coordinates()[-1]
+            found = [relation_ids[i] for i in relation_index.query(np.tile(last, 2)).tolist()]
+            
+            self.assertNotIn(collection.relations_with_tag_value_in("type", ["site"]).popitem()[0], found)
+    
+    def test_extract_with_empty_node_table (self):
+        collection = self.parse_dangling(integer_ids=True)
+        empty = OSMCollections({}, {}, collection.relations())
+        
+        extract = empty.extract((49.0, 8.0, 51.0, 10.0))
+        
+        self.assertEqual(len(extract.nodes()), 0)
+        self.assertEqual(len(extract.relations()), 0)
+    
+    def test_extract_box (self):
+        collection = OSMParser.parse(os.path.join(DATA, "small.osm"), integer_ids=True)
+        
+        extract = collection.extract((50.0095, 9.0095, 50.0105, 9.0105))
+        
+        self.assertEqual(sorted(extract.ways()), [103, 104])
+        self.assertEqual(sorted(extract.nodes()), [6, 7, 8, 9])
+        self.assertEqual(sorted(extract.relations()), [200])
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,99 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import io
+import os
+import unittest
+import numpy as np
+from control.osmparser import OSMParser
+from control.osmgraph import OSMGraph
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class WayGraphTest (unittest.TestCase):
+    def setUp (self):
+        self.collection = OSMParser.parse(os.path.join(DATA, "small.osm"), integer_ids=True)
+    
+    def test_ways_to_graph (self):
+        result = self.collection.ways_to_graph()
+        points, adjlist = result
+        
+        self.assertEqual(len(result), 2)
+        self.assertEqual(sorted(points), list(range(1, 13)))
+        self.assertEqual(adjlist[2], {1, 3})
+    
+    def test_ways_to_contracted_graph (self):
+        points, adjlist, weights, paths = self.collection.ways_to_contracted_graph()
+        
+        self.assertEqual(sorted(points), [1, 3, 5, 6, 8])
+        self.assertEqual(adjlist[3], {1, 5})
+        self.assertEqual(paths[(1, 3)], [1, 2, 3])
+        self.assertEqual(paths[(3, 1)], [3, 2, 1])
+        
+        self.assertEqual(set(weights), set(paths))
+        self.assertAlmostEqual(weights[(1, 3)], weights[(3, 1)])
+    
+    def test_keep_nodes (self):
+        points, _, _, paths = self.collection.ways_to_contracted_graph(keep_nodes=[2])
+        
+        self.assertIn(2, points)
+        self.assertEqual(paths[(1, 2)], [1, 2])
+
+    def edge_set (self, adjlist):
+        return {
+                (node_id, adj)
+                for node_id, adjs in adjlist.items()
+                for adj in adjs
+            }
+    
+    def csr_edges (self, graph):
+        sources, targets, weights = graph.edges()
+        node_ids = graph.node_ids().tolist()
+        
+        return {
+                (node_ids[u], node_ids[v]) : w
+                for u, v, w in zip(sources.tolist(), targets.tolist(), weights.tolist())
+            }
+    
+    def test_csr_graph_matches_ways_to_graph (self):
+        points, adjlist = self.collection.ways_to_graph()
+        graph = self.collection.ways_to_csr_graph()
+        edges = self.csr_edges(graph)
+        
+        self.assertEqual(graph.node_ids().tolist(), sorted(points))
+        self.assertTrue(np.array_equal(graph.coordinates(), np.array([points[x] for x in sorted(points)])))
+        self.assertEqual(graph.edge_count(), sum(len(adjs) for adjs in adjlist.values()))
+        self.assertEqual(set(edges), self.edge_set(adjlist))
+        
+        for (u, v), weight in edges.items():
+            self.assertAlmostEqual(weight, float(OSMGraph.haversine(points[u], points[v])), delta=1e-3)
+            self.assertEqual(weight, edges[(v, u)])
+    
+    def test_csr_graph_oneways (self):
+        # Way 101 over 3, 4 and 5 is the only oneway
+        forward = self.edge_set(self.collection.ways_to_graph()[1]) - {(4, 3), (5, 4)}
+        
+        self.assertEqual(set(self.csr_edges(self.collection.ways_to_csr_graph(symmetric=False))), forward)
+        
+        with open(os.path.join(DATA, "small.osm"), "rb") as f:
+            xml = f.read().replace(b'<tag k="oneway" v="yes"/>', b'<tag k="oneway" v="-1"/>')
+        
+        backward = OSMParser.parse(io.BytesIO(xml), integer_ids=True)
+        expected = self.edge_set(backward.ways_to_graph()[1]) - {(3, 4), (4, 5)}
+        
+        self.assertEqual(set(self.csr_edges(backward.ways_to_csr_graph(symmetric=False))), expected)
+    
+    def test_contracted_csr_graph_weights (self):
+        edges = self.csr_edges(self.collection.ways_to_csr_graph())
+        contracted = self.csr_edges(self.collection.ways_to_csr_graph(contract=True))
+        
+        self.assertAlmostEqual(contracted[(1, 3)], edges[(1, 2)] + edges[(2, 3)], delta=1e-2)
+        # Ways 103 and 104 both join 6 and 8, the shorter edge is kept
+        self.assertAlmostEqual(contracted[(6, 8)], min(edges[(6, 7)] + edges[(7, 8)],
+                                                       edges[(6, 9)] + edges[(9, 8)]), delta=1e-2)
+        self.assertNotIn((1, 2), contracted)
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
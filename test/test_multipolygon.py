@@ -0,0 +1,122 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import io
+import unittest
+import numpy as np
+from control.osmparser import OSMParser
+
+# Nodes on a grid, node 1{x}{y} at lat 50.0{x}, lon 9.0{y}
+NODES = "".join(
+        '<node id="1{:d}{:d}" lat="50.0{:d}" lon="9.0{:d}"/>'.format(x, y, x, y)
+        for x in range(10)
+        for y in range(10)
+    )
+
+# Relation 1: an outer ring of three ways, the second one reversed, an
+# inner ring of a single closed way and one of two ways, again with one
+# of them reversed.
+# Relation 2: an outer ring whose last way is missing from the file, an
+# outer way that does not close and a one node way.
+# Relation 3: a closed outer ring through a node missing from the file.
+WAYS = """
+  <way id="1"><nd ref="100"/><nd ref="109"/><nd ref="199"/></way>
+  <way id="2"><nd ref="190"/><nd ref="199"/></way>
+  <way id="3"><nd ref="190"/><nd ref="150"/><nd ref="100"/></way>
+  <way id="4"><nd ref="122"/><nd ref="123"/><nd ref="133"/><nd ref="122"/></way>
+  <way id="5"><nd ref="155"/><nd ref="156"/><nd ref="166"/></way>
+  <way id="6"><nd ref="155"/><nd ref="165"/><nd ref="166"/></way>
+  <way id="7"><nd ref="111"/><nd ref="112"/></way>
+  <way id="8"><nd ref="112"/><nd ref="122"/></way>
+  <way id="9"><nd ref="144"/><nd ref="145"/><nd ref="146"/></way>
+  <way id="10"><nd ref="177"/></way>
+  <way id="11"><nd ref="181"/><nd ref="999"/><nd ref="182"/><nd ref="181"/></way>
+"""
+
+RELATIONS = """
+  <relation id="1">
+    <member type="way" ref="4" role="inner"/>
+    <member type="way" ref="1" role="outer"/>
+    <member type="way" ref="2" role="outer"/>
+    <member type="way" ref="5" role="inner"/>
+    <member type="way" ref="3" role="outer"/>
+    <member type="way" ref="6" role="inner"/>
+    <member type="node" ref="155" role="label"/>
+    <tag k="type" v="multipolygon"/>
+  </relation>
+  <relation id="2">
+    <member type="way" ref="7" role="outer"/>
+    <member type="way" ref="8" role="outer"/>
+    <member type="way" ref="404" role="outer"/>
+    <member type="way" ref="9" role="outer"/>
+    <member type="way" ref="10" role=""/>
+    <tag k="type" v="boundary"/>
+  </relation>
+  <relation id="3">
+    <member type="way" ref="11" role="outer"/>
+    <tag k="type" v="multipolygon"/>
+  </relation>
+  <relation id="4">
+    <member type="way" ref="4" role="outer"/>
+    <tag k="type" v="route"/>
+  </relation>
+"""
+
+class MultipolygonTest (unittest.TestCase):
+    def parse (self, **kwargs):
+        xml = "<osm>" + NODES + WAYS + RELATIONS + "</osm>"
+        
+        return OSMParser.parse(io.BytesIO(xml.encode("utf-8")), **kwargs)
+    
+    def ring (self, *node_ids):
+        return np.array([
+                (50.0 + (node_id // 10 % 10) / 100.0, 9.0 + (node_id % 10) / 100.0)
+                for node_id in node_ids
+            ])
+    
+    def assertRings (self, rings, expected):
+        self.assertEqual(len(rings), len(expected))
+        
+        for ring, expected_ring in zip(rings, expected):
+            self.assertTrue(np.allclose(ring, expected_ring), (ring, expected_ring))
+    
+    def test_stitched_rings (self):
+        for kwargs in ({}, {"integer_ids" : True}, {"columnar" : True}):
+            collection = self.parse(**kwargs)
+            multipolygons = collection.multipolygons()
+            keys = sorted(multipolygons, key=int)
+            
+            self.assertEqual([int(x) for x in keys], [1, 2, 3])
+            
+            complete = multipolygons[keys[0]]
+            
+            self.assertTrue(complete.is_complete())
+            self.assertRings(complete.outer(), [self.ring(100, 109, 199, 190, 150, 100)])
+            self.assertRings(complete.inner(), [self.ring(122, 123, 133, 122),
+                                                self.ring(155, 156, 166, 165, 155)])
+            
+            broken = multipolygons[keys[1]]
+            
+            self.assertFalse(broken.is_complete())
+            self.assertEqual(broken.outer(), [])
+            self.assertEqual(sorted(int(x) for x in broken.open_ways()), [7, 8, 9, 10, 404])
+            
+            missing_node = multipolygons[keys[2]]
+            
+            self.assertEqual(missing_node.outer(), [])
+            self.assertEqual([int(x) for x in missing_node.open_ways()], [11])
+    
+    def test_multipolygon (self):
+        collection = self.parse(integer_ids=True)
+        
+        # Any relation can be assembled on its own, whatever its type
+        route = collection.multipolygon(4)
+        
+        self.assertTrue(route.is_complete())
+        self.assertRings(route.outer(), [self.ring(122, 123, 133, 122)])
+        self.assertIs(collection.multipolygon(1), collection.multipolygons()[1])
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,119 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import unittest
+import numpy as np
+from control.osmparser import OSMParser
+from control.nodelocations import SparseNodeLocations
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class StoreBackedTest (unittest.TestCase):
+    # A collection parsed with a node location store and prune_nodes only
+    # holds the tagged nodes, the way refs are resolved through the store
+    # and have to give the same results as a normal parse
+    VARIANTS = ({}, {"integer_ids" : True}, {"columnar" : True})
+    
+    def parse_both (self, **kwargs):
+        path = os.path.join(DATA, "small.osm")
+        normal = OSMParser.parse(path, **kwargs)
+        located = OSMParser.parse(path, prune_nodes=True, node_locations=SparseNodeLocations(), **kwargs)
+        
+        return normal, located
+    
+    def test_only_tagged_nodes_are_kept (self):
+        for kwargs in self.VARIANTS:
+            normal, located = self.parse_both(**kwargs)
+            
+            self.assertEqual(len(normal.nodes()), 12)
+            self.assertEqual(len(located.nodes()), 2)
+    
+    def test_ways_to_graph (self):
+        for kwargs in self.VARIANTS:
+            normal, located = self.parse_both(**kwargs)
+            
+            for symmetric in (True, False):
+                points, adjlist = normal.ways_to_graph(symmetric=symmetric)
+                located_points, located_adjlist = located.ways_to_graph(symmetric=symmetric)
+                
+                self.assertEqual(len(located_points), 12)
+                self.assertEqual(sorted(located_points), sorted(points))
+                self.assertEqual(dict(located_adjlist), dict(adjlist))
+                
+                for node_id in points:
+                    self.assertTrue(np.array_equal(located_points[node_id], points[node_id]))
+    
+    def test_way_coordinates (self):
+        for kwargs in self.VARIANTS:
+            normal, located = self.parse_both(**kwargs)
+            
+            for way_id, way in located.ways().items():
+                expected = normal.ways()[way_id].coordinates(normal.nodes())
+                
+                self.assertTrue(np.array_equal(way.coordinates(located), expected))
+                self.assertTrue(np.array_equal(way.coordinates(located.node_locations()), expected))
+    
+    def test_multipolygons (self):
+        for kwargs in self.VARIANTS:
+            normal, located = self.parse_both(**kwargs)
+            
+            multipolygons = normal.multipolygons()
+            located_multipolygons = located.multipolygons()
+            
+            self.assertEqual(sorted(located_multipolygons), sorted(multipolygons))
+            
+            for relation_id, multipolygon in multipolygons.items():
+                located_multipolygon = located_multipolygons[relation_id]
+                
+                self.assertTrue(located_multipolygon.is_complete())
+                self.assertEqual(len(located_multipolygon.outer()), 1)
+                self.assertEqual(len(located_multipolygon.inner()), 1)
+                
+                for rings, located_rings in ((multipolygon.outer(), located_multipolygon.outer()),
+                                             (multipolygon.inner(), located_multipolygon.inner())):
+                    for ring, located_ring in zip(rings, located_rings):
+                        self.assertTrue(np.array_equal(located_ring, ring))
+    
+    def test_extract (self):
+        for kwargs in self.VARIANTS:
+            normal, located = self.parse_both(**kwargs)
+            
+            for area in ((50.0095, 9.0095, 50.0105, 9.0105), (49.9995, 8.9995, 50.0035, 9.0025)):
+                extract = normal.extract(area)
+                located_extract = located.extract(area)
+                
+                self.assertEqual(len(located_extract.ways()), len(extract.ways()))
+                self.assertEqual(sorted(located_extract.ways()), sorted(extract.ways()))
+                self.assertEqual(sorted(located_extract.relations()), sorted(extract.relations()))
+                
+                # The untagged nodes stay in the store
+                self.assertTrue(set(located_extract.nodes()) <= set(located.nodes()))
+                self.assertTrue(set(located_extract.nodes()) <= set(extract.nodes()))
+    
+    def test_nodes_with_projected_coordinates (self):
+        for kwargs in self.VARIANTS:
+            normal, located = self.parse_both(**kwargs)
+            
+            node_ids = {
+                    node_id : None
+                    for node_id in normal.nodes()
+                }
+            projected = normal.nodes_with_projected_coordinates(node_ids)
+            located_projected = located.nodes_with_projected_coordinates(node_ids)
+            
+            self.assertEqual(sorted(located_projected), sorted(projected))
+            
+            # Both projections are fitted on different nodes, the distances
+            # between the points only differ by the scale at their origins
+            keys = list(projected)
+            distances = np.linalg.norm(np.array([projected[x] for x in keys]) - projected[keys[0]], axis=1)
+            located_distances = np.linalg.norm(np.array([located_projected[x] for x in keys])
+                                               - located_projected[keys[0]], axis=1)
+            
+            self.assertTrue(np.allclose(located_distances, distances, rtol=1e-3))
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
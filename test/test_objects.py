@@ -0,0 +1,45 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import unittest
+from control.osmparser import OSMParser, OSMObject
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class ObjectTagsTest (unittest.TestCase):
+    def test_untagged_objects_share_empty_tags (self):
+        collection = OSMParser.parse(os.path.join(DATA, "small.osm"), integer_ids=True)
+        
+        self.assertIs(collection.nodes()[1].tags(), OSMObject.EMPTY_TAGS)
+        self.assertIs(collection.ways()[103].tags(), OSMObject.EMPTY_TAGS)
+        
+        with self.assertRaises(TypeError):
+            collection.nodes()[1].tags()["name"] = "Start"
+        
+        self.assertEqual(len(OSMObject.EMPTY_TAGS), 0)
+    
+    def test_set_tag (self):
+        for kwargs in ({"integer_ids" : True}, {"columnar" : True}):
+            collection = OSMParser.parse(os.path.join(DATA, "small.osm"), **kwargs)
+            nodes = collection.nodes()
+            
+            nodes[1].set_tag("name", "Start")
+            nodes[1].set_tag("ele", "100")
+            nodes[5].set_tag("ele", "120")
+            
+            self.assertEqual(dict(nodes[1].tags()), {"name" : "Start", "ele" : "100"})
+            self.assertEqual(dict(nodes[5].tags()), {"place" : "village", "name" : "Testdorf", "ele" : "120"})
+            self.assertEqual(len(nodes[2].tags()), 0)
+            self.assertEqual(len(OSMObject.EMPTY_TAGS), 0)
+        
+        way = collection.ways()[103]
+        way.set_tag("landuse", "forest")
+        
+        self.assertEqual(dict(way.tags()), {"landuse" : "forest"})
+        self.assertEqual(len(collection.ways()[104].tags()), 0)
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,131 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import io
+import os
+import bz2
+import gzip
+import tempfile
+import threading
+import unittest
+from control.osmparser import OSMParser
+from control.osminput import OSMInput
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class OSMInputTest (unittest.TestCase):
+    def setUp (self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(DATA, "small.osm")
+        self.expected = OSMParser.parse(self.path, integer_ids=True)
+        self.chunk_bytes = OSMInput.CHUNK_BYTES
+        
+        with open(self.path, "rb") as f:
+            self.data = f.read()
+    
+    def tearDown (self):
+        OSMInput.CHUNK_BYTES = self.chunk_bytes
+        self.directory.cleanup()
+    
+    def write (self, name, data):
+        path = os.path.join(self.directory.name, name)
+        
+        with open(path, "wb") as f:
+            f.write(data)
+        
+        return path
+    
+    def multistream (self, data, streams):
+        # One bzip2 stream per slice like pbzip2 writes them, the slices
+        # cut through the XML anywhere
+        size = len(data) // streams + 1
+        
+        return b"".join(bz2.compress(data[i:i+size]) for i in range(0, len(data), size))
+    
+    def compressed_files (self):
+        return {
+                "gzip" : self.write("small.osm.gz", gzip.compress(self.data)),
+                "bzip2" : self.write("small.osm.bz2", bz2.compress(self.data)),
+                "multistream" : self.write("multi.osm.bz2", self.multistream(self.data, 5))
+            }
+    
+    def assertSameCollection (self, collection):
+        self.assertEqual(list(collection.nodes()), list(self.expected.nodes()))
+        
+        for node_id, node in self.expected.nodes().items():
+            self.assertEqual(collection.nodes()[node_id].lat(), node.lat())
+            self.assertEqual(collection.nodes()[node_id].lon(), node.lon())
+            self.assertEqual(dict(collection.nodes()[node_id].tags()), dict(node.tags()))
+        
+        self.assertEqual(list(collection.ways()), list(self.expected.ways()))
+        
+        for way_id, way in self.expected.ways().items():
+            self.assertEqual(list(collection.ways()[way_id].noderefs()), list(way.noderefs()))
+        
+        self.assertEqual(list(collection.relations()), list(self.expected.relations()))
+    
+    def test_compression (self):
+        files = self.compressed_files()
+        
+        self.assertIsNone(OSMInput.compression(self.path))
+        self.assertEqual(OSMInput.compression(files["gzip"]), "gzip")
+        self.assertEqual(OSMInput.compression(files["bzip2"]), "bzip2")
+        self.assertFalse(OSMInput.is_multistream(files["bzip2"]))
+        self.assertTrue(OSMInput.is_multistream(files["multistream"]))
+    
+    def test_open_decompresses (self):
+        OSMInput.CHUNK_BYTES = 1
+        
+        for path in self.compressed_files().values():
+            for processes in (1, 2):
+                with OSMInput.open(path, processes) as source:
+                    self.assertEqual(source.read(), self.data)
+    
+    def test_parse_compressed_files (self):
+        OSMInput.CHUNK_BYTES = 1
+        
+        for path in self.compressed_files().values():
+            for processes in (1, 2):
+                for streaming in (True, False):
+                    self.assertSameCollection(OSMParser.parse(path, streaming, integer_ids=True,
+                                                              processes=processes))
+    
+    def test_parse_file_objects (self):
+        paths = [self.path] + list(self.compressed_files().values())
+        
+        for path in paths:
+            with open(path, "rb") as f:
+                self.assertSameCollection(OSMParser.parse(f, integer_ids=True))
+                self.assertFalse(f.closed)
+            
+            with open(path, "rb") as f:
+                self.assertSameCollection(OSMParser.parse(io.BytesIO(f.read()), integer_ids=True))
+    
+    def test_early_close (self):
+        # Far more decompressed chunks than the reader queues, so the
+        # producer is blocked on the full queue when the reader is closed
+        OSMInput.CHUNK_BYTES = 1
+        data = b"".join(b'  <node id="%d" lat="50.0" lon="9.0"/>\n' % i for i in range(200000))
+        paths = [
+                self.write("large.osm.bz2", bz2.compress(data)),
+                self.write("large.osm.gz", gzip.compress(data)),
+                self.write("large_multi.osm.bz2", self.multistream(data, 64))
+            ]
+        
+        for path in paths:
+            for processes in (1, 2):
+                source = OSMInput.open(path, processes)
+                
+                self.assertEqual(source.read(64), data[:64])
+                
+                closing = threading.Thread(target=source.close, daemon=True)
+                closing.start()
+                closing.join(30)
+                
+                self.assertFalse(closing.is_alive())
+                self.assertTrue(source.closed)
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
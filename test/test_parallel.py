@@ -0,0 +1,105 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import unittest
+import numpy as np
+from control.osmparser import OSMParser
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class ParallelParseTest (unittest.TestCase):
+    # Chunk sizes far below the size of single elements, so almost every
+    # boundary falls into the middle of an element first
+    CHUNK_SIZES = (1, 50, 333, 1 << 20)
+    
+    def setUp (self):
+        self.path = os.path.join(DATA, "small.osm")
+        self.limits = (OSMParser.PARALLEL_MIN_BYTES, OSMParser.CHUNK_BYTES)
+        OSMParser.PARALLEL_MIN_BYTES = 0
+        
+        with open(self.path, "rb") as f:
+            self.data = f.read()
+    
+    def tearDown (self):
+        OSMParser.PARALLEL_MIN_BYTES, OSMParser.CHUNK_BYTES = self.limits
+    
+    def test_chunk_ranges (self):
+        first = min(self.data.find(start_tag) for start_tag in OSMParser.ELEMENT_START_TAGS)
+        closing = self.data.rfind(b"</osm>")
+        
+        for chunk_bytes in self.CHUNK_SIZES:
+            ranges = OSMParser._chunk_ranges(self.path, chunk_bytes)
+            
+            self.assertEqual(ranges[0][0], first)
+            self.assertEqual(ranges[-1][1], closing)
+            
+            for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+                self.assertEqual(end, start)
+            
+            for start, end in ranges:
+                self.assertLess(start, end)
+                self.assertTrue(self.data[start:end].startswith(OSMParser.ELEMENT_START_TAGS))
+        
+        self.assertEqual(len(OSMParser._chunk_ranges(self.path, 1)), 19)
+        self.assertEqual(len(OSMParser._chunk_ranges(self.path, 1 << 20)), 1)
+    
+    def test_chunks_hold_all_elements (self):
+        for chunk_bytes in self.CHUNK_SIZES:
+            node_count = 0
+            ways = []
+            relations = []
+            
+            for start, end in OSMParser._chunk_ranges(self.path, chunk_bytes):
+                node_ids, _, _, chunk_ways, chunk_relations = OSMParser._parse_chunk(self.path, start, end, True)
+                node_count += sum(len(ids) for ids in node_ids)
+                ways.extend(way_id for way_id, _, _ in chunk_ways)
+                relations.extend(relation_id for relation_id, _, _ in chunk_relations)
+            
+            self.assertEqual(node_count, 12)
+            self.assertEqual(ways, [100, 101, 102, 103, 104, 105])
+            self.assertEqual(relations, [200])
+    
+    def assertSameCollection (self, collection, expected):
+        self.assertEqual(list(collection.nodes()), list(expected.nodes()))
+        
+        for node_id, node in expected.nodes().items():
+            self.assertEqual(collection.nodes()[node_id].lat(), node.lat())
+            self.assertEqual(collection.nodes()[node_id].lon(), node.lon())
+            self.assertEqual(dict(collection.nodes()[node_id].tags()), dict(node.tags()))
+        
+        self.assertEqual(list(collection.ways()), list(expected.ways()))
+        
+        for way_id, way in expected.ways().items():
+            self.assertEqual(list(collection.ways()[way_id].noderefs()), list(way.noderefs()))
+            self.assertEqual(dict(collection.ways()[way_id].tags()), dict(way.tags()))
+        
+        self.assertEqual(list(collection.relations()), list(expected.relations()))
+        
+        for relation_id, relation in expected.relations().items():
+            self.assertEqual([(x.type(), x.ref(), x.role()) for x in collection.relations()[relation_id].members()],
+                             [(x.type(), x.ref(), x.role()) for x in relation.members()])
+            self.assertEqual(dict(collection.relations()[relation_id].tags()), dict(relation.tags()))
+    
+    def test_matches_sequential (self):
+        for kwargs in ({}, {"integer_ids" : True}, {"prune_nodes" : True}):
+            expected = OSMParser.parse(self.path, processes=1, **kwargs)
+            
+            for chunk_bytes in self.CHUNK_SIZES:
+                OSMParser.CHUNK_BYTES = chunk_bytes
+                
+                self.assertSameCollection(OSMParser.parse(self.path, processes=2, **kwargs), expected)
+    
+    def test_columnar_matches_sequential (self):
+        expected = OSMParser.parse(self.path, columnar=True, processes=1).node_table()
+        OSMParser.CHUNK_BYTES = 50
+        table = OSMParser.parse(self.path, columnar=True, processes=2).node_table()
+        
+        self.assertTrue(np.array_equal(table.ids(), expected.ids()))
+        self.assertTrue(np.array_equal(table.coordinates(), expected.coordinates()))
+        self.assertEqual(table.tagged(), expected.tagged())
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,240 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import zlib
+import struct
+import tempfile
+import unittest
+import numpy as np
+from control.osmparser import OSMParser, OSMHandler
+from control.pbfparser import ProtobufReader
+from control.stats import OSMStats
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class PBFWriter ():
+    # Hand encoder for the PBF fixtures: nodes dense or one message each,
+    # several nodes per block, and the optional granularity and negative
+    # lat/lon offsets of the PrimitiveBlock
+    def __init__ (self, collection, nodes_per_block=4, dense=True,
+                  granularity=100, lat_offset=0, lon_offset=0):
+        self.__collection = collection
+        self.__nodes_per_block = nodes_per_block
+        self.__dense = dense
+        self.__granularity = granularity
+        self.__offsets = (lat_offset, lon_offset)
+    
+    @classmethod
+    def varint (cls, value):
+        # Negative values as 64 bit two's complement like int64 fields
+        value &= (1 << 64) - 1
+        out = bytearray()
+        
+        while value >= 0x80:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        
+        out.append(value)
+        
+        return bytes(out)
+    
+    @classmethod
+    def zigzag (cls, value):
+        return (value << 1) ^ (value >> 63)
+    
+    @classmethod
+    def field (cls, number, payload):
+        # Varint for ints, length delimited for bytes
+        if isinstance(payload, int):
+            return cls.varint(number << 3) + cls.varint(payload)
+        
+        return cls.varint((number << 3) | 2) + cls.varint(len(payload)) + payload
+    
+    @classmethod
+    def packed (cls, values):
+        return b"".join(cls.varint(value) for value in values)
+    
+    @classmethod
+    def delta (cls, values):
+        values = [int(value) for value in values]
+        
+        return [cls.zigzag(value - last) for value, last in zip(values, [0] + values[:-1])]
+    
+    @classmethod
+    def fileblock (cls, blob_type, data):
+        blob = cls.field(2, len(data)) + cls.field(3, zlib.compress(data))
+        header = cls.field(1, blob_type.encode()) + cls.field(3, len(blob))
+        
+        return struct.pack(">I", len(header)) + header + blob
+    
+    def _block (self, group):
+        # group is called with the string table lookup
+        strings = [""]
+        
+        def string (value):
+            if value not in strings:
+                strings.append(value)
+            
+            return strings.index(value)
+        
+        groups = group(string)
+        table = b"".join(self.field(1, value.encode()) for value in strings)
+        
+        return (self.field(1, table) + b"".join(self.field(2, x) for x in groups)
+                + self.field(17, self.__granularity) + self.field(19, self.__offsets[0])
+                + self.field(20, self.__offsets[1]))
+    
+    def _fixed (self, degrees, axis):
+        return round((degrees * 1e9 - self.__offsets[axis]) / self.__granularity)
+    
+    def _tag_fields (self, tags, string):
+        return (self.field(2, self.packed(string(key) for key in tags))
+                + self.field(3, self.packed(string(value) for value in tags.values())))
+    
+    def _nodes (self, nodes, string):
+        if self.__dense:
+            keys_vals = []
+            
+            for node in nodes:
+                for key, value in node.tags().items():
+                    keys_vals += [string(key), string(value)]
+                
+                keys_vals.append(0)
+            
+            dense = (self.field(1, self.packed(self.delta(node.id() for node in nodes)))
+                     + self.field(8, self.packed(self.delta(self._fixed(node.lat(), 0) for node in nodes)))
+                     + self.field(9, self.packed(self.delta(self._fixed(node.lon(), 1) for node in nodes)))
+                     + self.field(10, self.packed(keys_vals)))
+            
+            return [self.field(2, dense)]
+        
+        return [b"".join(
+                self.field(1, self.field(1, self.zigzag(node.id())) + self._tag_fields(node.tags(), string)
+                           + self.field(8, self.zigzag(self._fixed(node.lat(), 0)))
+                           + self.field(9, self.zigzag(self._fixed(node.lon(), 1))))
+                for node in nodes
+            )]
+    
+    def _ways (self, string):
+        return [b"".join(
+                self.field(3, self.field(1, way.id()) + self._tag_fields(way.tags(), string)
+                           + self.field(8, self.packed(self.delta(way.noderefs()))))
+                for way in self.__collection.ways().values()
+            )]
+    
+    def _relations (self, string):
+        return [b"".join(
+                self.field(4, self.field(1, relation.id()) + self._tag_fields(relation.tags(), string)
+                           + self.field(8, self.packed(string(member.role()) for member in relation.members()))
+                           + self.field(9, self.packed(self.delta(member.ref() for member in relation.members())))
+                           + self.field(10, self.packed(("node", "way", "relation").index(member.type())
+                                                        for member in relation.members())))
+                for relation in self.__collection.relations().values()
+            )]
+    
+    def write (self, path):
+        nodes = list(self.__collection.nodes().values())
+        out = self.fileblock("OSMHeader", self.field(4, b"OsmSchema-V0.6") + self.field(4, b"DenseNodes"))
+        
+        for start in range(0, len(nodes), self.__nodes_per_block):
+            chunk = nodes[start:start+self.__nodes_per_block]
+            out += self.fileblock("OSMData", self._block(lambda string: self._nodes(chunk, string)))
+        
+        out += self.fileblock("OSMData", self._block(self._ways))
+        out += self.fileblock("OSMData", self._block(self._relations))
+        
+        with open(path, "wb") as f:
+            f.write(out)
+
+class CountingHandler (OSMHandler):
+    def __init__ (self):
+        self.ids = []
+    
+    def way (self, obj):
+        self.ids.append(obj.id())
+
+class PBFParserTest (unittest.TestCase):
+    def setUp (self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.xml = OSMParser.parse(os.path.join(DATA, "small.osm"), integer_ids=True)
+    
+    def tearDown (self):
+        self.directory.cleanup()
+    
+    def write (self, **kwargs):
+        path = os.path.join(self.directory.name, "small.osm.pbf")
+        PBFWriter(self.xml, **kwargs).write(path)
+        
+        return path
+    
+    def assertSameCollection (self, collection, expected):
+        self.assertEqual(sorted(collection.nodes()), sorted(expected.nodes()))
+        
+        for node_id, node in expected.nodes().items():
+            self.assertAlmostEqual(collection.nodes()[node_id].lat(), node.lat(), places=6)
+            self.assertAlmostEqual(collection.nodes()[node_id].lon(), node.lon(), places=6)
+            self.assertEqual(dict(collection.nodes()[node_id].tags()), dict(node.tags()))
+        
+        self.assertEqual(sorted(collection.ways()), sorted(expected.ways()))
+        
+        for way_id, way in expected.ways().items():
+            self.assertEqual(list(collection.ways()[way_id].noderefs()), list(way.noderefs()))
+            self.assertEqual(dict(collection.ways()[way_id].tags()), dict(way.tags()))
+        
+        for relation_id, relation in expected.relations().items():
+            self.assertEqual([(x.type(), x.ref(), x.role()) for x in collection.relations()[relation_id].members()],
+                             [(x.type(), x.ref(), x.role()) for x in relation.members()])
+    
+    def test_int64 (self):
+        self.assertEqual(ProtobufReader.int64(ProtobufReader.read_varint(PBFWriter.varint(-5), 0)[0]), -5)
+        self.assertEqual(ProtobufReader.int64(12345), 12345)
+    
+    def test_matches_xml (self):
+        for dense in (True, False):
+            for processes in (1, 2):
+                collection = OSMParser.parse(self.write(dense=dense), integer_ids=True, processes=processes)
+                
+                self.assertSameCollection(collection, self.xml)
+    
+    def test_negative_offsets (self):
+        # Offsets of -1 and -2 degrees with a coarser granularity
+        path = self.write(granularity=1000, lat_offset=-1000000000, lon_offset=-2000000000)
+        
+        self.assertSameCollection(OSMParser.parse(path, integer_ids=True, processes=1), self.xml)
+    
+    def test_string_ids (self):
+        path = self.write()
+        collection = OSMParser.parse(path, processes=1)
+        expected = OSMParser.parse(os.path.join(DATA, "small.osm"))
+        
+        self.assertSameCollection(collection, expected)
+        self.assertEqual(len(collection.resolve_way_coordinates()), len(expected.resolve_way_coordinates()))
+        self.assertEqual(OSMParser.apply(path, CountingHandler(), processes=1).ids,
+                         OSMParser.apply(os.path.join(DATA, "small.osm"), CountingHandler()).ids)
+    
+    def test_columnar (self):
+        collection = OSMParser.parse(self.write(), columnar=True, processes=1)
+        
+        self.assertTrue(np.array_equal(collection.node_table().ids(), self.xml.node_table().ids()))
+        self.assertTrue(np.allclose(collection.node_table().coordinates(), self.xml.node_table().coordinates()))
+
+    def test_stats (self):
+        path = self.write()
+        
+        for processes in (1, 2):
+            stats = OSMStats(trace_allocations=True)
+            OSMParser.parse(path, integer_ids=True, processes=processes, stats=stats)
+            records = {record["phase"] : record for record in stats.records()}
+            
+            self.assertGreater(records["parse.read"]["elements"], 1)
+            self.assertIsNotNone(records["parse.read"]["allocated_bytes"])
+            self.assertEqual(records["parse.read.decode"]["elements"], records["parse.read"]["elements"])
+            self.assertEqual(records["parse.read.merge"]["elements"], records["parse.read"]["elements"])
+            self.assertIn("parse.build", records)
+            self.assertEqual(records["parse"]["elements"], 12 + 6 + 1)
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
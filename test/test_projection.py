@@ -0,0 +1,32 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import unittest
+import numpy as np
+from control.osmparser import OSMParser
+from control.nodelocations import SortedNodeLocations
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class LocatedProjectionTest (unittest.TestCase):
+    def test_projection_is_kept_without_nodes (self):
+        # All nodes go to the store only, so the node table is empty
+        collection = OSMParser.parse(os.path.join(DATA, "small.osm"), integer_ids=True,
+                                     node_locations=SortedNodeLocations(), node_filter=lambda tags: False)
+        ways = collection.ways()
+        
+        self.assertEqual(len(collection.node_table()), 0)
+        
+        first = collection.resolve_way_coordinates({103 : ways[103]}, projection="equirectangular")
+        second = collection.resolve_way_coordinates({100 : ways[100], 103 : ways[103]},
+                                                    projection="equirectangular")
+        
+        self.assertTrue(np.array_equal(np.asarray(first[103]), np.asarray(second[103])))
+        self.assertTrue(np.allclose(np.asarray(first[103])[0], 0.0))
+        self.assertTrue(np.all(np.asarray(second[100]) < 0))
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,57 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import unittest
+import numpy as np
+from control.rendering import OSMRenderer
+
+class RasterizeTest (unittest.TestCase):
+    def drawn (self, image):
+        return np.argwhere(np.any(image != 255, axis=2))
+    
+    def test_long_segment_is_clipped (self):
+        # A diagonal far beyond the bounds takes one sample per pixel row
+        segments = np.array([[[-1e9, -1e9], [1e9, 1e9]]])
+        drawn = self.drawn(OSMRenderer.rasterize(segments, 100, 100, bounds=(0.0, 0.0, 1.0, 1.0)))
+        
+        self.assertEqual(len(drawn), 100)
+        self.assertTrue(np.array_equal(np.sort(drawn[:,0]), np.arange(100)))
+        self.assertTrue(np.array_equal(drawn[:,0] + drawn[:,1], np.full(100, 99)))
+    
+    def test_zoomed_lines_stay_connected (self):
+        rng = np.random.default_rng(0)
+        
+        for _ in range(50):
+            segments = rng.random((1, 2, 2)) * 100 - 50
+            drawn = self.drawn(OSMRenderer.rasterize(segments, 64, 48, bounds=(-1.0, -1.0, 1.0, 1.0)))
+            
+            if len(drawn) < 2:
+                continue
+            
+            # No gaps along the longer axis
+            major = np.argmax(np.ptp(drawn, axis=0))
+            
+            self.assertTrue(np.all(np.diff(np.unique(drawn[:,major])) == 1))
+    
+    def test_invisible_segments (self):
+        segments = np.array([
+                [[2.0, 0.0], [2.0, 1.0]],
+                [[-5.0, -5.0], [-1.0, 3.0]],
+                [[np.nan, 0.0], [0.5, 0.5]]
+            ])
+        image = OSMRenderer.rasterize(segments, 20, 20, bounds=(0.0, 0.0, 1.0, 1.0), colors="#000000")
+        
+        self.assertEqual(len(self.drawn(image)), 0)
+    
+    def test_segments_inside_are_unchanged (self):
+        segments = np.array([[[0.0, 0.0], [0.0, 1.0]], [[0.0, 0.0], [1.0, 0.0]]])
+        drawn = self.drawn(OSMRenderer.rasterize(segments, 10, 10, bounds=(0.0, 0.0, 1.0, 1.0)))
+        
+        # The bottom row and the left column
+        self.assertEqual(len(drawn), 19)
+        self.assertTrue(np.all((drawn[:,0] == 9) | (drawn[:,1] == 0)))
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,90 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import itertools
+import unittest
+import numpy as np
+from control.osmgraph import OSMGraph
+
+class RoutingTest (unittest.TestCase):
+    def generate (self, seed, node_count=30, edge_count=50):
+        # Random directed graph over two separate halves, so some pairs are
+        # unreachable across them and others within by edge direction. The
+        # weights stretch the great circle distances, which the bounds of
+        # the router rely on.
+        rng = np.random.default_rng(seed)
+        half = node_count // 2
+        sources = rng.integers(half, size=edge_count)
+        targets = rng.integers(half, size=edge_count)
+        sources = np.concatenate((sources, sources + half))
+        targets = np.concatenate((targets, targets + half))
+        keep = sources != targets
+        sources = sources[keep].astype(np.int64)
+        targets = targets[keep].astype(np.int64)
+        
+        coordinates = np.column_stack((50 + rng.random(node_count) * 0.1, 9 + rng.random(node_count) * 0.1))
+        weights = OSMGraph.haversine(coordinates[sources], coordinates[targets]) * (1 + rng.random(len(sources)))
+        
+        return OSMGraph.from_edges(np.arange(node_count, dtype=np.int64) * 10 + 1, coordinates,
+                                   sources, targets, weights)
+    
+    def path_length (self, graph, path):
+        indptr = graph.indptr()
+        length = 0.0
+        
+        for u, v in zip(path[:-1].tolist(), path[1:].tolist()):
+            edges = np.flatnonzero(graph.indices()[indptr[u]:indptr[u+1]] == v)
+            self.assertEqual(len(edges), 1)
+            length += float(graph.weights()[indptr[u] + edges[0]])
+        
+        return length
+    
+    def test_route_matches_distance_matrix (self):
+        for seed in range(3):
+            graph = self.generate(seed)
+            node_count = graph.node_count()
+            expected = graph.distance_matrix(np.arange(node_count), processes=1)
+            landmarks = graph.landmarks(4, processes=1)
+            
+            self.assertTrue(np.isinf(expected).any())
+            
+            for source, target in itertools.product(range(node_count), repeat=2):
+                for distance, path in (graph.route(source, target), graph.route(source, target, landmarks)):
+                    if np.isinf(expected[source, target]):
+                        self.assertTrue(np.isinf(distance))
+                        self.assertEqual(len(path), 0)
+                        continue
+                    
+                    self.assertAlmostEqual(distance, expected[source, target], places=6)
+                    self.assertEqual((path[0], path[-1]), (source, target))
+                    self.assertAlmostEqual(self.path_length(graph, path), distance, places=6)
+    
+    def test_router_searches_agree (self):
+        graph = self.generate(7)
+        node_count = graph.node_count()
+        expected = graph.distance_matrix(np.arange(node_count), processes=1)
+        router = graph.router(graph.landmarks(4, processes=1))
+        
+        for source, target in itertools.product(range(node_count), repeat=2):
+            for search in (router.dijkstra, router.astar, router.bidirectional_astar):
+                distance, path = search(source, target)
+                
+                if np.isinf(expected[source, target]):
+                    self.assertTrue(np.isinf(distance))
+                else:
+                    self.assertAlmostEqual(distance, expected[source, target], places=6)
+                    self.assertAlmostEqual(self.path_length(graph, path), distance, places=6)
+    
+    def test_source_is_target (self):
+        graph = self.generate(1)
+        
+        for source in range(graph.node_count()):
+            distance, path = graph.route(source, source)
+            
+            self.assertEqual(distance, 0.0)
+            self.assertEqual(path.tolist(), [source])
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
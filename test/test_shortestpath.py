@@ -0,0 +1,70 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import unittest
+import numpy as np
+from control.osmgraph import OSMGraph
+from control.shortestpath import ShortestPathEngine
+
+class ShortestPathEngineTest (unittest.TestCase):
+    def generate (self, seed, node_count=40, edge_count=90):
+        rng = np.random.default_rng(seed)
+        sources = rng.integers(node_count, size=edge_count)
+        targets = rng.integers(node_count, size=edge_count)
+        keep = sources != targets
+        coordinates = np.column_stack((50 + rng.random(node_count) * 0.1, 9 + rng.random(node_count) * 0.1))
+        weights = rng.random(np.count_nonzero(keep)) * 1000 + 1
+        
+        return OSMGraph.from_edges(np.arange(node_count, dtype=np.int64) + 1, coordinates,
+                                   sources[keep].astype(np.int64), targets[keep].astype(np.int64), weights)
+    
+    def test_pool_matches_sequential (self):
+        graph = self.generate(3)
+        sources = np.arange(0, graph.node_count(), 3)
+        targets = np.arange(graph.node_count())
+        
+        with ShortestPathEngine(graph, 1) as engine:
+            expected, expected_trees = engine.distance_matrix(sources, targets, predecessors=True)
+        
+        with ShortestPathEngine(graph, 2) as engine:
+            matrix, trees = engine.distance_matrix(sources, targets, predecessors=True)
+            plain = engine.distance_matrix(sources, targets)
+        
+        self.assertTrue(np.isinf(expected).any())
+        self.assertEqual(trees.dtype, np.int64)
+        self.assertTrue(np.array_equal(matrix, expected))
+        self.assertTrue(np.array_equal(plain, expected))
+        self.assertTrue(np.array_equal(trees, expected_trees))
+        
+        for row, source in enumerate(sources.tolist()):
+            for target in targets.tolist():
+                path = ShortestPathEngine.path(trees[row], source, target)
+                
+                self.assertTrue(np.array_equal(path, ShortestPathEngine.path(expected_trees[row], source, target)))
+                
+                if np.isinf(expected[row, target]):
+                    self.assertEqual(len(path), 0)
+                else:
+                    self.assertEqual((path[0], path[-1]), (source, target))
+    
+    def test_path_lengths (self):
+        graph = self.generate(5)
+        indptr, indices, weights = graph.indptr(), graph.indices(), graph.weights()
+        sources = np.arange(graph.node_count())
+        matrix, trees = graph.distance_matrix(sources, predecessors=True, processes=2)
+        
+        for source in sources.tolist():
+            for target in np.flatnonzero(np.isfinite(matrix[source])).tolist():
+                path = ShortestPathEngine.path(trees[source], source, target)
+                length = 0.0
+                
+                for u, v in zip(path[:-1].tolist(), path[1:].tolist()):
+                    edge = indptr[u] + np.flatnonzero(indices[indptr[u]:indptr[u+1]] == v)[0]
+                    length += float(weights[edge])
+                
+                self.assertAlmostEqual(length, matrix[source, target], places=6)
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,133 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from control.osmparser import OSMParser, OSMCollections, OSMTagFilter
+from control.snapshot import OSMSnapshot
+from control.stats import OSMStats
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class OSMSnapshotTest (unittest.TestCase):
+    def setUp (self):
+        # A copy of the fixture, so its mtime can be changed
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "small.osm")
+        shutil.copy(os.path.join(DATA, "small.osm"), self.path)
+    
+    def tearDown (self):
+        self.directory.cleanup()
+    
+    def assertSameCollection (self, collection, expected):
+        self.assertEqual(sorted(collection.nodes()), sorted(expected.nodes()))
+        self.assertTrue(np.array_equal(collection.node_table().ids(), expected.node_table().ids()))
+        self.assertTrue(np.array_equal(collection.node_table().coordinates(),
+                                       expected.node_table().coordinates()))
+        
+        for node_id in expected.nodes():
+            self.assertEqual(dict(collection.nodes()[node_id].tags()), dict(expected.nodes()[node_id].tags()))
+        
+        self.assertEqual(list(collection.ways()), list(expected.ways()))
+        
+        for way_id, way in expected.ways().items():
+            self.assertEqual(list(collection.ways()[way_id].noderefs()), list(way.noderefs()))
+            self.assertEqual(dict(collection.ways()[way_id].tags()), dict(way.tags()))
+        
+        self.assertEqual(list(collection.relations()), list(expected.relations()))
+        
+        for relation_id, relation in expected.relations().items():
+            self.assertEqual([(x.type(), x.ref(), x.role()) for x in collection.relations()[relation_id].members()],
+                             [(x.type(), x.ref(), x.role()) for x in relation.members()])
+            self.assertEqual(dict(collection.relations()[relation_id].tags()), dict(relation.tags()))
+    
+    def parse (self, **kwargs):
+        # The parse and whether it was loaded from the snapshot
+        stats = OSMStats()
+        collection = OSMParser.parse(self.path, stats=stats, **kwargs)
+        phases = {record["phase"] for record in stats.records()}
+        
+        return collection, "parse.snapshot_load" in phases
+    
+    def test_round_trip (self):
+        for kwargs in ({}, {"integer_ids" : True}, {"columnar" : True}):
+            expected = OSMParser.parse(self.path, **kwargs)
+            path = os.path.join(self.directory.name, "round_trip")
+            expected.save(path)
+            
+            for mmap in (False, True):
+                self.assertSameCollection(OSMCollections.load(path, mmap), expected)
+    
+    def test_mmap_load (self):
+        path = os.path.join(self.directory.name, "mapped")
+        OSMParser.parse(self.path, columnar=True).save(path)
+        collection = OSMSnapshot.load(path, mmap=True)
+        
+        # Views of read-only maps of the snapshot files, not copies
+        self.assertFalse(collection.node_table().coordinates().flags.writeable)
+        self.assertFalse(collection.node_table().coordinates().flags.owndata)
+        self.assertIsInstance(collection.ways()[100].noderefs(), np.memmap)
+        self.assertFalse(collection.ways()[100].noderefs().flags.writeable)
+        self.assertEqual(len(collection.ways_to_csr_graph().node_ids()), 12)
+    
+    def test_load_without_snapshot (self):
+        with self.assertRaises(ValueError):
+            OSMSnapshot.load(os.path.join(self.directory.name, "missing"))
+    
+    def test_reuse (self):
+        expected = OSMParser.parse(self.path, integer_ids=True)
+        
+        collection, loaded = self.parse(integer_ids=True, snapshot=True)
+        self.assertFalse(loaded)
+        self.assertTrue(os.path.exists(os.path.join(self.path + ".snapshot", OSMSnapshot.META_FILE)))
+        self.assertSameCollection(collection, expected)
+        
+        collection, loaded = self.parse(integer_ids=True, snapshot=True)
+        self.assertTrue(loaded)
+        self.assertSameCollection(collection, expected)
+    
+    def test_changed_options_reparse (self):
+        self.parse(snapshot=True)
+        
+        for kwargs in ({"integer_ids" : True}, {"prune_nodes" : True},
+                       {"way_filter" : OSMTagFilter("highway")}):
+            collection, loaded = self.parse(snapshot=True, **kwargs)
+            
+            self.assertFalse(loaded)
+            self.assertSameCollection(collection, OSMParser.parse(self.path, **kwargs))
+            
+            # The snapshot now holds the new options
+            self.assertTrue(self.parse(snapshot=True, **kwargs)[1])
+        
+        # Ad hoc filters are never reused
+        self.assertFalse(self.parse(snapshot=True, way_filter=lambda tags: True)[1])
+        self.assertFalse(self.parse(snapshot=True, way_filter=lambda tags: True)[1])
+    
+    def test_changed_source_reparse (self):
+        self.parse(snapshot=True)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        
+        self.assertFalse(self.parse(snapshot=True)[1])
+        self.assertTrue(self.parse(snapshot=True)[1])
+    
+    def test_unwritable_snapshot (self):
+        # The snapshot directory can't be created below a plain file, like
+        # in a read-only directory the parse result is returned anyway
+        blocker = os.path.join(self.directory.name, "file")
+        
+        with open(blocker, "w") as f:
+            f.write("")
+        
+        collection, loaded = self.parse(integer_ids=True, snapshot=os.path.join(blocker, "snapshot"))
+        
+        self.assertFalse(loaded)
+        self.assertSameCollection(collection, OSMParser.parse(self.path, integer_ids=True))
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
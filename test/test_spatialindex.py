@@ -0,0 +1,96 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import unittest
+import numpy as np
+from control.spatialindex import GridIndex, PackedRTree
+
+class GridIndexTest (unittest.TestCase):
+    def point_sets (self):
+        # Uniform, clustered with far outliers, duplicates and tiny sets
+        rng = np.random.default_rng(0)
+        clustered = np.concatenate((rng.normal(0, 1, (300, 2)), rng.normal(500, 5, (50, 2)), [(1e4, -1e4)]))
+        
+        return (rng.random((500, 2)) * 1000, clustered, np.repeat(rng.random((20, 2)), 3, axis=0),
+                rng.random((3, 2)), np.empty((0, 2)))
+    
+    def distances (self, points, queries):
+        return np.hypot(*(points[None,:,:] - queries[:,None,:]).transpose(2, 0, 1))
+    
+    def test_k_nearest (self):
+        rng = np.random.default_rng(1)
+        
+        for points in self.point_sets():
+            index = GridIndex(points)
+            queries = np.concatenate((points[:10], rng.random((10, 2)) * 2000 - 500))
+            expected = np.sort(self.distances(points, queries), axis=1)
+            
+            for k in (1, 5, len(points) + 2):
+                distances, indices = index.query(queries, k)
+                count = min(k, len(points))
+                
+                self.assertTrue(np.allclose(distances[:,:count], expected[:,:k]))
+                self.assertTrue(np.all(np.isinf(distances[:,count:])))
+                self.assertTrue(np.all(indices[:,count:] == -1))
+                
+                if count != 0:
+                    found = np.take_along_axis(self.distances(points, queries), indices[:,:count], axis=1)
+                    self.assertTrue(np.allclose(found, distances[:,:count]))
+    
+    def test_radius (self):
+        rng = np.random.default_rng(2)
+        
+        for points in self.point_sets():
+            index = GridIndex(points)
+            queries = rng.random((15, 2)) * 1000
+            distances = self.distances(points, queries)
+            
+            for radius in (0.5, 30.0, 400.0):
+                for row, found in enumerate(index.query_radius(queries, radius)):
+                    self.assertEqual(sorted(found.tolist()), np.flatnonzero(distances[row] <= radius).tolist())
+                    self.assertTrue(np.all(np.diff(distances[row][found]) >= 0))
+    
+    def test_box (self):
+        rng = np.random.default_rng(3)
+        
+        for points in self.point_sets():
+            index = GridIndex(points)
+            
+            for _ in range(20):
+                lower = rng.random(2) * 1200 - 100
+                upper = lower + rng.random(2) * 600
+                expected = np.flatnonzero(np.all((points >= lower) & (points <= upper), axis=1))
+                
+                self.assertTrue(np.array_equal(index.query_box(lower, upper), expected))
+            
+            # Boxes around the whole set and beyond its grid
+            self.assertEqual(len(index.query_box((-1e5, -1e5), (1e5, 1e5))), len(points))
+            self.assertEqual(len(index.query_box((2e4, 2e4), (3e4, 3e4))), 0)
+
+class PackedRTreeTest (unittest.TestCase):
+    def test_query (self):
+        rng = np.random.default_rng(4)
+        
+        for count in (0, 1, 15, 16, 17, 300, 2000):
+            lower = rng.random((count, 2)) * 100
+            boxes = np.concatenate((lower, lower + rng.random((count, 2)) * rng.choice((0.0, 1.0, 20.0))), axis=1)
+            
+            for node_size in (2, 4, 16):
+                tree = PackedRTree(boxes, node_size)
+                
+                self.assertEqual(len(tree), count)
+                
+                for _ in range(20):
+                    query_lower = rng.random(2) * 110 - 5
+                    query = np.concatenate((query_lower, query_lower + rng.random(2) * 30))
+                    expected = np.flatnonzero(
+                            (boxes[:,0] <= query[2]) & (boxes[:,2] >= query[0])
+                            & (boxes[:,1] <= query[3]) & (boxes[:,3] >= query[1])
+                        )
+                    
+                    self.assertTrue(np.array_equal(np.sort(tree.query(query)), expected))
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
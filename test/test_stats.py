@@ -0,0 +1,47 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import unittest
+from control.osmparser import OSMParser
+from control.stats import OSMStats
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class ParseStatsTest (unittest.TestCase):
+    def records (self, processes):
+        stats = OSMStats(trace_allocations=True)
+        OSMParser.parse(os.path.join(DATA, "small.osm"), processes=processes, stats=stats)
+        
+        return {record["phase"] : record for record in stats.records()}
+    
+    def test_stream_read_phase (self):
+        records = self.records(1)
+        
+        self.assertEqual(records["parse.read"]["elements"], 19)
+        self.assertIsNotNone(records["parse.read"]["allocated_bytes"])
+        self.assertIsNotNone(records["parse.read"]["max_rss_delta_kb"])
+        self.assertEqual(records["parse.read.nodes"]["elements"], 12)
+        self.assertEqual(records["parse.read.ways"]["elements"], 6)
+    
+    def test_parallel_read_phase (self):
+        # Small chunks, so the tiny file is split between the workers
+        limits = (OSMParser.PARALLEL_MIN_BYTES, OSMParser.CHUNK_BYTES)
+        OSMParser.PARALLEL_MIN_BYTES = 0
+        OSMParser.CHUNK_BYTES = 512
+        
+        try:
+            records = self.records(2)
+        finally:
+            OSMParser.PARALLEL_MIN_BYTES, OSMParser.CHUNK_BYTES = limits
+        
+        self.assertIsNotNone(records["parse.read"]["allocated_bytes"])
+        self.assertIsNotNone(records["parse.read"]["max_rss_delta_kb"])
+        self.assertEqual(records["parse.read.merge"]["elements"], records["parse.read"]["elements"])
+        self.assertGreater(records["parse.read"]["elements"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,33 @@
+'''
+Created on 18.10.2026
+
+@author: larsw
+'''
+import os
+import unittest
+from control.osmparser import OSMParser
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class TagIndexTest (unittest.TestCase):
+    def scan (self, objects, key, values):
+        return [
+                obj_id
+                for obj_id in objects
+                if objects[obj_id].has_tag_value_in(key, values)
+            ]
+    
+    def test_value_in_keeps_scan_order (self):
+        for kwargs in ({}, {"integer_ids" : True}):
+            collection = OSMParser.parse(os.path.join(DATA, "small.osm"), **kwargs)
+            ways = collection.ways()
+            
+            for values in (["service", "residential", "primary"], ["primary", "residential"],
+                           ["primary"], ["primary", "missing"], ["missing"], []):
+                self.assertEqual(list(collection.tag_index("way").ids_with_tag_value_in("highway", values)),
+                                 self.scan(ways, "highway", values))
+                self.assertEqual(list(collection.ways_with_tag_value_in("highway", values)),
+                                 self.scan(ways, "highway", values))
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file